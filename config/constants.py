@@ -1,7 +1,51 @@
-BASE_URL = "https://account.jetbrains.com/api/v1"
+import os
+import tempfile
+
+BASE_URL = os.getenv("BASE_URL", "https://account.jetbrains.com/api/v1")
 
 TEAM_1_ID = 2743675
 TEAM_2_ID = 2743670
 
 VALID_EMAIL_1 = "ilya.ali1@outlook.com"
 VALID_EMAIL_2 = "ilya.ali2@outlook.com"
+
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_WARM_CONNECTIONS = int(os.getenv("HTTP_WARM_CONNECTIONS", "2"))
+INVENTORY_CACHE_TTL = float(os.getenv("INVENTORY_CACHE_TTL", "30"))
+INVENTORY_VALIDATION = os.getenv("INVENTORY_VALIDATION", "0") == "1"
+LICENSE_POOL_LOW_WATERMARK = int(os.getenv("LICENSE_POOL_LOW_WATERMARK", "3"))
+RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS", "0"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "10"))
+RATE_LIMIT_MAX_CONCURRENCY = int(os.getenv("RATE_LIMIT_MAX_CONCURRENCY", "64"))
+RATE_LIMIT_RETRIES = int(os.getenv("RATE_LIMIT_RETRIES", "3"))
+RATE_LIMIT_MAX_RETRY_AFTER = float(os.getenv("RATE_LIMIT_MAX_RETRY_AFTER", "30"))
+CIRCUIT_BREAKER_THRESHOLD = int(os.getenv("CIRCUIT_BREAKER_THRESHOLD", "5"))
+CIRCUIT_BREAKER_RESET = float(os.getenv("CIRCUIT_BREAKER_RESET", "30"))
+SHARED_RATE_BUDGET = os.getenv("SHARED_RATE_BUDGET", "")
+SHARED_RATE_BUDGET_BURST = int(os.getenv("SHARED_RATE_BUDGET_BURST", "5"))
+SHARED_RATE_BUDGET_DIR = os.getenv("SHARED_RATE_BUDGET_DIR",
+                                   os.path.join(tempfile.gettempdir(), "licenses-rate-budget"))
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off")
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", os.path.join("cassettes", "licenses"))
+MEMOIZE_VALIDATION = os.getenv("MEMOIZE_VALIDATION", "0") == "1"
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "100"))
+BULK_MAX_WORKERS = int(os.getenv("BULK_MAX_WORKERS", "4"))
+BULK_RETRIES = int(os.getenv("BULK_RETRIES", "2"))
+RACE_CONTENDERS = int(os.getenv("RACE_CONTENDERS", "4"))
+RACE_REPETITIONS = int(os.getenv("RACE_REPETITIONS", "5"))
+RBAC_MAX_WORKERS = int(os.getenv("RBAC_MAX_WORKERS", "16"))
+SUITE_PROFILE_PATH = os.getenv("SUITE_PROFILE", "")
+SUITE_PROFILE_TOP = int(os.getenv("SUITE_PROFILE_TOP", "10"))
+LATENCY_BUDGET_ENV = os.getenv("LATENCY_BUDGET_ENV", "")
+LATENCY_BUDGET_SAMPLES = int(os.getenv("LATENCY_BUDGET_SAMPLES", "10"))
+LATENCY_BUDGETS_PATH = os.getenv("LATENCY_BUDGETS_PATH",
+                                 os.path.join(os.path.dirname(__file__), "latency_budgets.json"))
+FAST_FEEDBACK = os.getenv("FAST_FEEDBACK", "0") == "1"
+TEST_HISTORY_RUNS = int(os.getenv("TEST_HISTORY_RUNS", "5"))
+
+ATTACH_POLICY = os.getenv("ATTACH_POLICY", "on_failure")
+ATTACH_MAX_BODY_BYTES = int(os.getenv("ATTACH_MAX_BODY_BYTES", str(64 * 1024)))
+ATTACH_OVERSIZE = os.getenv("ATTACH_OVERSIZE", "truncate")
+ATTACH_MAX_PENDING = int(os.getenv("ATTACH_MAX_PENDING", "100"))
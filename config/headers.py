@@ -8,33 +8,43 @@ class Headers:
 
     @staticmethod
     def org_admin(
-            customer_code: str = os.getenv("ADMIN_CUSTOMER_CODE"),
-            api_key: str = os.getenv("ADMIN_API_KEY")
+            customer_code: str = None,
+            api_key: str = None
     ) -> dict:
         return {
-            "X-Customer-Code": customer_code,
-            "X-Api-Key": api_key,
+            "X-Customer-Code": customer_code or os.getenv("ADMIN_CUSTOMER_CODE"),
+            "X-Api-Key": api_key or os.getenv("ADMIN_API_KEY"),
             "Content-Type": "application/json",
         }
 
     @staticmethod
     def team_admin(
-            customer_code: str = os.getenv("TEAM_ADMIN_CUSTOMER_CODE"),
-            api_key: str = os.getenv("TEAM_ADMIN_API_KEY")
+            customer_code: str = None,
+            api_key: str = None
     ) -> dict:
         return {
-            "X-Customer-Code": customer_code,
-            "X-Api-Key": api_key,
+            "X-Customer-Code": customer_code or os.getenv("TEAM_ADMIN_CUSTOMER_CODE"),
+            "X-Api-Key": api_key or os.getenv("TEAM_ADMIN_API_KEY"),
             "Content-Type": "application/json",
         }
 
     @staticmethod
     def team_viewer(
-            customer_code: str = os.getenv("TEAM_VIEWER_CUSTOMER_CODE"),
-            api_key: str = os.getenv("TEAM_VIEWER_API_KEY")
+            customer_code: str = None,
+            api_key: str = None
     ) -> dict:
         return {
-            "X-Customer-Code": customer_code,
-            "X-Api-Key": api_key,
+            "X-Customer-Code": customer_code or os.getenv("TEAM_VIEWER_CUSTOMER_CODE"),
+            "X-Api-Key": api_key or os.getenv("TEAM_VIEWER_API_KEY"),
             "Content-Type": "application/json",
         }
+
+    @staticmethod
+    def role_of(headers: dict) -> str:
+        credentials = (headers.get("X-Customer-Code"), headers.get("X-Api-Key"))
+        for role, role_headers in (("org_admin", Headers.org_admin()),
+                                   ("team_admin", Headers.team_admin()),
+                                   ("team_viewer", Headers.team_viewer())):
+            if credentials == (role_headers["X-Customer-Code"], role_headers["X-Api-Key"]):
+                return role
+        return "unknown"
@@ -1,14 +1,254 @@
 import os
 import shutil
 import sys
+import zlib
 from pathlib import Path
 
+import pytest
+
 ROOT = Path(__file__).resolve().parent
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
+from config import constants  # noqa: E402
+from config.headers import Headers  # noqa: E402
+from services.licenses.api_licenses import LicensesApi  # noqa: E402
+from services.licenses.endpoints import Endpoints  # noqa: E402
+from services.licenses.license_pool import LicensePool  # noqa: E402
+from services.licenses.payloads import Payloads  # noqa: E402
+from services.licenses.stub_server import LicensesStubServer, use_stub_credentials  # noqa: E402
+from utils.api_client import ApiClient  # noqa: E402
+from utils.attachments import ResponseAttachments, response_attachments  # noqa: E402
+from utils.cassette import Cassette, cassette  # noqa: E402
+from utils.latency_budget import latency_budget, latency_budgets  # noqa: E402
+from utils.metrics import request_metrics  # noqa: E402
+from utils.rate_limiter import rate_limiter  # noqa: E402
+from utils.race import RaceHarness  # noqa: E402
+from utils.response_memo import response_memo  # noqa: E402
+from utils.scheduler import duration_scheduler  # noqa: E402
+from utils.suite_profiler import suite_profiler  # noqa: E402
+
+licenses_stub_key = pytest.StashKey[LicensesStubServer]()
+
+
+def pytest_addoption(parser):
+    parser.addoption("--licenses-stub", action="store_true", default=False,
+                     help="Run against an in-process stand-in of the licenses API instead of BASE_URL")
+    parser.addoption("--licenses-stub-latency", type=float, default=0.0,
+                     help="Fixed delay per stub request, seconds")
+    parser.addoption("--licenses-stub-jitter", type=float, default=0.0,
+                     help="Random extra delay per stub request, seconds")
+    parser.addoption("--attach-responses", choices=ResponseAttachments.policies, default=None,
+                     help="When to attach request/response records to allure (default: ATTACH_POLICY or on_failure)")
+    parser.addoption("--request-metrics", default=None, metavar="PATH",
+                     help="Write per-endpoint request latency summary and the slowest requests to PATH")
+    parser.addoption("--request-metrics-slowest", type=int, default=10,
+                     help="Number of slowest requests to list in the terminal summary")
+    parser.addoption("--memoize-validation", action="store_true", default=False,
+                     help="Share one server response between side_effect_free requests of the same payload shape")
+    parser.addoption("--cassette", choices=Cassette.modes, default=None,
+                     help="Record API traffic to, or replay it from, the cassette (default: CASSETTE_MODE or off)")
+    parser.addoption("--cassette-path", default=None,
+                     help="Cassette file prefix (default: CASSETTE_PATH or cassettes/licenses)")
+    parser.addoption("--latency-budget-env", default=None,
+                     help="Section of config/latency_budgets.json to take budgets from, 'off' disables the checks "
+                          "(default: LATENCY_BUDGET_ENV, or 'stub' with --licenses-stub)")
+    parser.addoption("--fast-feedback", action="store_true", default=False,
+                     help="Run recently failed and cheap tests first, and split them into equal-duration buckets "
+                          "under xdist, by the durations kept in the pytest cache (default: FAST_FEEDBACK)")
+    parser.addoption("--profile-suite", default=None, metavar="PATH",
+                     help="Write where suite time goes (fixtures, steps, requests, attachments) to PATH as "
+                          "collapsed stacks, and a top-N summary to PATH.summary.json (default: SUITE_PROFILE)")
+    parser.addoption("--profile-suite-top", type=int, default=None,
+                     help="Entries per list in the suite profile summary (default: SUITE_PROFILE_TOP or 10)")
+
 
 def pytest_configure(config):
+    suite_profiler.path = config.getoption("--profile-suite") or suite_profiler.path
+    suite_profiler.top = config.getoption("--profile-suite-top") or suite_profiler.top
+    if suite_profiler.path:
+        suite_profiler.start(config)
+    with suite_profiler.span("configure"):
+        configure_session(config)
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    # Workers parse the command line again and would miss the switch to loadgroup, their nodeids need its @group suffix
+    node.workerinput["loadgroup"] = node.config.getoption("dist") == "loadgroup"
+
+
+def configure_session(config):
+    response_attachments.configure(policy=config.getoption("--attach-responses"))
+    rate_limiter.reset()
+    configure_cassette(config)
+    config.addinivalue_line("markers", "side_effect_free: the test only sends requests the server rejects "
+                                       "before touching any state, their responses may be memoized")
+    response_memo.enabled = response_memo.enabled or config.getoption("--memoize-validation")
+    config.addinivalue_line("markers", "latency_budget(endpoint, method=None, min_samples=1, p50_ms=None, "
+                                       "p90_ms=None, p95_ms=None, p99_ms=None, max_ms=None): fail the test when "
+                                       "its requests to the endpoint are slower than the budget")
+    budget_env = config.getoption("--latency-budget-env") or latency_budgets.environment
+    if not budget_env and config.getoption("--licenses-stub"):
+        budget_env = "stub"
+    latency_budgets.configure(environment=budget_env, aliases=Endpoints.NAMES)
+    duration_scheduler.enabled = duration_scheduler.enabled or config.getoption("--fast-feedback")
+    duration_scheduler.start(config)
+    if config.getoption("--licenses-stub"):
+        use_stub_credentials()
+        stub = LicensesStubServer(latency=config.getoption("--licenses-stub-latency"),
+                                  jitter=config.getoption("--licenses-stub-jitter")).start()
+        config.stash[licenses_stub_key] = stub
+        constants.BASE_URL = stub.base_url
+
+    # xdist workers share the controller's results dir, only the controller may clean it
+    if hasattr(config, "workerinput"):
+        config.option.loadgroup = config.workerinput.get("loadgroup", False)
+        return
+    # loadgroup is load for ungrouped tests, and it keeps xdist_group tests (the RBAC matrix) on one worker
+    if config.getoption("dist", "no") == "load":
+        config.option.dist = "loadgroup"
     results_dir = "allure-results"
     if os.path.exists(results_dir):
         shutil.rmtree(results_dir)
+    # Exports left by the workers of an interrupted run would be merged into this run's
+    if config.getoption("--request-metrics"):
+        request_metrics.clear_exports(config.getoption("--request-metrics"))
+    if suite_profiler.path:
+        suite_profiler.clear_exports(suite_profiler.path)
+
+
+def configure_cassette(config):
+    mode, path = config.getoption("--cassette"), config.getoption("--cassette-path")
+    cassette.configure(mode=mode, path=path)
+    if not cassette.recording:
+        return
+    worker = getattr(config, "workerinput", {}).get("workerid")
+    if worker:
+        # The controller already cleared the old recording, each worker appends to a file of its own
+        cassette.configure(path=f"{cassette.path}-{worker}")
+    else:
+        cassette.clear()
+
+
+def pytest_runtest_setup(item):
+    response_attachments.active = True
+    if cassette.mode != "off":
+        # Recorded traffic is looked up per test, with the same fake contact data whatever else runs
+        cassette.scope = item.nodeid
+        Payloads.seed(zlib.crc32(item.nodeid.encode()))
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    budgets = [latency_budget(*marker.args, **marker.kwargs) for marker in item.iter_markers("latency_budget")]
+    if not budgets or not latency_budgets.enabled:
+        yield
+        return
+    samples = latency_budgets.start()
+    try:
+        outcome = yield
+    finally:
+        latency_budgets.stop(samples)
+    if outcome.excinfo is None:
+        try:
+            latency_budgets.check(budgets, samples)
+        except AssertionError as error:
+            outcome.force_exception(error)
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    report = (yield).get_result()
+    if report.failed:
+        response_attachments.flush()
+    if report.when == "teardown":
+        response_attachments.discard()
+        response_attachments.active = False
+
+
+def pytest_sessionfinish(session):
+    worker = getattr(session.config, "workerinput", {}).get("workerid")
+    path = session.config.getoption("--request-metrics")
+    if path:
+        if not worker:
+            request_metrics.merge_exports(path)
+        request_metrics.export(f"{path}.{worker}" if worker else path)
+    if suite_profiler.enabled:
+        if worker:
+            suite_profiler.export(f"{suite_profiler.path}.{worker}")
+        else:
+            suite_profiler.merge_exports(suite_profiler.path)
+            suite_profiler.export(suite_profiler.path)
+            suite_profiler.write_summary(f"{suite_profiler.path}.summary.json")
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if hasattr(config, "workerinput"):
+        config.option.loadgroup = config.workerinput.get("loadgroup", False)
+        return
+    if suite_profiler.enabled:
+        write_suite_profile(terminalreporter)
+    if not config.getoption("--request-metrics"):
+        return
+    terminalreporter.section("request latency")
+    for row in request_metrics.summary():
+        terminalreporter.write_line(
+            f"{row['method']:<5} {row['endpoint']:<40} {row['status']} {row['role']:<12} "
+            f"n={row['count']:<5} p50={row['p50_ms']:.1f}ms p95={row['p95_ms']:.1f}ms max={row['max_ms']:.1f}ms")
+    slowest = request_metrics.slowest(config.getoption("--request-metrics-slowest"))
+    if slowest:
+        terminalreporter.write_line("slowest requests:")
+        for row in slowest:
+            terminalreporter.write_line(f"  {row['duration_ms']:>9.1f}ms {row['method']:<5} {row['url']} -> {row['status']}")
+
+
+def write_suite_profile(terminalreporter):
+    summary = suite_profiler.summary()
+    terminalreporter.section("suite profile")
+    terminalreporter.write_line(f"total {summary['total_ms']:.0f}ms, " + ", ".join(
+        f"{name} {value:.0f}ms" for name, value in summary["phases"].items())
+        + f" (+{summary['concurrent_ms']:.0f}ms in worker threads and tasks)")
+    for title in ("tests", "fixtures", "steps", "requests", "attachments"):
+        if summary[title]:
+            terminalreporter.write_line(f"slowest {title}:")
+            for row in summary[title]:
+                terminalreporter.write_line(f"  {row['ms']:>10.1f}ms {row['name']}")
+    terminalreporter.write_line(f"collapsed stacks: {suite_profiler.path}")
+
+
+def pytest_unconfigure(config):
+    suite_profiler.stop(config)
+    duration_scheduler.stop(config)
+    cassette.close()
+    stub = config.stash.get(licenses_stub_key, None)
+    if stub is not None:
+        stub.stop()
+
+
+@pytest.fixture(autouse=True)
+def side_effect_free_requests(request):
+    response_memo.active = request.node.get_closest_marker("side_effect_free") is not None
+    yield
+    response_memo.active = False
+
+
+@pytest.fixture(scope="session", autouse=True)
+def http_session():
+    if not cassette.replaying:
+        ApiClient.warm_up()
+    yield ApiClient.shared_session()
+    ApiClient.close_shared_session()
+
+
+@pytest.fixture(scope="session")
+def license_pool(http_session):
+    return LicensePool(api=LicensesApi(session=http_session), headers=Headers.org_admin())
+
+
+@pytest.fixture(scope="session")
+def race_harness(http_session):
+    warm_url = None if cassette.replaying else constants.BASE_URL
+    with RaceHarness(constants.RACE_CONTENDERS, client_factory=lambda session: LicensesApi(session=session),
+                     warm_url=warm_url) as harness:
+        yield harness
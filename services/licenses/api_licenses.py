@@ -1,30 +1,204 @@
+import csv
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import NamedTuple
+
 import allure
 import requests
 
+from config.constants import (BULK_CHUNK_SIZE, BULK_MAX_WORKERS, BULK_RETRIES, INVENTORY_CACHE_TTL,
+                              INVENTORY_VALIDATION)
 from services.licenses.endpoints import Endpoints
+from services.licenses.models.assign_licenses_models import ErrorResponse
+from services.licenses.models.team_licenses_models import TeamLicense, TeamLicenses
+from services.licenses.payloads import Payloads
 from utils.api_client import ApiClient
+from utils.api_response import ApiResponse, adapter_for
+from utils.cassette import Cassette
+from utils.json_stream import iter_json_array
+from utils.rate_limiter import RateLimiter
+from utils.response_memo import ResponseMemo
+from utils.shared_budget import SharedRateBudget
+
+# Worth another attempt with the same chunk, everything else is an answer about the licenses in it
+TRANSIENT_STATUSES = (429, 500, 502, 503, 504)
+# Rejections caused by single licenses of a chunk, any other 400 (TEAM_NOT_FOUND, INVALID_REQUEST) is about the
+# whole request and would fail every half of the chunk just the same
+LICENSE_REJECTIONS = ("LICENSE_NOT_FOUND", "LICENSE_ALREADY_IN_TEAM", "LICENSE_IS_NOT_TRANSFERABLE")
+# Every bulk assignment row needs these, a CSV row missing one fails alone instead of ending the run
+CONTACT_FIELDS = ("email", "firstName", "lastName")
+
+
+def error_code(response: ApiResponse) -> str:
+    try:
+        return response.parse(ErrorResponse).code
+    except ValueError:
+        return f"HTTP_{response.status_code}"
+
+
+class LicenseOutcome(NamedTuple):
+    status: int
+    code: str
+
+
+class AssignOutcome(NamedTuple):
+    contact: dict
+    license_id: str
+    status: int
+    code: str
+
+
+class BulkChangeResult:
+
+    def __init__(self, target_team_id: int, outcomes: dict, elapsed: float, requests_sent: int):
+        self.target_team_id = target_team_id
+        self.outcomes = outcomes
+        self.elapsed = elapsed
+        self.requests_sent = requests_sent
+
+    @property
+    def succeeded(self) -> list:
+        return [license_id for license_id, outcome in self.outcomes.items() if outcome.status == 200]
+
+    @property
+    def failed(self) -> dict:
+        return {license_id: outcome for license_id, outcome in self.outcomes.items() if outcome.status != 200}
+
+    @property
+    def licenses_per_second(self) -> float:
+        return len(self.succeeded) / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> dict:
+        failed = self.failed
+        return {
+            "target_team_id": self.target_team_id,
+            "licenses": len(self.outcomes),
+            "succeeded": len(self.outcomes) - len(failed),
+            "failed": {license_id: outcome.code for license_id, outcome in failed.items()},
+            "requests": self.requests_sent,
+            "elapsed_s": round(self.elapsed, 3),
+            "licenses_per_second": round(self.licenses_per_second, 2),
+        }
 
 
 class LicensesApi(ApiClient):
 
-    def __init__(self):
-        self.endpoints = Endpoints()
+    validate_inventory = INVENTORY_VALIDATION
+
+    def __init__(self, session: requests.Session = None, inventory_ttl: float = INVENTORY_CACHE_TTL,
+                 base_url: str = None, limiter: RateLimiter = None, budget: SharedRateBudget = None,
+                 cassette: Cassette = None, memo: ResponseMemo = None):
+        super().__init__(session=session, limiter=limiter, budget=budget, cassette=cassette, memo=memo)
+        self.endpoints = Endpoints(base_url)
+        self.inventory_ttl = inventory_ttl
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._inventory = {}
+        self._inventory_lock = threading.Lock()
+        self._mutation_listeners = []
+
+    @property
+    def cache_stats(self) -> dict:
+        return {"hits": self.cache_hits, "misses": self.cache_misses, "teams": len(self._inventory)}
+
+    def add_mutation_listener(self, listener) -> None:
+        # listener(endpoint, payload) is called after every successful assign/changeLicensesTeam
+        self._mutation_listeners.append(listener)
+
+    def remove_mutation_listener(self, listener) -> None:
+        if listener in self._mutation_listeners:
+            self._mutation_listeners.remove(listener)
+
+    def _notify_mutation(self, endpoint: str, payload: dict) -> None:
+        for listener in list(self._mutation_listeners):
+            listener(endpoint, payload)
 
     @allure.step("Assign license to a user")
-    def assign_license(self, headers: dict, payload: dict) -> requests.Response:
-        return self.post(self.endpoints.assign_licenses, headers=headers, payload=payload)
+    def assign_license(self, headers: dict, payload: dict) -> ApiResponse:
+        response = self.post(self.endpoints.assign_licenses, headers=headers, payload=payload,
+                             endpoint=Endpoints.ASSIGN_LICENSES)
+        if response.status_code == 200:
+            if isinstance(payload.get("licenseId"), str):
+                self.invalidate_inventory(self._cached_teams_holding([payload["licenseId"]]))
+            elif isinstance(payload.get("license"), dict):
+                self.invalidate_inventory([payload["license"].get("team")])
+            else:
+                self.invalidate_inventory()
+            self._notify_mutation(Endpoints.ASSIGN_LICENSES, payload)
+        return response
 
     @allure.step("Get licenses for the team_id={team_id}")
-    def get_team_licenses(self, headers: dict, team_id: int) -> requests.Response:
-        return self.get(url=self.endpoints.get_team_licenses(team_id), headers=headers)
+    def get_team_licenses(self, headers: dict, team_id: int) -> ApiResponse:
+        return self.get(url=self.endpoints.get_team_licenses(team_id), headers=headers,
+                        endpoint=Endpoints.TEAM_LICENSES)
+
+    def iter_team_licenses(self, headers: dict, team_id: int, chunk_size: int = 64 * 1024):
+        response = self.get_stream(url=self.endpoints.get_team_licenses(team_id), headers=headers,
+                                   endpoint=Endpoints.TEAM_LICENSES)
+        try:
+            assert response.status_code == 200
+            for license_obj in iter_json_array(response.iter_content(chunk_size=chunk_size)):
+                if self.validate_inventory:
+                    license_obj = adapter_for(TeamLicense).validate_python(license_obj)
+                yield license_obj
+        finally:
+            # Closing before the end drops the connection instead of draining the rest of the body
+            response.close()
+
+    @allure.step("Stream licenses for the team_id={team_id} until one matches")
+    def find_team_license(self, headers: dict, team_id: int, predicate) -> TeamLicense:
+        licenses = self.iter_team_licenses(headers=headers, team_id=team_id)
+        try:
+            return next((license_obj for license_obj in licenses if predicate(license_obj)), None)
+        finally:
+            licenses.close()
+
+    def get_team_inventory(self, headers: dict, team_id: int) -> list:
+        key = (team_id, headers.get("X-Customer-Code"))
+        with self._inventory_lock:
+            cached = self._inventory.get(key)
+            if cached is not None and time.monotonic() - cached[0] < self.inventory_ttl:
+                self.cache_hits += 1
+                return cached[1]
+            self.cache_misses += 1
 
-    @allure.step("Find available to assign license for the team_id={team_id}")
-    def get_available_to_assign_team_license_dict(self, headers: dict, team_id: int) -> dict:
         response = self.get_team_licenses(headers=headers, team_id=team_id)
         assert response.status_code == 200
-        for license_obj in response.json():
-            if license_obj["isAvailableToAssign"]:
+        # Schema validation roughly doubles the parse cost of a large list, so the hot path only decodes
+        licenses = response.parse(TeamLicenses) if self.validate_inventory else response.json()
+        with self._inventory_lock:
+            self._inventory[key] = (time.monotonic(), licenses)
+        return licenses
+
+    def invalidate_inventory(self, team_ids=None) -> None:
+        with self._inventory_lock:
+            if team_ids is None:
+                self._inventory.clear()
+                return
+            team_ids = set(team_ids)
+            for key in [key for key in self._inventory if key[0] in team_ids]:
+                del self._inventory[key]
+
+    def _cached_teams_holding(self, license_ids) -> list:
+        license_ids = set(license_ids)
+        with self._inventory_lock:
+            return [key[0] for key, (_, licenses) in self._inventory.items()
+                    if any(license_obj["licenseId"] in license_ids for license_obj in licenses)]
+
+    @allure.step("Find available to assign license for the team_id={team_id}")
+    def get_available_to_assign_team_license_dict(self, headers: dict, team_id: int,
+                                                  stream: bool = False) -> TeamLicense:
+        if stream:
+            license_obj = self.find_team_license(headers=headers, team_id=team_id,
+                                                 predicate=lambda obj: obj["isAvailableToAssign"])
+            if license_obj is not None:
                 return license_obj
+        else:
+            for license_obj in self.get_team_inventory(headers=headers, team_id=team_id):
+                if license_obj["isAvailableToAssign"]:
+                    return license_obj
 
         raise AssertionError(f"No available licenses to assign for team_id={team_id}")
 
@@ -37,5 +211,142 @@ class LicensesApi(ApiClient):
         return self.get_available_to_assign_team_license_dict(headers=headers, team_id=team_id)["product"]["code"]
 
     @allure.step("Change team for licenses")
-    def change_licenses_team(self, headers: dict, payload: dict) -> requests.Response:
-        return self.post(self.endpoints.change_licenses_team, headers=headers, payload=payload)
+    def change_licenses_team(self, headers: dict, payload: dict) -> ApiResponse:
+        response = self.post(self.endpoints.change_licenses_team, headers=headers, payload=payload,
+                             endpoint=Endpoints.CHANGE_LICENSES_TEAM)
+        if response.status_code == 200:
+            license_ids = payload.get("licenseIds") or []
+            self.invalidate_inventory(self._cached_teams_holding(license_ids) + [payload.get("targetTeamId")])
+            self._notify_mutation(Endpoints.CHANGE_LICENSES_TEAM, payload)
+        return response
+
+    def change_licenses_team_bulk(self, headers: dict, license_ids, target_team_id: int,
+                                  chunk_size: int = BULK_CHUNK_SIZE, max_workers: int = BULK_MAX_WORKERS,
+                                  retries: int = BULK_RETRIES, backoff: float = 0.2) -> BulkChangeResult:
+        license_ids = list(dict.fromkeys(license_ids))
+        chunks = [license_ids[start:start + chunk_size] for start in range(0, len(license_ids), chunk_size)]
+        requests_sent = 0
+        lock = threading.Lock()
+        # Set by the first request-level rejection, the chunks after it fail without being sent
+        rejected = {}
+
+        def send(chunk: list) -> dict:
+            nonlocal requests_sent
+            payload = {"licenseIds": chunk, "targetTeamId": target_team_id}
+            for attempt in range(retries + 1):
+                if rejected:
+                    return dict.fromkeys(chunk, rejected["outcome"])
+                if attempt:
+                    time.sleep(backoff * 2 ** (attempt - 1))
+                with lock:
+                    requests_sent += 1
+                try:
+                    response = self.change_licenses_team(headers=headers, payload=payload)
+                except requests.RequestException as error:
+                    status, code = None, type(error).__name__
+                    # The move may have gone through before the connection broke, resending it would only be
+                    # told the licenses are already in the team
+                    if self._all_in_team(headers, chunk, target_team_id):
+                        return dict.fromkeys(chunk, LicenseOutcome(200, None))
+                    continue
+                if response.status_code == 200:
+                    return dict.fromkeys(chunk, LicenseOutcome(200, None))
+                status, code = response.status_code, error_code(response)
+                if status not in TRANSIENT_STATUSES:
+                    break
+
+            if status == 400 and code not in LICENSE_REJECTIONS:
+                rejected.setdefault("outcome", LicenseOutcome(status, code))
+            # A chunk is applied all-or-nothing, so a rejected one is split until the offending licenses are alone
+            elif len(chunk) > 1 and status == 400:
+                middle = len(chunk) // 2
+                return {**send(chunk[:middle]), **send(chunk[middle:])}
+            return dict.fromkeys(chunk, LicenseOutcome(status, code))
+
+        with allure.step(f"Change team for {len(license_ids)} licenses in {len(chunks)} chunks"):
+            started = time.perf_counter()
+            outcomes = {}
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+                for chunk_outcomes in executor.map(send, chunks):
+                    outcomes.update(chunk_outcomes)
+            result = BulkChangeResult(target_team_id=target_team_id,
+                                      outcomes={license_id: outcomes[license_id] for license_id in license_ids},
+                                      elapsed=time.perf_counter() - started, requests_sent=requests_sent)
+            allure.attach(json.dumps(result.summary(), indent=2), name="Bulk change team result",
+                          attachment_type=allure.attachment_type.JSON)
+        return result
+
+    def _all_in_team(self, headers: dict, license_ids: list, team_id: int) -> bool:
+        # A chunk moves all-or-nothing, so either every license of it is in the target team or none was moved
+        try:
+            response = self.get_team_licenses(headers=headers, team_id=team_id)
+        except requests.RequestException:
+            return False
+        if response.status_code != 200:
+            return False
+        team_license_ids = {license_obj["licenseId"] for license_obj in response.json()}
+        return all(license_id in team_license_ids for license_id in license_ids)
+
+    def assign_licenses_bulk(self, headers: dict, contacts, team_id: int, product_code: str = None,
+                             max_workers: int = BULK_MAX_WORKERS, send_email: bool = False, pool=None,
+                             reassign_attempts: int = 3):
+        # license_pool imports this module, hence the late import
+        from services.licenses.license_pool import LicensePool
+
+        pool = pool or LicensePool(api=self, headers=headers, worker_index=0, worker_count=1)
+        if hasattr(contacts, "read"):
+            contacts = csv.DictReader(contacts)
+        exhausted = set()
+
+        def assign(contact: dict) -> AssignOutcome:
+            if any(not contact.get(field) for field in CONTACT_FIELDS):
+                return AssignOutcome(contact, None, None, "MISSING_CONTACT_FIELD")
+            contact_product_code = contact.get("productCode") or product_code
+            outcome = None
+            for _ in range(reassign_attempts + 1):
+                if contact_product_code in exhausted:
+                    return AssignOutcome(contact, None, None, "NO_AVAILABLE_LICENSE")
+                try:
+                    license_id = pool.acquire(team_id, contact_product_code)
+                except AssertionError:
+                    exhausted.add(contact_product_code)
+                    return AssignOutcome(contact, None, None, "NO_AVAILABLE_LICENSE")
+
+                payload = Payloads.get_assign_license_payload(contact, license_id, send_email=send_email)
+                try:
+                    response = self.post(self.endpoints.assign_licenses, headers=headers, payload=payload,
+                                         endpoint=Endpoints.ASSIGN_LICENSES)
+                except requests.RequestException as error:
+                    # Not retried, the assignment may have gone through before the connection broke
+                    return AssignOutcome(contact, license_id, None, type(error).__name__)
+                if response.status_code == 200:
+                    self._notify_mutation(Endpoints.ASSIGN_LICENSES, payload)
+                    return AssignOutcome(contact, license_id, 200, None)
+
+                outcome = AssignOutcome(contact, license_id, response.status_code, error_code(response))
+                # Someone else took the license first, nothing was assigned so another one can be tried
+                if outcome.code == "LICENSE_IS_NOT_AVAILABLE_TO_ASSIGN":
+                    continue
+                # Any other rejection of the row left the license free for the next contact
+                if 400 <= response.status_code < 500:
+                    pool.release(license_id)
+                return outcome
+            return outcome
+
+        # At most two contacts per worker are in flight, the input is read only as fast as it is assigned
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        pending = set()
+        try:
+            for contact in contacts:
+                if len(pending) >= 2 * max_workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    yield from (future.result() for future in done)
+                pending.add(executor.submit(assign, contact))
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from (future.result() for future in done)
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            self.invalidate_inventory([team_id])
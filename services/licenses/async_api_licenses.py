@@ -0,0 +1,30 @@
+import allure
+import httpx
+
+from services.licenses.endpoints import Endpoints
+from utils.api_response import ApiResponse
+from utils.async_api_client import AsyncApiClient
+
+
+class AsyncLicensesApi(AsyncApiClient):
+
+    def __init__(self, client: httpx.AsyncClient = None, transport: httpx.AsyncBaseTransport = None,
+                 base_url: str = None, **kwargs):
+        super().__init__(client=client, transport=transport, **kwargs)
+        self.endpoints = Endpoints(base_url)
+
+    # allure.step as a decorator closes the step before a coroutine is awaited, so steps are opened inline
+    async def assign_license(self, headers: dict, payload: dict) -> ApiResponse:
+        with allure.step("Assign license to a user"):
+            return await self.post(self.endpoints.assign_licenses, headers=headers, payload=payload,
+                                   endpoint=Endpoints.ASSIGN_LICENSES)
+
+    async def get_team_licenses(self, headers: dict, team_id: int) -> ApiResponse:
+        with allure.step(f"Get licenses for the team_id={team_id}"):
+            return await self.get(url=self.endpoints.get_team_licenses(team_id), headers=headers,
+                                  endpoint=Endpoints.TEAM_LICENSES)
+
+    async def change_licenses_team(self, headers: dict, payload: dict) -> ApiResponse:
+        with allure.step("Change team for licenses"):
+            return await self.post(self.endpoints.change_licenses_team, headers=headers, payload=payload,
+                                   endpoint=Endpoints.CHANGE_LICENSES_TEAM)
@@ -1,8 +1,23 @@
-from config.constants import BASE_URL
+from config import constants
 
 
 class Endpoints:
 
-    assign_licenses = f"{BASE_URL}/customer/licenses/assign"
-    get_team_licenses = lambda self, team_id: f"{BASE_URL}/customer/teams/{team_id}/licenses"
-    change_licenses_team = f"{BASE_URL}/customer/changeLicensesTeam"
\ No newline at end of file
+    ASSIGN_LICENSES = "/customer/licenses/assign"
+    TEAM_LICENSES = "/customer/teams/{team_id}/licenses"
+    CHANGE_LICENSES_TEAM = "/customer/changeLicensesTeam"
+    # Short names used by latency budgets
+    NAMES = {
+        "assign": ASSIGN_LICENSES,
+        "team_licenses": TEAM_LICENSES,
+        "change_team": CHANGE_LICENSES_TEAM,
+    }
+
+    def __init__(self, base_url: str = None):
+        # Resolved per instance, so BASE_URL can be pointed at the local stub after import
+        self.base_url = base_url or constants.BASE_URL
+        self.assign_licenses = f"{self.base_url}{self.ASSIGN_LICENSES}"
+        self.change_licenses_team = f"{self.base_url}{self.CHANGE_LICENSES_TEAM}"
+
+    def get_team_licenses(self, team_id: int) -> str:
+        return f"{self.base_url}{self.TEAM_LICENSES.format(team_id=team_id)}"
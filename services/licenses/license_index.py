@@ -0,0 +1,182 @@
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import allure
+
+from services.licenses.api_licenses import LicensesApi
+from services.licenses.endpoints import Endpoints
+
+
+class LicenseIndex:
+
+    def __init__(self):
+        self.licenses = {}
+        self.stale_teams = set()
+        self._team_ids = {}
+        self._by_product = defaultdict(set)
+        self._by_team = defaultdict(set)
+        self._by_assignee = defaultdict(set)
+        self._available = set()
+        # Dicts as insertion-ordered sets: the first available license of a bucket is an O(1), repeatable pick
+        self._available_by_team = defaultdict(dict)
+        self._available_by_team_product = defaultdict(dict)
+        self._lock = threading.RLock()
+
+    @classmethod
+    @allure.step("Build license index for the team_ids={team_ids}")
+    def build(cls, api: LicensesApi, headers: dict, team_ids, max_workers: int = 8) -> "LicenseIndex":
+        index = cls()
+        index.refresh(api=api, headers=headers, team_ids=team_ids, max_workers=max_workers)
+        return index
+
+    def refresh(self, api: LicensesApi, headers: dict, team_ids=None, max_workers: int = 8) -> None:
+        # Only the given teams (default: the ones marked stale) are re-fetched, the rest of the index is kept
+        team_ids = list(self.stale_teams if team_ids is None else team_ids)
+        if not team_ids:
+            return
+
+        def fetch(team_id):
+            response = api.get_team_licenses(headers=headers, team_id=team_id)
+            assert response.status_code == 200, f"Failed to fetch licenses for team_id={team_id}"
+            return team_id, response.json()
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(team_ids))) as executor:
+            fetched = list(executor.map(fetch, team_ids))
+
+        with self._lock:
+            for team_id, licenses in fetched:
+                for license_id in list(self._by_team.get(team_id, ())):
+                    self._remove(license_id)
+                for license_obj in licenses:
+                    self._add(license_obj, team_id)
+                self.stale_teams.discard(team_id)
+
+    def attach(self, api: LicensesApi) -> "LicenseIndex":
+        api.add_mutation_listener(self.apply_mutation)
+        return self
+
+    def detach(self, api: LicensesApi) -> None:
+        api.remove_mutation_listener(self.apply_mutation)
+
+    def apply_mutation(self, endpoint: str, payload: dict) -> None:
+        if endpoint == Endpoints.ASSIGN_LICENSES:
+            self.apply_assignment(payload)
+        elif endpoint == Endpoints.CHANGE_LICENSES_TEAM:
+            self.apply_team_change(payload["licenseIds"], payload["targetTeamId"])
+
+    def apply_assignment(self, payload: dict) -> None:
+        with self._lock:
+            license_id = payload.get("licenseId")
+            if license_id not in self.licenses:
+                # Assignment by productCode + team: the server picked the license, the team has to be re-read
+                team_id = (payload.get("license") or {}).get("team")
+                if team_id in self._by_team:
+                    self.stale_teams.add(team_id)
+                return
+            license_obj = dict(self.licenses[license_id])
+            contact = payload.get("contact") or {}
+            license_obj["isAvailableToAssign"] = False
+            license_obj["assignee"] = {
+                "type": "USER",
+                "email": contact.get("email"),
+                "name": f"{contact.get('firstName', '')} {contact.get('lastName', '')}".strip(),
+            }
+            team_id = self._team_ids[license_id]
+            self._remove(license_id)
+            self._add(license_obj, team_id)
+
+    def apply_team_change(self, license_ids, target_team_id: int) -> None:
+        with self._lock:
+            for license_id in license_ids:
+                license_obj = self.licenses.get(license_id)
+                if license_obj is None:
+                    # Moved in from a team the index doesn't hold, only a re-read of the target knows the license
+                    if target_team_id in self._by_team:
+                        self.stale_teams.add(target_team_id)
+                    continue
+                license_obj = dict(license_obj)
+                license_obj["team"] = {**(license_obj.get("team") or {}), "id": target_team_id}
+                self._remove(license_id)
+                self._add(license_obj, target_team_id)
+
+    # Mutation listeners run on bulk worker threads, every read copies under the lock
+    def get(self, license_id: str) -> dict:
+        with self._lock:
+            return self.licenses.get(license_id)
+
+    def by_product(self, product_code: str) -> set:
+        with self._lock:
+            return set(self._by_product.get(product_code, ()))
+
+    def by_team(self, team_id: int) -> set:
+        with self._lock:
+            return set(self._by_team.get(team_id, ()))
+
+    def by_assignee(self, email: str) -> set:
+        with self._lock:
+            return set(self._by_assignee.get(email.lower(), ()))
+
+    def available(self, team_id: int = None, product_code: str = None) -> set:
+        with self._lock:
+            if team_id is not None and product_code is not None:
+                return set(self._available_by_team_product.get((team_id, product_code), ()))
+            available = self._available
+            if team_id is not None:
+                available = self._available_by_team.get(team_id, {}).keys()
+            if product_code is not None:
+                available = available & self._by_product.get(product_code, set())
+            return set(available)
+
+    def first_available(self, team_id: int, product_code: str = None) -> str:
+        with self._lock:
+            if product_code is not None:
+                candidates = self._available_by_team_product.get((team_id, product_code), {})
+            else:
+                candidates = self._available_by_team.get(team_id, {})
+            return next(iter(candidates), None)
+
+    def count_available(self, team_id: int = None, product_code: str = None) -> int:
+        with self._lock:
+            if team_id is None and product_code is None:
+                return len(self._available)
+            if team_id is not None and product_code is not None:
+                return len(self._available_by_team_product.get((team_id, product_code), ()))
+            if product_code is None:
+                return len(self._available_by_team.get(team_id, ()))
+            return len(self.available(team_id=team_id, product_code=product_code))
+
+    def __len__(self):
+        with self._lock:
+            return len(self.licenses)
+
+    def _add(self, license_obj: dict, team_id: int) -> None:
+        license_id = license_obj["licenseId"]
+        product_code = license_obj["product"]["code"]
+        if license_id in self.licenses:
+            # Re-read under another team after a move, the old team's entry is gone
+            self._remove(license_id)
+        self.licenses[license_id] = license_obj
+        self._team_ids[license_id] = team_id
+        self._by_product[product_code].add(license_id)
+        self._by_team[team_id].add(license_id)
+        email = (license_obj.get("assignee") or {}).get("email")
+        if email:
+            self._by_assignee[email.lower()].add(license_id)
+        if license_obj["isAvailableToAssign"]:
+            self._available.add(license_id)
+            self._available_by_team[team_id][license_id] = None
+            self._available_by_team_product[(team_id, product_code)][license_id] = None
+
+    def _remove(self, license_id: str) -> None:
+        license_obj = self.licenses.pop(license_id)
+        team_id = self._team_ids.pop(license_id)
+        product_code = license_obj["product"]["code"]
+        self._by_product[product_code].discard(license_id)
+        self._by_team[team_id].discard(license_id)
+        self._available_by_team[team_id].pop(license_id, None)
+        self._available_by_team_product[(team_id, product_code)].pop(license_id, None)
+        email = (license_obj.get("assignee") or {}).get("email")
+        if email:
+            self._by_assignee[email.lower()].discard(license_id)
+        self._available.discard(license_id)
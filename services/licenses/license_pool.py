@@ -0,0 +1,107 @@
+import os
+import threading
+import zlib
+from collections import defaultdict, deque
+
+import allure
+
+from config.constants import LICENSE_POOL_LOW_WATERMARK
+from services.licenses.api_licenses import LicensesApi
+
+
+def xdist_worker() -> tuple:
+    worker = os.getenv("PYTEST_XDIST_WORKER", "gw0")
+    return int(worker.lstrip("gw") or 0), int(os.getenv("PYTEST_XDIST_WORKER_COUNT", "1"))
+
+
+class LicensePool:
+
+    def __init__(self, api: LicensesApi, headers: dict, low_watermark: int = LICENSE_POOL_LOW_WATERMARK,
+                 worker_index: int = None, worker_count: int = None):
+        self.api = api
+        self.headers = headers
+        self.low_watermark = low_watermark
+        default_index, default_count = xdist_worker()
+        self.worker_index = default_index if worker_index is None else worker_index
+        self.worker_count = default_count if worker_count is None else worker_count
+        self.refills = 0
+        self._available = defaultdict(deque)
+        self._by_product = defaultdict(lambda: defaultdict(deque))
+        self._product_codes = {}
+        self._teams = {}
+        self._issued = set()
+        self._issued_since_refill = defaultdict(int)
+        self._loaded = set()
+        self._lock = threading.Lock()
+
+    def acquire(self, team_id: int, product_code: str = None) -> str:
+        with self._lock:
+            if team_id not in self._loaded:
+                self._refill(team_id)
+            queue = self._queue(team_id, product_code)
+            if not queue or (len(queue) < self.low_watermark
+                             and self._issued_since_refill[team_id] >= self.low_watermark):
+                self._refill(team_id)
+                queue = self._queue(team_id, product_code)
+
+            # Ids are queued both per team and per product, so stale entries are skipped lazily
+            while queue:
+                license_id = queue.popleft()
+                if license_id not in self._issued:
+                    self._issued.add(license_id)
+                    self._issued_since_refill[team_id] += 1
+                    return license_id
+
+        product = f" and product_code={product_code}" if product_code else ""
+        raise AssertionError(f"No available licenses to assign for team_id={team_id}{product}")
+
+    def release(self, license_id: str) -> None:
+        # Only for licenses the server never consumed (the request was rejected), they go back to the front
+        with self._lock:
+            if license_id not in self._issued:
+                return
+            self._issued.discard(license_id)
+            team_id = self._teams[license_id]
+            self._available[team_id].appendleft(license_id)
+            self._by_product[team_id][self._product_codes[license_id]].appendleft(license_id)
+
+    def invalidate(self, team_id: int) -> None:
+        # For assignments the server picked the license of, the next acquire reloads the team instead of handing
+        # it out again
+        with self._lock:
+            self._loaded.discard(team_id)
+
+    def owns(self, license_id: str) -> bool:
+        # Stable across processes (unlike hash()), so every worker sees a disjoint share of the same inventory
+        return zlib.crc32(license_id.encode()) % self.worker_count == self.worker_index
+
+    def product_code(self, license_id: str) -> str:
+        return self._product_codes[license_id]
+
+    def _queue(self, team_id: int, product_code: str = None) -> deque:
+        if product_code is None:
+            return self._available[team_id]
+        return self._by_product[team_id][product_code]
+
+    @allure.step("Refill license pool for the team_id={team_id}")
+    def _refill(self, team_id: int) -> None:
+        self.api.invalidate_inventory([team_id])
+        available = deque()
+        by_product = defaultdict(deque)
+        for license_obj in self.api.get_team_inventory(headers=self.headers, team_id=team_id):
+            license_id = license_obj["licenseId"]
+            if not license_obj["isAvailableToAssign"] or license_id in self._issued:
+                continue
+            if not self.owns(license_id):
+                continue
+            product_code = license_obj["product"]["code"]
+            self._product_codes[license_id] = product_code
+            self._teams[license_id] = team_id
+            available.append(license_id)
+            by_product[product_code].append(license_id)
+
+        self._available[team_id] = available
+        self._by_product[team_id] = by_product
+        self._issued_since_refill[team_id] = 0
+        self._loaded.add(team_id)
+        self.refills += 1
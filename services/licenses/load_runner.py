@@ -0,0 +1,213 @@
+import argparse
+import json
+import threading
+import time
+from collections import Counter
+
+import allure
+import requests
+
+from config import constants
+from config.constants import TEAM_1_ID, TEAM_2_ID
+from config.headers import Headers
+from services.licenses.api_licenses import LicensesApi, error_code
+from services.licenses.license_pool import LicensePool
+from services.licenses.payloads import Payloads
+from utils.api_client import ApiClient
+from utils.api_response import ApiResponse
+from utils.metrics import HISTOGRAM_BOUNDS_MS, LatencyHistogram
+from utils.rate_limiter import CircuitOpenError
+
+
+class LoadRunner:
+
+    scenarios = ("assign_storm", "bulk_transfer", "inventory_polling")
+
+    def __init__(self, scenario: str = "inventory_polling", concurrency: int = 8, rps: float = None,
+                 ramp_up: float = 0.0, duration: float = 10.0, team_id: int = TEAM_1_ID,
+                 target_team_id: int = TEAM_2_ID, transfer_batch: int = 10, headers: dict = None,
+                 base_url: str = None):
+        if scenario not in self.scenarios:
+            raise ValueError(f"Unknown scenario {scenario!r}, expected one of {self.scenarios}")
+        self.scenario = scenario
+        self.concurrency = concurrency
+        self.rps = rps
+        self.ramp_up = ramp_up
+        self.duration = duration
+        self.team_id = team_id
+        self.target_team_id = target_team_id
+        self.transfer_batch = transfer_batch
+        self.headers = headers or Headers.org_admin()
+        self.api = LicensesApi(session=ApiClient.build_session(concurrency), base_url=base_url)
+        self.pool = LicensePool(api=self.api, headers=self.headers, worker_index=0, worker_count=1)
+
+        self._latencies = LatencyHistogram()
+        self._status_codes = Counter()
+        self._errors = Counter()
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+        self._started_at = 0.0
+
+    def run(self) -> dict:
+        self._started_at = self._next_slot = time.monotonic()
+        deadline = self._started_at + self.duration
+        workers = [threading.Thread(target=self._worker, args=(index, deadline), daemon=True)
+                   for index in range(self.concurrency)]
+        try:
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        finally:
+            # The runner's own keep-alive pool, the shared one is left to its owner
+            self.api.session.close()
+        report = self.report(time.monotonic() - self._started_at)
+        self.attach_report(report)
+        return report
+
+    def _worker(self, index: int, deadline: float) -> None:
+        # Workers join evenly over the ramp-up window
+        start_at = self._started_at + self.ramp_up * index / self.concurrency
+        time.sleep(max(0.0, start_at - time.monotonic()))
+        state = {}
+        while time.monotonic() < deadline:
+            self._pace()
+            try:
+                # Preparing the request (e.g. a pool refill) is not part of its latency
+                send = getattr(self, f"_{self.scenario}")(state)
+                started = time.perf_counter()
+                response = send()
+            except AssertionError as error:
+                self._record_error("LICENSE_POOL_EXHAUSTED" if "No available" in str(error) else "ASSERTION")
+                break
+            except CircuitOpenError as error:
+                self._record_error(type(error).__name__)
+                # Nothing gets through until the circuit lets a trial request out again
+                time.sleep(max(0.0, min(error.retry_in, deadline - time.monotonic())))
+                continue
+            except requests.RequestException as error:
+                self._record_error(type(error).__name__)
+                continue
+            self._record(response, (time.perf_counter() - started) * 1000)
+
+    def _pace(self) -> None:
+        if not self.rps:
+            return
+        # A shared schedule of send slots, the rate itself ramps up linearly with the workers
+        with self._lock:
+            now = time.monotonic()
+            ramp = min(1.0, (now - self._started_at) / self.ramp_up) if self.ramp_up else 1.0
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + 1 / (self.rps * max(ramp, 0.05))
+        time.sleep(max(0.0, slot - time.monotonic()))
+
+    # Scenarios prepare a request and return the call that sends it
+
+    def _assign_storm(self, state: dict):
+        payload = Payloads.get_base_assign_license_payload()
+        payload["licenseId"] = self.pool.acquire(self.team_id)
+        return lambda: self.api.assign_license(headers=self.headers, payload=payload)
+
+    def _bulk_transfer(self, state: dict):
+        # Each worker keeps its own batch and moves it back and forth, so the scenario never drains a team
+        if "license_ids" not in state:
+            state["license_ids"] = [self.pool.acquire(self.team_id) for _ in range(self.transfer_batch)]
+            state["target"] = self.target_team_id
+        payload = {"licenseIds": state["license_ids"], "targetTeamId": state["target"]}
+
+        def send() -> ApiResponse:
+            response = self.api.change_licenses_team(headers=self.headers, payload=payload)
+            if response.status_code == 200:
+                state["target"] = self.team_id if state["target"] == self.target_team_id else self.target_team_id
+            return response
+
+        return send
+
+    def _inventory_polling(self, state: dict):
+        return lambda: self.api.get_team_licenses(headers=self.headers, team_id=self.team_id)
+
+    def _record(self, response: ApiResponse, latency_ms: float) -> None:
+        code = error_code(response) if response.status_code >= 400 else None
+        with self._lock:
+            self._latencies.record_ms(latency_ms)
+            self._status_codes[response.status_code] += 1
+            if code:
+                self._errors[code] += 1
+
+    def _record_error(self, code: str) -> None:
+        with self._lock:
+            self._errors[code] += 1
+
+    def report(self, elapsed: float) -> dict:
+        with self._lock:
+            latencies = LatencyHistogram()
+            latencies.merge(self._latencies)
+            status_codes = dict(self._status_codes)
+            errors = dict(self._errors)
+
+        summary = latencies.summary()
+        return {
+            "scenario": self.scenario,
+            "concurrency": self.concurrency,
+            "target_rps": self.rps,
+            "ramp_up_s": self.ramp_up,
+            "duration_s": round(elapsed, 3),
+            "requests": latencies.count,
+            "throughput_rps": round(latencies.count / elapsed, 2) if elapsed else 0.0,
+            "status_codes": {str(status): count for status, count in sorted(status_codes.items())},
+            "errors": errors,
+            "latency_ms": {
+                "min": summary["min_ms"],
+                "p50": summary["p50_ms"],
+                "p95": summary["p95_ms"],
+                "p99": summary["p99_ms"],
+                "max": summary["max_ms"],
+            },
+            "histogram": latencies.buckets_ms(HISTOGRAM_BOUNDS_MS),
+        }
+
+    @staticmethod
+    def attach_report(report: dict) -> None:
+        allure.attach(json.dumps(report, indent=2), name=f"Load report: {report['scenario']}",
+                      attachment_type=allure.attachment_type.JSON)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate load against the licenses API")
+    parser.add_argument("--scenario", choices=LoadRunner.scenarios, default="inventory_polling")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rps", type=float, default=None, help="Target request rate, unlimited if omitted")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="Seconds to reach full concurrency and rate")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run")
+    parser.add_argument("--team-id", type=int, default=TEAM_1_ID)
+    parser.add_argument("--target-team-id", type=int, default=TEAM_2_ID)
+    parser.add_argument("--transfer-batch", type=int, default=10)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--licenses-stub", action="store_true",
+                        help="Run against an in-process stand-in of the licenses API")
+    args = parser.parse_args()
+
+    stub = None
+    if args.licenses_stub:
+        from services.licenses.stub_server import LicensesStubServer, LicensesStubState, use_stub_credentials
+        use_stub_credentials()
+        stub = LicensesStubServer(state=LicensesStubState(licenses_per_team=10000)).start()
+        constants.BASE_URL = stub.base_url
+
+    try:
+        report = LoadRunner(scenario=args.scenario, concurrency=args.concurrency, rps=args.rps,
+                            ramp_up=args.ramp_up, duration=args.duration, team_id=args.team_id,
+                            target_team_id=args.target_team_id, transfer_batch=args.transfer_batch).run()
+    finally:
+        if stub is not None:
+            stub.stop()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+from typing import List, Optional
+
+from pydantic import TypeAdapter
+from typing_extensions import NotRequired, TypedDict
+
+
+# TypedDicts rather than BaseModels: validated by pydantic-core straight from bytes at about json.loads cost,
+# building tens of thousands of model instances per inventory fetch was several times slower
+class Product(TypedDict):
+    code: str
+    name: NotRequired[Optional[str]]
+
+
+class Team(TypedDict):
+    id: int
+    name: NotRequired[Optional[str]]
+
+
+class Assignee(TypedDict, total=False):
+    type: Optional[str]
+    email: Optional[str]
+    name: Optional[str]
+
+
+class TeamLicense(TypedDict):
+    licenseId: str
+    product: Product
+    team: NotRequired[Optional[Team]]
+    assignee: NotRequired[Optional[Assignee]]
+    isAvailableToAssign: bool
+    isTransferableBetweenTeams: NotRequired[Optional[bool]]
+    isSuspended: NotRequired[Optional[bool]]
+    isTrial: NotRequired[Optional[bool]]
+
+
+TeamLicenses = TypeAdapter(List[TeamLicense])
@@ -0,0 +1,126 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+import allure
+
+from config.constants import RBAC_MAX_WORKERS, TEAM_1_ID, TEAM_2_ID
+from config.headers import Headers
+from services.licenses.api_licenses import LicensesApi
+from services.licenses.endpoints import Endpoints
+from services.licenses.payloads import Payloads
+
+ROLES = {
+    "org_admin": Headers.org_admin,
+    "team_admin": Headers.team_admin,
+    "team_viewer": Headers.team_viewer,
+}
+ALLOWED_STATUS = 200
+DENIED_STATUS = 403
+
+
+def _assign(api: LicensesApi, headers: dict, license_id: str):
+    payload = Payloads.get_base_assign_license_payload()
+    payload["licenseId"] = license_id
+    return api.assign_license(headers=headers, payload=payload)
+
+
+def _change_team(api: LicensesApi, headers: dict, license_id: str):
+    return api.change_licenses_team(headers=headers, payload={"licenseIds": [license_id], "targetTeamId": TEAM_2_ID})
+
+
+class RbacOperation(NamedTuple):
+    name: str
+    method: str
+    endpoint: str
+    allowed: frozenset
+    send: object
+    # Team the operation needs a free license of, None when it doesn't touch one
+    license_team: int = None
+
+
+# One line per operation, a role is denied everything it isn't listed under
+OPERATIONS = (
+    RbacOperation("assign_license", "POST", Endpoints.ASSIGN_LICENSES,
+                  frozenset({"org_admin", "team_admin"}), _assign, license_team=TEAM_1_ID),
+    RbacOperation("change_licenses_team", "POST", Endpoints.CHANGE_LICENSES_TEAM,
+                  frozenset({"org_admin"}), _change_team, license_team=TEAM_1_ID),
+    RbacOperation("get_own_team_licenses", "GET", Endpoints.TEAM_LICENSES,
+                  frozenset({"org_admin", "team_admin", "team_viewer"}),
+                  lambda api, headers, _: api.get_team_licenses(headers=headers, team_id=TEAM_1_ID)),
+    RbacOperation("get_other_team_licenses", "GET", Endpoints.TEAM_LICENSES,
+                  frozenset({"org_admin"}),
+                  lambda api, headers, _: api.get_team_licenses(headers=headers, team_id=TEAM_2_ID)),
+)
+
+
+class RbacCell(NamedTuple):
+    role: str
+    operation: RbacOperation
+
+    @property
+    def id(self) -> str:
+        return f"{self.role}-{self.operation.name}"
+
+    @property
+    def expected_status(self) -> int:
+        return ALLOWED_STATUS if self.role in self.operation.allowed else DENIED_STATUS
+
+
+class RbacResult(NamedTuple):
+    cell: RbacCell
+    response: object
+    error: BaseException
+    elapsed: float
+
+
+def cells(roles: dict = None, operations: tuple = OPERATIONS) -> list:
+    return [RbacCell(role, operation) for operation in operations for role in (roles or ROLES)]
+
+
+class RbacMatrix:
+
+    def __init__(self, api: LicensesApi, license_pool, roles: dict = None, max_workers: int = RBAC_MAX_WORKERS):
+        self.api = api
+        self.license_pool = license_pool
+        self.roles = roles or ROLES
+        self.max_workers = max_workers
+
+    @allure.step("Run the RBAC matrix ({count} cells)")
+    def _dispatch(self, count: int, work: list) -> dict:
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, count))) as executor:
+            return dict(zip((cell for cell, _ in work), executor.map(self._send, work)))
+
+    def run(self, matrix_cells: list) -> dict:
+        # Every license is taken up front from the pool's one inventory snapshot, no cell looks anything up itself.
+        # Allowed cells consume theirs, denied ones are rejected before the license is touched and share one per team
+        shared = {}
+        work = []
+        for cell in matrix_cells:
+            team_id = cell.operation.license_team
+            if team_id is None:
+                license_id = None
+            elif cell.expected_status == ALLOWED_STATUS:
+                license_id = self.license_pool.acquire(team_id)
+            else:
+                if team_id not in shared:
+                    shared[team_id] = self.license_pool.acquire(team_id)
+                license_id = shared[team_id]
+            work.append((cell, license_id))
+
+        results = self._dispatch(len(work), work)
+        for license_id in shared.values():
+            users = [results[cell] for cell, cell_license_id in work if cell_license_id == license_id]
+            # Still free unless a denied cell was let through or its request broke off
+            if all(result.response is not None and result.response.status_code == DENIED_STATUS for result in users):
+                self.license_pool.release(license_id)
+        return results
+
+    def _send(self, item: tuple) -> RbacResult:
+        cell, license_id = item
+        started = time.perf_counter()
+        try:
+            response = cell.operation.send(self.api, self.roles[cell.role](), license_id)
+        except Exception as error:
+            return RbacResult(cell, None, error, time.perf_counter() - started)
+        return RbacResult(cell, response, None, time.perf_counter() - started)
@@ -0,0 +1,430 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from config.constants import TEAM_1_ID, TEAM_2_ID
+from config.headers import Headers
+
+ORG_ADMIN = "org_admin"
+TEAM_ADMIN = "team_admin"
+TEAM_VIEWER = "team_viewer"
+
+API_PREFIX = "/api/v1"
+TEAM_LICENSES_PATH = re.compile(r"^/customer/teams/(-?\d+)/licenses$")
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+PRODUCTS = {
+    "II": "IntelliJ IDEA Ultimate",
+    "PC": "PyCharm Professional",
+    "WS": "WebStorm",
+}
+
+
+class StubError(Exception):
+
+    def __init__(self, status: int, code: str, description: str, headers: dict = None):
+        super().__init__(description)
+        self.status = status
+        self.code = code
+        self.description = description
+        self.headers = headers
+
+    def body(self) -> dict:
+        return {"code": self.code, "description": self.description}
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_filled_str(value) -> bool:
+    return isinstance(value, str) and bool(value.strip())
+
+
+class LicensesStubState:
+
+    def __init__(self, teams: dict = None, licenses_per_team: int = 200, products: dict = None):
+        self.products = products or PRODUCTS
+        self.teams = {}
+        self.licenses = {}
+        self._team_licenses = {}
+        self._serialized = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        for team_id, team_name in (teams or {TEAM_1_ID: "Team 1", TEAM_2_ID: "Team 2"}).items():
+            self.add_team(team_id, team_name)
+            product_codes = itertools.cycle(self.products)
+            for _ in range(licenses_per_team):
+                self.add_license(team_id, next(product_codes))
+
+    def add_team(self, team_id: int, name: str) -> None:
+        with self._lock:
+            self.teams[team_id] = name
+            self._team_licenses.setdefault(team_id, {})
+
+    def add_license(self, team_id: int, product_code: str, available: bool = True) -> str:
+        with self._lock:
+            license_id = f"STUB{next(self._ids):06d}"
+            self.licenses[license_id] = {
+                "licenseId": license_id,
+                "product": {"code": product_code, "name": self.products.get(product_code, product_code)},
+                "team": {"id": team_id, "name": self.teams[team_id]},
+                "assignee": None,
+                "isAvailableToAssign": available,
+                "isTransferableBetweenTeams": True,
+                "isSuspended": False,
+                "isTrial": False,
+            }
+            self._team_licenses[team_id][license_id] = None
+            self._serialized.pop(team_id, None)
+            return license_id
+
+    def team_licenses_body(self, team_id: int) -> bytes:
+        # Serialized lists are cached until the team is mutated, listing is the hottest read
+        with self._lock:
+            if team_id not in self.teams:
+                raise StubError(404, "TEAM_NOT_FOUND", f"Team {team_id} not found")
+            body = self._serialized.get(team_id)
+            if body is None:
+                licenses = [self.licenses[license_id] for license_id in self._team_licenses[team_id]]
+                body = self._serialized[team_id] = json.dumps(licenses).encode()
+            return body
+
+    def assign(self, payload: dict, team_scope=None) -> None:
+        with self._lock:
+            if "licenseId" in payload:
+                license_obj = self.licenses.get(payload["licenseId"])
+                if license_obj is None:
+                    raise StubError(400, "LICENSE_NOT_FOUND", f"License {payload['licenseId']} not found")
+            else:
+                license_obj = self._first_available(payload["license"]["team"], payload["license"]["productCode"])
+
+            team_id = license_obj["team"]["id"]
+            if team_scope is not None and team_id not in team_scope:
+                raise StubError(403, "ACCESS_DENIED", f"No permission to manage team {team_id}")
+            if not license_obj["isAvailableToAssign"]:
+                raise StubError(400, "LICENSE_IS_NOT_AVAILABLE_TO_ASSIGN",
+                                f"License {license_obj['licenseId']} is not available to assign")
+
+            contact = payload["contact"]
+            license_obj["isAvailableToAssign"] = False
+            license_obj["assignee"] = {
+                "type": "USER",
+                "email": contact["email"],
+                "name": f"{contact['firstName']} {contact['lastName']}",
+            }
+            self._serialized.pop(team_id, None)
+
+    def _first_available(self, team_id: int, product_code: str) -> dict:
+        if team_id not in self.teams:
+            raise StubError(400, "TEAM_NOT_FOUND", f"Team {team_id} not found")
+        for license_id in self._team_licenses[team_id]:
+            license_obj = self.licenses[license_id]
+            if license_obj["isAvailableToAssign"] and license_obj["product"]["code"] == product_code:
+                return license_obj
+        raise StubError(400, "NO_AVAILABLE_LICENSE_TO_ASSIGN",
+                        f"No available {product_code} licenses in team {team_id}")
+
+    def change_team(self, license_ids: list, target_team_id: int) -> None:
+        # All-or-nothing: every license is checked before any of them moves
+        with self._lock:
+            if target_team_id not in self.teams:
+                raise StubError(400, "TEAM_NOT_FOUND", f"Team {target_team_id} not found")
+            for license_id in license_ids:
+                license_obj = self.licenses.get(license_id)
+                if license_obj is None:
+                    raise StubError(400, "LICENSE_NOT_FOUND", f"License {license_id} not found")
+                if license_obj["team"]["id"] == target_team_id:
+                    raise StubError(400, "LICENSE_ALREADY_IN_TEAM",
+                                    f"License {license_id} already belongs to team {target_team_id}")
+                if not license_obj["isTransferableBetweenTeams"]:
+                    raise StubError(400, "LICENSE_IS_NOT_TRANSFERABLE", f"License {license_id} is not transferable")
+
+            for license_id in license_ids:
+                license_obj = self.licenses[license_id]
+                source_team_id = license_obj["team"]["id"]
+                del self._team_licenses[source_team_id][license_id]
+                self._team_licenses[target_team_id][license_id] = None
+                license_obj["team"] = {"id": target_team_id, "name": self.teams[target_team_id]}
+                self._serialized.pop(source_team_id, None)
+            self._serialized.pop(target_team_id, None)
+
+
+def validate_assign_payload(payload) -> None:
+    if not isinstance(payload, dict):
+        raise StubError(400, "INVALID_REQUEST", "Request body must be a JSON object")
+
+    contact = payload.get("contact")
+    if not isinstance(contact, dict):
+        raise StubError(400, "INVALID_CONTACT", "contact is required")
+    for field in ("email", "firstName", "lastName"):
+        if not _is_filled_str(contact.get(field)):
+            raise StubError(400, "INVALID_CONTACT", f"contact.{field} must be a non-empty string")
+    if not EMAIL_PATTERN.match(contact["email"]):
+        raise StubError(400, "INVALID_CONTACT", "contact.email is not a valid email address")
+
+    for field in ("sendEmail", "includeOfflineActivationCode"):
+        if not isinstance(payload.get(field), bool):
+            raise StubError(400, "INVALID_REQUEST", f"{field} must be a boolean")
+
+    if "licenseId" in payload:
+        if not _is_filled_str(payload["licenseId"]):
+            raise StubError(400, "INVALID_LICENSE_ID", "licenseId must be a non-empty string")
+        return
+
+    license_obj = payload.get("license")
+    if not isinstance(license_obj, dict):
+        raise StubError(400, "INVALID_REQUEST", "Either licenseId or license must be provided")
+    if not _is_filled_str(license_obj.get("productCode")):
+        raise StubError(400, "INVALID_REQUEST", "license.productCode must be a non-empty string")
+    if not _is_int(license_obj.get("team")) or license_obj["team"] <= 0:
+        raise StubError(400, "INVALID_REQUEST", "license.team must be a positive integer")
+
+
+def validate_change_team_payload(payload) -> None:
+    if not isinstance(payload, dict):
+        raise StubError(400, "INVALID_REQUEST", "Request body must be a JSON object")
+    license_ids = payload.get("licenseIds")
+    if not isinstance(license_ids, list) or not license_ids:
+        raise StubError(400, "INVALID_REQUEST", "licenseIds must be a non-empty list")
+    if not all(_is_filled_str(license_id) for license_id in license_ids):
+        raise StubError(400, "INVALID_REQUEST", "licenseIds must contain non-empty strings")
+    if not _is_int(payload.get("targetTeamId")) or payload["targetTeamId"] <= 0:
+        raise StubError(400, "INVALID_REQUEST", "targetTeamId must be a positive integer")
+
+
+STUB_CREDENTIALS = (
+    "ADMIN_CUSTOMER_CODE", "ADMIN_API_KEY",
+    "TEAM_ADMIN_CUSTOMER_CODE", "TEAM_ADMIN_API_KEY",
+    "TEAM_VIEWER_CUSTOMER_CODE", "TEAM_VIEWER_API_KEY",
+)
+
+
+def use_stub_credentials() -> None:
+    for name in STUB_CREDENTIALS:
+        os.environ.setdefault(name, f"stub-{name.lower().replace('_', '-')}")
+
+
+def default_roles() -> dict:
+    roles = {}
+    for role, headers in ((ORG_ADMIN, Headers.org_admin()),
+                          (TEAM_ADMIN, Headers.team_admin()),
+                          (TEAM_VIEWER, Headers.team_viewer())):
+        if headers["X-Customer-Code"] and headers["X-Api-Key"]:
+            team_scope = None if role == ORG_ADMIN else {TEAM_1_ID}
+            roles[(headers["X-Customer-Code"], headers["X-Api-Key"])] = (role, team_scope)
+    return roles
+
+
+class LicensesStubHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+    server_version = "LicensesStub/1.0"
+    # Headers and body go out in one segment, Nagle + delayed ACK would otherwise cap keep-alive at ~25 rps
+    disable_nagle_algorithm = True
+    wbufsize = 64 * 1024
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle(self._get)
+
+    def do_HEAD(self):
+        self._send(200, b"", head=True)
+
+    def do_POST(self):
+        self._handle(self._post)
+
+    def _handle(self, action):
+        stub = self.server.stub
+        stub.simulate_latency()
+        headers = None
+        try:
+            try:
+                stub.admit()
+            except StubError:
+                # Rejected unread, the body still has to be drained to keep the keep-alive stream in sync
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                raise
+            status, body = action(self._path())
+        except StubError as error:
+            status, body, headers = error.status, json.dumps(error.body()).encode(), error.headers
+        self._send(status, body, headers=headers)
+
+    def _path(self) -> str:
+        path = urlsplit(self.path).path
+        return path[len(API_PREFIX):] if path.startswith(API_PREFIX) else path
+
+    def _role(self) -> tuple:
+        credentials = (self.headers.get("X-Customer-Code"), self.headers.get("X-Api-Key"))
+        role = self.server.stub.roles.get(credentials)
+        if role is None:
+            raise StubError(401, "INVALID_CREDENTIALS", "Customer code or API key is invalid")
+        return role
+
+    def _json_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(raw) if raw else None
+        except ValueError:
+            raise StubError(400, "INVALID_REQUEST", "Request body is not valid JSON")
+
+    def _get(self, path: str) -> tuple:
+        match = TEAM_LICENSES_PATH.match(path)
+        if not match:
+            raise StubError(404, "NOT_FOUND", f"Unknown endpoint {path}")
+        role, team_scope = self._role()
+        team_id = int(match.group(1))
+        if team_scope is not None and team_id not in team_scope:
+            raise StubError(403, "ACCESS_DENIED", f"No permission to view team {team_id}")
+        return 200, self.server.stub.state.team_licenses_body(team_id)
+
+    def _post(self, path: str) -> tuple:
+        # The body has to be drained before any early error, otherwise the keep-alive stream desyncs
+        payload = self._json_body()
+        role, team_scope = self._role()
+        state = self.server.stub.state
+
+        if path == "/customer/licenses/assign":
+            if role == TEAM_VIEWER:
+                raise StubError(403, "ACCESS_DENIED", "Team viewers cannot assign licenses")
+            validate_assign_payload(payload)
+            state.assign(payload, team_scope=team_scope)
+            return 200, b""
+
+        if path == "/customer/changeLicensesTeam":
+            if role != ORG_ADMIN:
+                raise StubError(403, "ACCESS_DENIED", "Only organization admins can change licenses team")
+            validate_change_team_payload(payload)
+            state.change_team(payload["licenseIds"], payload["targetTeamId"])
+            return 200, b""
+
+        raise StubError(404, "NOT_FOUND", f"Unknown endpoint {path}")
+
+    def _send(self, status: int, body: bytes, head: bool = False, headers: dict = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if body:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and not head:
+            self.wfile.write(body)
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # Streaming clients hang up once they found what they need, that is not a server error
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+class LicensesStubServer:
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, state: LicensesStubState = None,
+                 roles: dict = None, latency: float = 0.0, jitter: float = 0.0, max_rps: float = None):
+        self.state = state or LicensesStubState()
+        self.roles = default_roles() if roles is None else roles
+        self.latency = latency
+        self.jitter = jitter
+        self.max_rps = max_rps
+        self._faults = deque()
+        self._window = (0, 0)
+        self._admit_lock = threading.Lock()
+        self._httpd = _StubHTTPServer((host, port), LicensesStubHandler)
+        self._httpd.stub = self
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def simulate_latency(self) -> None:
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def inject_fault(self, status: int, times: int = 1, retry_after: str = None,
+                     code: str = "SERVICE_UNAVAILABLE") -> None:
+        # The next `times` requests are answered with `status` before they reach the endpoint
+        headers = {"Retry-After": retry_after} if retry_after is not None else None
+        with self._admit_lock:
+            self._faults.extend(StubError(status, code, f"Injected {status} response", headers) for _ in range(times))
+
+    def admit(self) -> None:
+        with self._admit_lock:
+            if self._faults:
+                raise self._faults.popleft()
+            if not self.max_rps:
+                return
+            # Fixed one-second windows, the way the usual API gateways count
+            second = int(time.monotonic())
+            window, count = self._window
+            count = count + 1 if window == second else 1
+            self._window = (second, count)
+        if count > self.max_rps:
+            raise StubError(429, "TOO_MANY_REQUESTS", f"Rate limit of {self.max_rps} requests/s exceeded",
+                            {"Retry-After": "1"})
+
+    def start(self) -> "LicensesStubServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="licenses-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the JetBrains Account licenses API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--licenses-per-team", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0, help="Fixed delay per request, seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra delay per request, seconds")
+    parser.add_argument("--max-rps", type=float, default=None, help="Answer 429 above this request rate")
+    args = parser.parse_args()
+
+    server = LicensesStubServer(host=args.host, port=args.port,
+                                state=LicensesStubState(licenses_per_team=args.licenses_per_team),
+                                latency=args.latency, jitter=args.jitter, max_rps=args.max_rps)
+    print(f"Serving licenses stub on {server.base_url}, export BASE_URL={server.base_url} to use it")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import json
+
+import allure
+import pytest
+import requests
+from pydantic import TypeAdapter, ValidationError
+from services.licenses.models.assign_licenses_models import ErrorResponse
+from utils import api_response
+from utils.api_response import ApiResponse, adapter_for
+
+ERROR_BODY = {"code": "LICENSE_NOT_FOUND", "description": "Licence «TEST-1» not found"}
+
+
+def raw_response(body: bytes, status: int = 400, encoding: str = None) -> requests.Response:
+    raw = requests.Response()
+    raw.status_code = status
+    raw._content = body
+    raw.headers["Content-Type"] = "application/json"
+    raw.url = "http://stub/customer/licenses/assign"
+    raw.encoding = encoding
+    raw.reason = "Bad Request"
+    return raw
+
+
+@allure.epic("API client")
+@allure.feature("Response decoding")
+class TestApiResponse:
+
+    @allure.title("Status, headers, body and url are copied, everything else comes from requests")
+    def test_wraps_raw_response(self):
+        raw = raw_response(json.dumps(ERROR_BODY).encode())
+
+        response = ApiResponse(raw)
+
+        assert (response.status_code, response.content, response.url) == (400, raw.content, raw.url)
+        assert response.headers["content-type"] == "application/json"
+        assert response.reason == "Bad Request" and response.ok is False
+        assert repr(response) == "<ApiResponse [400]>"
+
+    @allure.title("Text is decoded as utf-8 unless the response names a charset")
+    def test_text(self):
+        body = json.dumps(ERROR_BODY, ensure_ascii=False)
+
+        assert ApiResponse(raw_response(body.encode())).text == body
+        assert ApiResponse(raw_response(body.encode("latin-1"), encoding="latin-1")).text == body
+
+    @allure.title("JSON is decoded once")
+    def test_json_is_cached(self):
+        response = ApiResponse(raw_response(json.dumps(ERROR_BODY, ensure_ascii=False).encode()))
+
+        assert response.json() == ERROR_BODY
+        assert response.json() is response.json()
+
+    @allure.title("Without orjson the stdlib json module decodes the same bodies")
+    def test_stdlib_json_fallback(self, monkeypatch):
+        body = json.dumps([ERROR_BODY, 1.5, None, True], ensure_ascii=False).encode()
+        monkeypatch.setattr(api_response, "orjson", None)
+
+        assert api_response.loads(body) == [ERROR_BODY, 1.5, None, True]
+        assert ApiResponse(raw_response(body)).json()[0] == ERROR_BODY
+        with pytest.raises(ValueError):
+            api_response.loads(b"{not json")
+
+    @allure.title("orjson, when installed, decodes exactly like the stdlib")
+    def test_orjson_matches_stdlib(self):
+        pytest.importorskip("orjson")
+        body = json.dumps({"licenses": [ERROR_BODY] * 3, "total": 3, "ratio": 0.25}, ensure_ascii=False).encode()
+
+        assert api_response.loads(body) == json.loads(body)
+
+    @allure.title("Parsed models are cached per schema, adapters are built once per schema")
+    def test_parse(self):
+        response = ApiResponse(raw_response(json.dumps(ERROR_BODY).encode()))
+
+        error = response.parse(ErrorResponse)
+
+        assert error == ErrorResponse(**ERROR_BODY)
+        assert response.parse(ErrorResponse) is error
+        assert adapter_for(ErrorResponse) is adapter_for(ErrorResponse)
+        assert response.parse(TypeAdapter(dict)) == ERROR_BODY
+
+    @allure.title("A body that doesn't match the schema fails validation")
+    def test_parse_invalid(self):
+        response = ApiResponse(raw_response(b'{"code": "LICENSE_NOT_FOUND"}'))
+
+        with pytest.raises(ValidationError):
+            response.parse(ErrorResponse)
@@ -1,12 +1,13 @@
 import copy
-import threading
 
 import allure
 import pytest
 from config.base_test import BaseTest
 from services.licenses.payloads import Payloads
 from services.licenses.models.assign_licenses_models import ErrorResponse
-from config.constants import TEAM_1_ID, VALID_EMAIL_2
+from config.constants import LATENCY_BUDGET_SAMPLES, RACE_REPETITIONS, TEAM_1_ID, VALID_EMAIL_1, VALID_EMAIL_2
+from utils.deferred import Deferred
+from utils.latency_budget import latency_budget
 
 
 @allure.epic("Licenses API")
@@ -14,14 +15,15 @@ from config.constants import TEAM_1_ID, VALID_EMAIL_2
 class TestLicenses(BaseTest):
 
     @pytest.fixture
-    def base_assign_license_payload(self):
+    def base_assign_license_payload(self, license_pool, request):
         payload = Payloads.get_base_assign_license_payload()
+        # Only taken from the pool when the request goes out with a licenseId
+        license_id = payload["licenseId"] = Deferred(lambda: license_pool.acquire(TEAM_1_ID))
 
-        available_license_id = self.api_licenses.get_available_to_assign_team_license_id(
-            headers=self.org_admin_headers, team_id=TEAM_1_ID)
-        payload["licenseId"] = available_license_id
-
-        return payload
+        yield payload
+        # The server rejected every request of a side_effect_free test, the license is still free
+        if license_id.resolved and request.node.get_closest_marker("side_effect_free"):
+            license_pool.release(license_id.resolve())
 
     # -------------------------
     # Positive tests
@@ -40,10 +42,24 @@ class TestLicenses(BaseTest):
             assert response.status_code == 200
             assert not response.content
 
+    @allure.title("Assign by licenseId stays within the latency budget over repeated assignments")
+    @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.positive
+    def test_assign_latency_budget(self, license_pool):
+        with allure.step(f"Act: assign {LATENCY_BUDGET_SAMPLES} licenses by licenseId, p95 within the budget"):
+            with latency_budget(endpoint="assign", p95_ms=1500, min_samples=LATENCY_BUDGET_SAMPLES):
+                for _ in range(LATENCY_BUDGET_SAMPLES):
+                    payload = Payloads.get_base_assign_license_payload()
+                    payload["licenseId"] = license_pool.acquire(TEAM_1_ID)
+                    response = self.api_licenses.assign_license(payload=payload, headers=self.org_admin_headers)
+                    assert response.status_code == 200
+
     @allure.title("Assign by team (productCode + team) - success")
     @allure.severity(allure.severity_level.CRITICAL)
     @pytest.mark.positive
-    def test_assign_by_team_success(self, base_assign_license_payload):
+    def test_assign_by_team_success(self, base_assign_license_payload, license_pool):
+        if license_pool.worker_count > 1:
+            pytest.skip("the server picks the license, it may belong to another xdist worker's share")
         with allure.step("Arrange: switch to license object (productCode + team)"):
             payload = copy.deepcopy(base_assign_license_payload)
             del payload["licenseId"]
@@ -52,7 +68,10 @@ class TestLicenses(BaseTest):
             payload["license"] = {"productCode": product_code, "team": TEAM_1_ID}
 
         with allure.step("Act: call AssignLicense endpoint using license object"):
-            response = self.api_licenses.assign_license(payload=payload, headers=self.org_admin_headers)
+            try:
+                response = self.api_licenses.assign_license(payload=payload, headers=self.org_admin_headers)
+            finally:
+                license_pool.invalidate(TEAM_1_ID)
 
         with allure.step("Assert: HTTP 200 and no response content (assignment succeeded)"):
             assert response.status_code == 200
@@ -61,12 +80,11 @@ class TestLicenses(BaseTest):
     @allure.title("When both licenseId and license are present, licenseId is used")
     @allure.severity(allure.severity_level.CRITICAL)
     @pytest.mark.positive
-    def test_assign_uses_licenseid_when_both_fields_are_present(self, base_assign_license_payload):
+    def test_assign_uses_licenseid_when_both_fields_are_present(self, base_assign_license_payload, license_pool):
         with allure.step("Arrange: payload contains both licenseId and license object"):
             payload = copy.deepcopy(base_assign_license_payload)
             payload["license"] = {
-                "productCode": self.api_licenses.get_available_to_assign_team_license_product_code(
-                    headers=self.org_admin_headers, team_id=TEAM_1_ID),
+                "productCode": license_pool.product_code(payload["licenseId"].resolve()),
                 "team": TEAM_1_ID
             }
 
@@ -91,26 +109,13 @@ class TestLicenses(BaseTest):
         with allure.step("Assert: HTTP 200 (assignment successful)"):
             assert response.status_code == 200
 
-    @allure.title("Team admin can assign license")
-    @allure.severity(allure.severity_level.CRITICAL)
-    @pytest.mark.roles
-    def test_team_admin_can_assign(self, base_assign_license_payload):
-        with allure.step("Arrange: prepare payload using valid licenseId"):
-            payload = copy.deepcopy(base_assign_license_payload)
-
-        with allure.step("Act: call AssignLicense as team_admin"):
-            response = self.api_licenses.assign_license(payload=payload, headers=self.team_admin_headers)
-
-        with allure.step("Assert: HTTP 200 and empty body (team_admin is allowed)"):
-            assert response.status_code == 200
-            assert not response.content
-
     # -------------------------
     # Negative tests
     # -------------------------
     @allure.title("Fails if no license field provided")
     @allure.severity(allure.severity_level.NORMAL)
     @pytest.mark.negative
+    @pytest.mark.side_effect_free
     def test_fails_if_no_license_field_is_provided(self, base_assign_license_payload):
         with allure.step("Arrange: remove licenseId and do not provide license object"):
             payload = copy.deepcopy(base_assign_license_payload)
@@ -121,11 +126,12 @@ class TestLicenses(BaseTest):
 
         with allure.step("Assert: HTTP 400 and error body matches ErrorResponse schema"):
             assert response.status_code == 400
-            ErrorResponse(**response.json())
+            response.parse(ErrorResponse)
 
     @allure.title("Fails if contact object missing")
     @allure.severity(allure.severity_level.NORMAL)
     @pytest.mark.negative
+    @pytest.mark.side_effect_free
     def test_fails_if_contact_missing(self, base_assign_license_payload):
         with allure.step("Arrange: remove contact from payload"):
             payload = copy.deepcopy(base_assign_license_payload)
@@ -136,11 +142,12 @@ class TestLicenses(BaseTest):
 
         with allure.step("Assert: HTTP 400 and error schema"):
             assert response.status_code == 400
-            ErrorResponse(**response.json())
+            response.parse(ErrorResponse)
 
     @allure.title("Fails if contact.{email|firstName|lastName} missing")
     @allure.severity(allure.severity_level.NORMAL)
     @pytest.mark.negative
+    @pytest.mark.side_effect_free
     @pytest.mark.parametrize("missing_field", ["email", "firstName", "lastName"])
     def test_fails_if_contact_field_missing(self, base_assign_license_payload, missing_field):
         with allure.step(f"Arrange: remove contact.{missing_field} from payload"):
@@ -152,11 +159,12 @@ class TestLicenses(BaseTest):
 
         with allure.step("Assert: validation error 400 and ErrorResponse schema"):
             assert response.status_code == 400
-            ErrorResponse(**response.json())
+            response.parse(ErrorResponse)
 
     @allure.title("Fails if neither licenseId nor license provided")
     @allure.severity(allure.severity_level.NORMAL)
     @pytest.mark.negative
+    @pytest.mark.side_effect_free
     def test_fails_if_neither_licenseId_nor_license_provided(self, base_assign_license_payload):
         with allure.step("Arrange: remove licenseId (and keep no license block)"):
             payload = copy.deepcopy(base_assign_license_payload)
@@ -167,34 +175,35 @@ class TestLicenses(BaseTest):
 
         with allure.step("Assert: 400 + ErrorResponse"):
             assert response.status_code == 400
-            ErrorResponse(**response.json())
+            response.parse(ErrorResponse)
 
     @allure.title("Fails if license object missing productCode/team (parameterized)")
     @allure.severity(allure.severity_level.NORMAL)
     @pytest.mark.negative
+    @pytest.mark.side_effect_free
     @pytest.mark.parametrize("missing_field", ["productCode", "team"])
-    def test_fails_if_license_object_missing_product_or_team(self, base_assign_license_payload, missing_field):
+    def test_fails_if_license_object_missing_product_or_team(self, base_assign_license_payload, license_pool,
+                                                             missing_field):
         with allure.step("Arrange: build license object with missing field"):
             payload = copy.deepcopy(base_assign_license_payload)
-            if "licenseId" in payload:
-                del payload["licenseId"]
+            license_id = payload.pop("licenseId")
 
             if missing_field == "productCode":
                 payload["license"] = {"team": TEAM_1_ID}
             else:
-                payload["license"] = {"productCode": self.api_licenses.get_available_to_assign_team_license_product_code(
-                    headers=self.org_admin_headers, team_id=TEAM_1_ID)}
+                payload["license"] = {"productCode": license_pool.product_code(license_id.resolve())}
 
         with allure.step("Act: call API expecting validation error"):
             response = self.api_licenses.assign_license(payload=payload, headers=self.org_admin_headers)
 
         with allure.step("Assert: 400 and ErrorResponse"):
             assert response.status_code == 400
-            ErrorResponse(**response.json())
+            response.parse(ErrorResponse)
 
     @allure.title("Fails if sendEmail missing")
     @allure.severity(allure.severity_level.NORMAL)
     @pytest.mark.negative
+    @pytest.mark.side_effect_free
     def test_fails_if_sendEmail_missing(self, base_assign_license_payload):
         with allure.step("Arrange: remove sendEmail from payload"):
             payload = copy.deepcopy(base_assign_license_payload)
@@ -205,11 +214,12 @@ class TestLicenses(BaseTest):
 
         with allure.step("Assert: 400 + ErrorResponse"):
             assert response.status_code == 400
-            ErrorResponse(**response.json())
+            response.parse(ErrorResponse)
 
     @allure.title("Fails if includeOfflineActivationCode missing")
     @allure.severity(allure.severity_level.NORMAL)
     @pytest.mark.negative
+    @pytest.mark.side_effect_free
     def test_fails_if_includeOfflineActivationCode_missing(self, base_assign_license_payload):
         with allure.step("Arrange: remove includeOfflineActivationCode from payload"):
             payload = copy.deepcopy(base_assign_license_payload)
@@ -220,11 +230,12 @@ class TestLicenses(BaseTest):
 
         with allure.step("Assert: 400 + ErrorResponse"):
             assert response.status_code == 400
-            ErrorResponse(**response.json())
+            response.parse(ErrorResponse)
 
     @allure.title("sendEmail wrong types (parametrized)")
     @allure.severity(allure.severity_level.NORMAL)
     @pytest.mark.negative
+    @pytest.mark.side_effect_free
     @pytest.mark.parametrize("bad_value", ["true", 1, None, {}])
     def test_fails_if_sendEmail_wrong_type(self, base_assign_license_payload, bad_value):
         with allure.step(f"Arrange: set sendEmail to invalid type: {bad_value!r}"):
@@ -236,11 +247,12 @@ class TestLicenses(BaseTest):
 
         with allure.step("Assert: 400 + ErrorResponse"):
             assert response.status_code == 400
-            ErrorResponse(**response.json())
+            response.parse(ErrorResponse)
 
     @allure.title("includeOfflineActivationCode wrong types (parametrized)")
     @allure.severity(allure.severity_level.NORMAL)
     @pytest.mark.negative
+    @pytest.mark.side_effect_free
     @pytest.mark.parametrize("bad_value", ["false", 0, None, {}])
     def test_fails_if_includeOfflineActivationCode_wrong_type(self, base_assign_license_payload, bad_value):
         with allure.step(f"Arrange: set includeOfflineActivationCode to invalid type: {bad_value!r}"):
@@ -252,29 +264,30 @@ class TestLicenses(BaseTest):
 
         with allure.step("Assert: 400 + ErrorResponse"):
             assert response.status_code == 400
-            ErrorResponse(**response.json())
+            response.parse(ErrorResponse)
 
     @allure.title("license.team invalid type / value (parametrized)")
     @allure.severity(allure.severity_level.NORMAL)
     @pytest.mark.negative
+    @pytest.mark.side_effect_free
     @pytest.mark.parametrize("bad_team", ["1", 1.5, -5, None, {}])
-    def test_fails_if_license_team_invalid_type_or_value(self, base_assign_license_payload, bad_team):
+    def test_fails_if_license_team_invalid_type_or_value(self, base_assign_license_payload, license_pool, bad_team):
         with allure.step(f"Arrange: set license.team to invalid value: {bad_team!r}"):
             payload = copy.deepcopy(base_assign_license_payload)
-            payload.pop("licenseId", None)
-            payload["license"] = {"productCode": self.api_licenses.get_available_to_assign_team_license_product_code(
-                headers=self.org_admin_headers, team_id=TEAM_1_ID), "team": bad_team}
+            license_id = payload.pop("licenseId")
+            payload["license"] = {"productCode": license_pool.product_code(license_id.resolve()), "team": bad_team}
 
         with allure.step("Act"):
             response = self.api_licenses.assign_license(payload=payload, headers=self.org_admin_headers)
 
         with allure.step("Assert: 400 + ErrorResponse"):
             assert response.status_code == 400
-            ErrorResponse(**response.json())
+            response.parse(ErrorResponse)
 
     @allure.title("Invalid email format")
     @allure.severity(allure.severity_level.NORMAL)
     @pytest.mark.negative
+    @pytest.mark.side_effect_free
     def test_fails_if_email_invalid_format(self, base_assign_license_payload):
         with allure.step("Arrange: set invalid email format in payload"):
             payload = copy.deepcopy(base_assign_license_payload)
@@ -285,11 +298,12 @@ class TestLicenses(BaseTest):
 
         with allure.step("Assert: 400 + ErrorResponse"):
             assert response.status_code == 400
-            ErrorResponse(**response.json())
+            response.parse(ErrorResponse)
 
     @allure.title("Empty or whitespace-only values (parametrized)")
     @allure.severity(allure.severity_level.NORMAL)
     @pytest.mark.negative
+    @pytest.mark.side_effect_free
     @pytest.mark.parametrize("field, value", [
         ("contact.email", ""),
         ("contact.firstName", ""),
@@ -310,7 +324,7 @@ class TestLicenses(BaseTest):
 
         with allure.step("Assert: 400 + ErrorResponse"):
             assert response.status_code == 400
-            ErrorResponse(**response.json())
+            response.parse(ErrorResponse)
 
     @allure.title("Non-existent licenseId")
     @allure.severity(allure.severity_level.NORMAL)
@@ -324,16 +338,15 @@ class TestLicenses(BaseTest):
 
         with allure.step("Assert: 400 and ErrorResponse"):
             assert response.status_code == 400
-            ErrorResponse(**response.json())
+            response.parse(ErrorResponse)
 
     @allure.title("Assign already assigned license fails")
     @allure.severity(allure.severity_level.NORMAL)
     @pytest.mark.negative
-    def test_fails_when_license_already_assigned(self):
+    def test_fails_when_license_already_assigned(self, license_pool):
         with allure.step("Arrange: assign a license once to ensure it's taken"):
             first_payload = Payloads.get_base_assign_license_payload()
-            available_license_id = self.api_licenses.get_available_to_assign_team_license_id(
-                headers=self.org_admin_headers, team_id=TEAM_1_ID)
+            available_license_id = license_pool.acquire(TEAM_1_ID)
             first_payload["licenseId"] = available_license_id
 
             first_response = self.api_licenses.assign_license(payload=first_payload, headers=self.org_admin_headers)
@@ -348,53 +361,33 @@ class TestLicenses(BaseTest):
 
         with allure.step("Assert: second assignment fails with 400 and proper error schema"):
             assert second_response.status_code == 400
-            ErrorResponse(**second_response.json())
+            second_response.parse(ErrorResponse)
 
     @allure.title("Concurrent assignment: one succeeds, other fails")
     @allure.severity(allure.severity_level.CRITICAL)
     @pytest.mark.negative
-    def test_concurrent_assignment_one_succeeds_other_fails(self):
-        with allure.step("Arrange: get a free licenseId and prepare two payloads"):
-            license_id = self.api_licenses.get_available_to_assign_team_license_id(
-                headers=self.org_admin_headers, team_id=TEAM_1_ID)
-            p1 = Payloads.get_base_assign_license_payload()
-            p1["licenseId"] = license_id
-            p2 = Payloads.get_base_assign_license_payload()
-            p2["licenseId"] = license_id
-            p2["contact"]["email"] = VALID_EMAIL_2
-
-        with allure.step("Act: send two requests in parallel"):
-            results = []
-
-            def thread_call(payload):
-                resp = self.api_licenses.assign_license(payload=payload, headers=self.org_admin_headers)
-                results.append(resp)
-
-            t1 = threading.Thread(target=thread_call, args=(p1,))
-            t2 = threading.Thread(target=thread_call, args=(p2,))
-            t1.start()
-            t2.start()
-            t1.join()
-            t2.join()
-
-        with allure.step("Assert: exactly one request succeeded (200) and one failed (400)"):
-            assert len(results) == 2
-            status_codes = sorted([r.status_code for r in results])
-            assert status_codes == [200, 400]
-            for r in results:
-                if r.status_code == 400:
-                    ErrorResponse(**r.json())
-
-    @allure.title("Team member must NOT be able to assign license (RBAC)")
-    @allure.severity(allure.severity_level.CRITICAL)
-    @pytest.mark.roles
-    def test_team_member_cannot_assign(self, base_assign_license_payload):
-        with allure.step("Arrange: prepare payload and identify team_viewer headers"):
-            payload = copy.deepcopy(base_assign_license_payload)
-
-        with allure.step("Act: attempt to assign license as team_viewer (unauthorized)"):
-            response = self.api_licenses.assign_license(payload=payload, headers=self.team_viewer_headers)
-
-        with allure.step("Assert: RBAC denies action — expected 403 and error schema"):
-            assert response.status_code == 403
-            ErrorResponse(**response.json())
+    def test_concurrent_assignment_one_succeeds_other_fails(self, license_pool, race_harness):
+        def prepare(_):
+            license_id = license_pool.acquire(TEAM_1_ID)
+            payloads = []
+            for index in range(race_harness.contenders):
+                payload = Payloads.get_base_assign_license_payload()
+                payload["licenseId"] = license_id
+                payload["contact"]["email"] = (VALID_EMAIL_1, VALID_EMAIL_2)[index % 2]
+                payloads.append(payload)
+            return payloads
+
+        def assign(client, index, payloads):
+            return client.assign_license(payload=payloads[index], headers=self.org_admin_headers)
+
+        with allure.step(f"Act: race {race_harness.contenders} assignments of one free licenseId, "
+                         f"{RACE_REPETITIONS} times"):
+            outcomes = race_harness.repeat(RACE_REPETITIONS, prepare, assign)
+            race_harness.attach(outcomes)
+
+        with allure.step("Assert: every race has exactly one 200, the rest fail with 400"):
+            for outcome in outcomes:
+                outcome.expect({200: 1, 400: race_harness.contenders - 1})
+                for response in outcome.responses:
+                    if response.status_code == 400:
+                        response.parse(ErrorResponse)
@@ -0,0 +1,153 @@
+import asyncio
+import json
+
+import allure
+import httpx
+import pytest
+from config.constants import TEAM_1_ID, TEAM_2_ID
+from config.headers import Headers
+from services.licenses.async_api_licenses import AsyncLicensesApi
+from services.licenses.stub_server import LicensesStubServer, ORG_ADMIN
+from utils.cassette import Cassette
+from utils.rate_limiter import RateLimiter
+from utils.shared_budget import SharedRateBudget
+
+
+@allure.epic("Licenses API")
+@allure.feature("Async client")
+class TestAsyncLicensesApi:
+
+    @pytest.fixture
+    def stub_state(self):
+        return {"in_flight": 0, "max_in_flight": 0, "requests": []}
+
+    @pytest.fixture
+    def stub_transport(self, stub_state):
+        async def handler(request: httpx.Request) -> httpx.Response:
+            stub_state["in_flight"] += 1
+            stub_state["max_in_flight"] = max(stub_state["max_in_flight"], stub_state["in_flight"])
+            stub_state["requests"].append(request)
+            await asyncio.sleep(0.01)
+            stub_state["in_flight"] -= 1
+
+            if request.url.path.endswith("/licenses"):
+                return httpx.Response(200, json=[{"licenseId": "LIC-1", "isAvailableToAssign": True}])
+            return httpx.Response(200)
+
+        return httpx.MockTransport(handler)
+
+    @allure.title("Awaitable calls hit the expected endpoints")
+    def test_calls_hit_expected_endpoints(self, stub_transport, stub_state):
+        async def scenario():
+            async with AsyncLicensesApi(transport=stub_transport) as api:
+                headers = Headers.org_admin()
+                team = await api.get_team_licenses(headers=headers, team_id=TEAM_1_ID)
+                assign = await api.assign_license(headers=headers, payload={"licenseId": "LIC-1"})
+                change = await api.change_licenses_team(
+                    headers=headers, payload={"licenseIds": ["LIC-1"], "targetTeamId": TEAM_2_ID})
+                return team, assign, change
+
+        team, assign, change = asyncio.run(scenario())
+
+        assert team.json()[0]["licenseId"] == "LIC-1"
+        assert assign.status_code == 200
+        assert change.status_code == 200
+        paths = [request.url.path for request in stub_state["requests"]]
+        assert paths[0].endswith(f"/customer/teams/{TEAM_1_ID}/licenses")
+        assert paths[1].endswith("/customer/licenses/assign")
+        assert paths[2].endswith("/customer/changeLicensesTeam")
+        assert json.loads(stub_state["requests"][2].content) == {"licenseIds": ["LIC-1"], "targetTeamId": TEAM_2_ID}
+
+    @allure.title("gather keeps no more than the limit of requests in flight")
+    def test_gather_is_bounded(self, stub_transport, stub_state):
+        async def scenario():
+            async with AsyncLicensesApi(transport=stub_transport) as api:
+                headers = Headers.org_admin()
+                return await api.gather(
+                    (api.get_team_licenses(headers=headers, team_id=TEAM_1_ID) for _ in range(200)), limit=10)
+
+        responses = asyncio.run(scenario())
+
+        assert len(responses) == 200
+        assert all(response.status_code == 200 for response in responses)
+        assert stub_state["max_in_flight"] == 10
+
+    @allure.title("Concurrent assignments of one license against the local stub: exactly one succeeds")
+    def test_concurrent_assignments_against_stub(self):
+        headers = Headers.org_admin(customer_code="stub-org", api_key="stub-org-key")
+
+        async def scenario(base_url):
+            async with AsyncLicensesApi(base_url=base_url) as api:
+                inventory = (await api.get_team_licenses(headers=headers, team_id=TEAM_1_ID)).json()
+                license_id = next(obj["licenseId"] for obj in inventory if obj["isAvailableToAssign"])
+                payload = {
+                    "contact": {"email": "race@example.com", "firstName": "Race", "lastName": "Condition"},
+                    "includeOfflineActivationCode": False,
+                    "sendEmail": False,
+                    "licenseId": license_id,
+                }
+                return await api.gather(api.assign_license(headers=headers, payload=payload) for _ in range(50))
+
+        with LicensesStubServer(roles={("stub-org", "stub-org-key"): (ORG_ADMIN, None)}) as stub:
+            responses = asyncio.run(scenario(stub.base_url))
+
+        status_codes = sorted(response.status_code for response in responses)
+        assert status_codes == [200] + [400] * 49
+
+    @allure.title("Async requests are retried by the shared limiter after a 429")
+    def test_limiter_retries_throttled_requests(self, stub_state):
+        async def handler(request: httpx.Request) -> httpx.Response:
+            stub_state["requests"].append(request)
+            if len(stub_state["requests"]) == 1:
+                return httpx.Response(429, headers={"Retry-After": "0"})
+            return httpx.Response(200, json=[])
+
+        limiter = RateLimiter(retries=2)
+
+        async def scenario():
+            async with AsyncLicensesApi(transport=httpx.MockTransport(handler), limiter=limiter) as api:
+                return await api.get_team_licenses(headers=Headers.org_admin(), team_id=TEAM_1_ID)
+
+        response = asyncio.run(scenario())
+
+        assert response.status_code == 200
+        assert len(stub_state["requests"]) == 2
+        assert (limiter.throttled, limiter.retried) == (1, 1)
+
+    @allure.title("Async requests draw from the shared budget")
+    def test_shared_budget_is_metered(self, stub_transport, tmp_path):
+        budget = SharedRateBudget(rates={"org_admin": 1000}, burst=1, directory=str(tmp_path))
+
+        async def scenario():
+            async with AsyncLicensesApi(transport=stub_transport, budget=budget) as api:
+                headers = Headers.org_admin()
+                return await api.gather(api.get_team_licenses(headers=headers, team_id=TEAM_1_ID) for _ in range(5))
+
+        responses = asyncio.run(scenario())
+        budget.close()
+
+        assert [response.status_code for response in responses] == [200] * 5
+        assert budget.waited > 0
+
+    @allure.title("Async traffic is recorded to and replayed from the cassette")
+    def test_cassette_record_and_replay(self, stub_transport, tmp_path):
+        path = str(tmp_path / "licenses")
+        headers = Headers.org_admin()
+
+        async def scenario(transport, cassette):
+            async with AsyncLicensesApi(transport=transport, cassette=cassette) as api:
+                return await api.get_team_licenses(headers=headers, team_id=TEAM_1_ID)
+
+        recorder = Cassette(mode="record", path=path)
+        recorded = asyncio.run(scenario(stub_transport, recorder))
+        recorder.close()
+
+        def unreachable(request):
+            raise AssertionError(f"{request.url} was sent during replay")
+
+        player = Cassette(mode="replay", path=path)
+        replayed = asyncio.run(scenario(httpx.MockTransport(unreachable), player))
+
+        assert (replayed.status_code, replayed.json()) == (recorded.status_code, recorded.json())
+        assert player.hits == 1
+        player.close()
@@ -0,0 +1,124 @@
+from types import SimpleNamespace
+
+import allure
+import pytest
+import conftest
+import utils.api_client
+from config.constants import TEAM_1_ID
+from config.headers import Headers
+from services.licenses.api_licenses import LicensesApi
+from services.licenses.stub_server import LicensesStubServer, LicensesStubState, ORG_ADMIN
+from utils.attachments import ResponseAttachments
+
+
+def start_test() -> None:
+    conftest.pytest_runtest_setup(SimpleNamespace(nodeid="tests/test_x.py::test_x"))
+
+
+def finish_phase(when: str, failed: bool = False) -> None:
+    # Drives the conftest hookwrapper the way pytest does at the end of every phase
+    hook = conftest.pytest_runtest_makereport(item=None, call=None)
+    next(hook)
+    report = SimpleNamespace(when=when, failed=failed)
+    with pytest.raises(StopIteration):
+        hook.send(SimpleNamespace(get_result=lambda: report))
+
+
+@allure.epic("API client")
+@allure.feature("Response attachments")
+class TestResponseAttachments:
+
+    @pytest.fixture
+    def attached(self, monkeypatch):
+        names = []
+        monkeypatch.setattr(allure, "attach", lambda body, name=None, **kwargs: names.append(name))
+        return names
+
+    @pytest.fixture
+    def attachments(self, monkeypatch):
+        attachments = ResponseAttachments(policy="on_failure", max_body_bytes=1024, oversize="truncate", max_pending=3)
+        monkeypatch.setattr(conftest, "response_attachments", attachments)
+        monkeypatch.setattr(utils.api_client, "response_attachments", attachments)
+        return attachments
+
+    @pytest.fixture
+    def send(self):
+        roles = {("stub-org", "stub-org-key"): (ORG_ADMIN, None)}
+        headers = Headers.org_admin(customer_code="stub-org", api_key="stub-org-key")
+        with LicensesStubServer(state=LicensesStubState(licenses_per_team=2), roles=roles) as stub:
+            api = LicensesApi(base_url=stub.base_url)
+            yield lambda: api.get_team_licenses(headers=headers, team_id=TEAM_1_ID)
+
+    @allure.title("A passing test writes no attachment")
+    def test_passing_test_writes_nothing(self, attachments, attached, send):
+        start_test()
+        send()
+        send()
+
+        for when in ("setup", "call", "teardown"):
+            finish_phase(when)
+
+        assert attached == []
+
+    @allure.title("A failing test flushes every buffered response")
+    def test_failing_test_flushes_buffer(self, attachments, attached, send):
+        start_test()
+        send()
+        send()
+
+        finish_phase("setup")
+        finish_phase("call", failed=True)
+
+        assert attached.count("Response HTTP status") == 2
+        assert attached.count("Response body") == 2
+
+        finish_phase("teardown")
+        assert attached.count("Response HTTP status") == 2
+
+    @allure.title("Teardown discards what a passing test buffered, the next test starts empty")
+    def test_teardown_discards_buffer(self, attachments, attached, send):
+        start_test()
+        send()
+        finish_phase("call")
+        finish_phase("teardown")
+
+        start_test()
+        send()
+        finish_phase("call", failed=True)
+
+        assert attached.count("Response HTTP status") == 1
+
+    @allure.title("Policies always/never write immediately or not at all")
+    def test_always_and_never(self, attachments, attached, send):
+        start_test()
+        attachments.configure(policy="always")
+        send()
+        assert attached.count("Response HTTP status") == 1
+
+        attachments.configure(policy="never")
+        send()
+        finish_phase("call", failed=True)
+        assert attached.count("Response HTTP status") == 1
+
+    @allure.title("Nothing is kept outside a test, the load runner and scripts don't fill the buffer")
+    def test_nothing_recorded_outside_tests(self, attachments, attached, send):
+        start_test()
+        finish_phase("teardown")
+
+        for _ in range(5):
+            send()
+        start_test()
+        finish_phase("call", failed=True)
+
+        assert attached == []
+
+    @allure.title("Only the latest responses of a test are kept")
+    def test_buffer_is_capped(self, attachments, attached, send):
+        start_test()
+        for _ in range(5):
+            send()
+
+        finish_phase("call", failed=True)
+
+        assert attached.count("Response HTTP status") == 3
+        assert attached.count("Earlier responses") == 1
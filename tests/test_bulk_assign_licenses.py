@@ -0,0 +1,121 @@
+import csv
+import io
+import itertools
+
+import allure
+import pytest
+from config.constants import TEAM_1_ID
+from config.headers import Headers
+from services.licenses.api_licenses import LicensesApi
+from services.licenses.stub_server import LicensesStubServer, LicensesStubState, ORG_ADMIN
+
+
+def roster(count: int, domain: str = "example.com"):
+    for number in range(count):
+        yield {"email": f"user{number}@{domain}", "firstName": f"First{number}", "lastName": f"Last{number}"}
+
+
+@allure.epic("Licenses API")
+@allure.feature("Assign Licenses")
+class TestBulkAssignLicenses:
+
+    @pytest.fixture
+    def headers(self):
+        return Headers.org_admin(customer_code="stub-org", api_key="stub-org-key")
+
+    @pytest.fixture
+    def stub(self, request):
+        licenses_per_team = getattr(request, "param", 150)
+        roles = {("stub-org", "stub-org-key"): (ORG_ADMIN, None)}
+        with LicensesStubServer(state=LicensesStubState(licenses_per_team=licenses_per_team), roles=roles) as stub:
+            yield stub
+
+    @pytest.fixture
+    def api(self, stub):
+        return LicensesApi(base_url=stub.base_url)
+
+    @allure.title("Bulk assignment gives every contact its own license of the requested product")
+    def test_bulk_assign_from_iterable(self, api, stub, headers):
+        outcomes = list(api.assign_licenses_bulk(headers=headers, contacts=roster(40), team_id=TEAM_1_ID,
+                                                 product_code="PC", max_workers=8))
+
+        assert [outcome.status for outcome in outcomes] == [200] * 40
+        license_ids = {outcome.license_id for outcome in outcomes}
+        assert len(license_ids) == 40
+        for outcome in outcomes:
+            license_obj = stub.state.licenses[outcome.license_id]
+            assert license_obj["product"]["code"] == "PC"
+            assert license_obj["assignee"]["email"] == outcome.contact["email"]
+
+    @allure.title("Bulk assignment reads contacts from CSV and reports rejected rows")
+    def test_bulk_assign_from_csv(self, api, stub, headers):
+        csv_stream = io.StringIO(
+            "email,firstName,lastName,productCode\n"
+            "first@example.com,First,User,II\n"
+            "not-an-email,Second,User,WS\n"
+            "third@example.com,Third,User,\n"
+        )
+
+        outcomes = {outcome.contact["email"]: outcome
+                    for outcome in api.assign_licenses_bulk(headers=headers, contacts=csv_stream, team_id=TEAM_1_ID)}
+
+        assert outcomes["first@example.com"].status == 200
+        assert stub.state.licenses[outcomes["first@example.com"].license_id]["product"]["code"] == "II"
+        assert (outcomes["not-an-email"].status, outcomes["not-an-email"].code) == (400, "INVALID_CONTACT")
+        assert outcomes["third@example.com"].status == 200
+
+    @allure.title("Rows missing a contact field fail on their own, the other rows are still assigned")
+    def test_bulk_assign_reports_incomplete_rows(self, api, stub, headers):
+        csv_stream = io.StringIO(
+            "email,firstName,lastName\n"
+            "first@example.com,First,User\n"
+            "short@example.com,Short\n"
+            "blank@example.com,,User\n"
+            "last@example.com,Last,User\n"
+        )
+        contacts = itertools.chain(csv.DictReader(csv_stream), [{"firstName": "No", "lastName": "Email"}])
+
+        outcomes = list(api.assign_licenses_bulk(headers=headers, contacts=contacts, team_id=TEAM_1_ID))
+
+        statuses = {outcome.contact.get("email"): (outcome.status, outcome.code) for outcome in outcomes}
+        assert statuses == {"first@example.com": (200, None), "last@example.com": (200, None),
+                            "short@example.com": (None, "MISSING_CONTACT_FIELD"),
+                            "blank@example.com": (None, "MISSING_CONTACT_FIELD"),
+                            None: (None, "MISSING_CONTACT_FIELD")}
+        assert sum(license_obj["assignee"] is not None for license_obj in stub.state.licenses.values()) == 2
+
+    @pytest.mark.parametrize("stub", [2], indirect=True)
+    @allure.title("A license whose row the server rejected goes to the next contact")
+    def test_bulk_assign_reuses_license_of_rejected_row(self, api, stub, headers):
+        contacts = [{"email": "not-an-email", "firstName": "Bad", "lastName": "Row"}, *roster(2)]
+
+        outcomes = list(api.assign_licenses_bulk(headers=headers, contacts=contacts, team_id=TEAM_1_ID,
+                                                 max_workers=1))
+
+        assert [(outcome.status, outcome.code) for outcome in outcomes] == [(400, "INVALID_CONTACT"),
+                                                                            (200, None), (200, None)]
+        assert all(license_obj["assignee"] is not None for license_obj in stub.state.licenses.values()
+                   if license_obj["team"]["id"] == TEAM_1_ID)
+
+    @pytest.mark.parametrize("stub", [10], indirect=True)
+    @allure.title("Bulk assignment reports contacts left without a license once the team runs out")
+    def test_bulk_assign_exhausts_team(self, api, headers):
+        outcomes = list(api.assign_licenses_bulk(headers=headers, contacts=roster(15), team_id=TEAM_1_ID,
+                                                 max_workers=4))
+
+        assert sum(outcome.status == 200 for outcome in outcomes) == 10
+        assert sorted(outcome.code for outcome in outcomes if outcome.status != 200) == \
+            ["NO_AVAILABLE_LICENSE"] * 5
+
+    @allure.title("Bulk assignment streams results without reading the whole input first")
+    def test_bulk_assign_streams_results(self, api, headers):
+        read = itertools.count()
+        contacts = (contact for contact in roster(100) if next(read) is not None)
+
+        outcomes = api.assign_licenses_bulk(headers=headers, contacts=contacts, team_id=TEAM_1_ID, max_workers=4)
+        first = next(outcomes)
+        contacts_read = next(read)
+        outcomes.close()
+
+        assert first.status == 200
+        assert contacts_read <= 2 * 4 + 1
@@ -0,0 +1,114 @@
+import allure
+import pytest
+import requests
+from config.constants import TEAM_1_ID, TEAM_2_ID
+from config.headers import Headers
+from services.licenses.api_licenses import LicensesApi
+from services.licenses.stub_server import LicensesStubServer, LicensesStubState, ORG_ADMIN
+
+
+class FlakyLicensesApi(LicensesApi):
+
+    def __init__(self, failures: int, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures
+
+    def post(self, url, headers, payload, endpoint=None):
+        if self.failures:
+            self.failures -= 1
+            raise requests.ConnectionError("connection reset")
+        return super().post(url, headers=headers, payload=payload, endpoint=endpoint)
+
+
+class LostResponseLicensesApi(FlakyLicensesApi):
+
+    # The server applies the request, the response is lost on the way back
+    def post(self, url, headers, payload, endpoint=None):
+        response = LicensesApi.post(self, url, headers=headers, payload=payload, endpoint=endpoint)
+        if self.failures:
+            self.failures -= 1
+            raise requests.ConnectionError("connection reset")
+        return response
+
+
+@allure.epic("Licenses API")
+@allure.feature("Change Licenses Team")
+class TestBulkChangeLicensesTeam:
+
+    @pytest.fixture
+    def headers(self):
+        return Headers.org_admin(customer_code="stub-org", api_key="stub-org-key")
+
+    @pytest.fixture
+    def stub(self):
+        roles = {("stub-org", "stub-org-key"): (ORG_ADMIN, None)}
+        with LicensesStubServer(state=LicensesStubState(licenses_per_team=250), roles=roles) as stub:
+            yield stub
+
+    @pytest.fixture
+    def api(self, stub):
+        return LicensesApi(base_url=stub.base_url)
+
+    def team_license_ids(self, api, headers, team_id):
+        return [license_obj["licenseId"] for license_obj in api.get_team_licenses(headers, team_id).json()]
+
+    @allure.title("Bulk change moves every license in chunks and reports throughput")
+    def test_bulk_change_moves_all_licenses(self, api, headers):
+        license_ids = self.team_license_ids(api, headers, TEAM_1_ID)
+
+        result = api.change_licenses_team_bulk(headers=headers, license_ids=license_ids,
+                                               target_team_id=TEAM_2_ID, chunk_size=40)
+
+        assert result.succeeded == license_ids
+        assert result.failed == {}
+        assert result.requests_sent == 7
+        assert result.licenses_per_second > 0
+        assert set(license_ids) <= set(self.team_license_ids(api, headers, TEAM_2_ID))
+
+    @allure.title("Bulk change isolates rejected licenses and still moves the rest of their chunk")
+    def test_bulk_change_isolates_rejected_licenses(self, api, headers):
+        license_ids = self.team_license_ids(api, headers, TEAM_1_ID)[:30]
+        already_in_target = self.team_license_ids(api, headers, TEAM_2_ID)[0]
+        requested = license_ids[:10] + ["NOT-A-LICENSE"] + license_ids[10:20] + [already_in_target] + license_ids[20:]
+
+        result = api.change_licenses_team_bulk(headers=headers, license_ids=requested,
+                                               target_team_id=TEAM_2_ID, chunk_size=16)
+
+        assert sorted(result.failed) == sorted(["NOT-A-LICENSE", already_in_target])
+        assert result.failed["NOT-A-LICENSE"].code == "LICENSE_NOT_FOUND"
+        assert result.failed[already_in_target].code == "LICENSE_ALREADY_IN_TEAM"
+        assert result.succeeded == license_ids
+        assert list(result.outcomes) == requested
+
+    @allure.title("Bulk change retries a chunk that failed on the transport")
+    def test_bulk_change_retries_transient_failures(self, stub, headers):
+        api = FlakyLicensesApi(failures=2, base_url=stub.base_url)
+        license_ids = self.team_license_ids(api, headers, TEAM_1_ID)[:20]
+
+        result = api.change_licenses_team_bulk(headers=headers, license_ids=license_ids, target_team_id=TEAM_2_ID,
+                                               chunk_size=20, retries=2, backoff=0)
+
+        assert result.succeeded == license_ids
+        assert result.requests_sent == 3
+
+    @allure.title("Bulk change counts a chunk the server applied before the connection broke as moved")
+    def test_bulk_change_rereads_team_after_lost_response(self, stub, headers):
+        api = LostResponseLicensesApi(failures=1, base_url=stub.base_url)
+        license_ids = self.team_license_ids(api, headers, TEAM_1_ID)[:20]
+
+        result = api.change_licenses_team_bulk(headers=headers, license_ids=license_ids, target_team_id=TEAM_2_ID,
+                                               chunk_size=10, max_workers=1, retries=2, backoff=0)
+
+        assert result.succeeded == license_ids
+        assert result.requests_sent == 2
+
+    @allure.title("Bulk change fails fast when the whole request is rejected")
+    def test_bulk_change_fails_fast_on_request_errors(self, api, headers):
+        license_ids = self.team_license_ids(api, headers, TEAM_1_ID)[:40]
+
+        result = api.change_licenses_team_bulk(headers=headers, license_ids=license_ids, target_team_id=999,
+                                               chunk_size=10, max_workers=1)
+
+        assert {outcome.code for outcome in result.failed.values()} == {"TEAM_NOT_FOUND"}
+        assert len(result.failed) == 40
+        assert result.requests_sent == 1
@@ -0,0 +1,100 @@
+import time
+
+import allure
+import pytest
+from config.constants import TEAM_1_ID, TEAM_2_ID
+from config.headers import Headers
+from services.licenses.api_licenses import LicensesApi
+from services.licenses.payloads import Payloads
+from services.licenses.stub_server import LicensesStubServer, LicensesStubState, ORG_ADMIN
+from utils.cassette import Cassette, CassetteMissError
+from utils.rate_limiter import RateLimiter
+
+
+@allure.epic("API client")
+@allure.feature("Record/replay cassette")
+class TestCassette:
+
+    @pytest.fixture
+    def headers(self):
+        return Headers.org_admin(customer_code="stub-org", api_key="stub-org-key")
+
+    @pytest.fixture
+    def path(self, tmp_path):
+        return str(tmp_path / "licenses")
+
+    def session_calls(self, api, headers, license_id):
+        payload = Payloads.get_base_assign_license_payload()
+        payload["licenseId"] = license_id
+        return [
+            api.get_team_licenses(headers=headers, team_id=TEAM_1_ID),
+            api.assign_license(headers=headers, payload=payload),
+            api.get_team_licenses(headers=headers, team_id=TEAM_1_ID),
+            api.change_licenses_team(headers=headers, payload={"licenseIds": [license_id], "targetTeamId": TEAM_2_ID}),
+        ]
+
+    @pytest.fixture
+    def recorded(self, path, headers):
+        roles = {("stub-org", "stub-org-key"): (ORG_ADMIN, None)}
+        recorder = Cassette(mode="record", path=path)
+        recorder.scope = "test_scope"
+        with LicensesStubServer(state=LicensesStubState(licenses_per_team=20), roles=roles) as stub:
+            Payloads.seed(1)
+            responses = self.session_calls(LicensesApi(base_url=stub.base_url, cassette=recorder), headers,
+                                           license_id="STUB000001")
+        recorder.close()
+        return [(response.status_code, response.content) for response in responses]
+
+    @pytest.fixture
+    def player(self, path, recorded):
+        player = Cassette(mode="replay", path=path)
+        player.scope = "test_scope"
+        yield player
+        player.close()
+
+    @allure.title("Replay serves the recorded sequence without a server, repeated calls in recorded order")
+    def test_replay_matches_recording(self, recorded, player, headers):
+        # Nothing listens on this port, every response has to come from the cassette
+        api = LicensesApi(base_url="http://127.0.0.1:9/api/v1", cassette=player)
+        Payloads.seed(1)
+
+        started = time.perf_counter()
+        replayed = self.session_calls(api, headers, license_id="STUB000001")
+        elapsed = time.perf_counter() - started
+
+        assert [(response.status_code, response.content) for response in replayed] == recorded
+        assert replayed[0].json() != replayed[2].json()
+        assert player.hits == 4
+        assert elapsed < 0.5
+
+    @allure.title("A test re-run with a different license id replays the test's own recorded calls")
+    def test_replay_falls_back_to_recorded_order_within_test(self, recorded, player, headers):
+        api = LicensesApi(base_url="http://127.0.0.1:9/api/v1", cassette=player)
+
+        replayed = self.session_calls(api, headers, license_id="STUB000002")
+
+        assert [response.status_code for response in replayed] == [status for status, _ in recorded]
+
+    @allure.title("Calls that were never recorded fail instead of reaching the network")
+    def test_replay_miss(self, recorded, player, headers):
+        api = LicensesApi(base_url="http://127.0.0.1:9/api/v1", cassette=player)
+
+        with pytest.raises(CassetteMissError):
+            api.get_team_licenses(headers=headers, team_id=TEAM_2_ID)
+
+    @allure.title("Only the final answer of a retried request is recorded")
+    def test_records_final_response_after_retry(self, path, headers):
+        roles = {("stub-org", "stub-org-key"): (ORG_ADMIN, None)}
+        recorder = Cassette(mode="record", path=path)
+        with LicensesStubServer(state=LicensesStubState(licenses_per_team=5), roles=roles) as stub:
+            stub.inject_fault(429, retry_after="0", code="TOO_MANY_REQUESTS")
+            api = LicensesApi(base_url=stub.base_url, cassette=recorder, limiter=RateLimiter(retries=1))
+            assert api.get_team_licenses(headers=headers, team_id=TEAM_1_ID).status_code == 200
+        recorder.close()
+
+        player = Cassette(mode="replay", path=path)
+        api = LicensesApi(base_url="http://127.0.0.1:9/api/v1", cassette=player)
+        assert api.get_team_licenses(headers=headers, team_id=TEAM_1_ID).status_code == 200
+        with pytest.raises(CassetteMissError):
+            api.get_team_licenses(headers=headers, team_id=TEAM_1_ID)
+        player.close()
@@ -1,11 +1,11 @@
 import copy
-import threading
 
 import allure
 import pytest
-from config.constants import TEAM_1_ID, TEAM_2_ID
+from config.constants import LATENCY_BUDGET_SAMPLES, RACE_REPETITIONS, TEAM_1_ID, TEAM_2_ID
 from services.licenses.models.assign_licenses_models import ErrorResponse
 from config.base_test import BaseTest
+from utils.latency_budget import latency_budget
 
 
 @allure.epic("Licenses API")
@@ -13,11 +13,8 @@ from config.base_test import BaseTest
 class TestChangeLicensesTeam(BaseTest):
 
     @pytest.fixture
-    def base_change_team_payload(self):
-        license_id = self.api_licenses.get_available_to_assign_team_license_id(
-            headers=self.org_admin_headers,
-            team_id=TEAM_1_ID
-        )
+    def base_change_team_payload(self, license_pool):
+        license_id = license_pool.acquire(TEAM_1_ID)
         payload = {
             "licenseIds": [license_id],
             "targetTeamId": TEAM_2_ID
@@ -41,17 +38,8 @@ class TestChangeLicensesTeam(BaseTest):
 
     @allure.title("Successfully change team for multiple licenses")
     @allure.severity(allure.severity_level.CRITICAL)
-    def test_change_team_multiple_licenses_success(self):
-        license_ids = [
-            self.api_licenses.get_available_to_assign_team_license_id(
-                headers=self.org_admin_headers,
-                team_id=TEAM_1_ID
-            ),
-            self.api_licenses.get_available_to_assign_team_license_id(
-                headers=self.org_admin_headers,
-                team_id=TEAM_1_ID
-            )
-        ]
+    def test_change_team_multiple_licenses_success(self, license_pool):
+        license_ids = [license_pool.acquire(TEAM_1_ID), license_pool.acquire(TEAM_1_ID)]
         payload = {"licenseIds": license_ids, "targetTeamId": TEAM_2_ID}
 
         with allure.step("Act: call API to change licenses team"):
@@ -60,11 +48,26 @@ class TestChangeLicensesTeam(BaseTest):
         with allure.step("Assert: validate successful response"):
             assert response.status_code == 200
 
+    @allure.title("MERGE-009: repeated team transfers stay within the latency budget")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_change_team_latency_budget(self, license_pool):
+        license_ids = [license_pool.acquire(TEAM_1_ID), license_pool.acquire(TEAM_1_ID)]
+
+        # The same licenses go back and forth, so the samples don't use up the team's inventory
+        with allure.step(f"Act: move the licenses between the teams {LATENCY_BUDGET_SAMPLES} times, "
+                         f"p95 within the budget"):
+            with latency_budget(endpoint="change_team", p95_ms=3000, min_samples=LATENCY_BUDGET_SAMPLES):
+                for sample in range(LATENCY_BUDGET_SAMPLES):
+                    payload = {"licenseIds": license_ids, "targetTeamId": TEAM_2_ID if sample % 2 == 0 else TEAM_1_ID}
+                    response = self.api_licenses.change_licenses_team(payload=payload, headers=self.org_admin_headers)
+                    assert response.status_code == 200
+
     # -------------------------
     # Negative tests
     # -------------------------
     @allure.title("Fail when licenseIds missing")
     @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.side_effect_free
     def test_fails_when_licenseIds_missing(self):
         with allure.step("Arrange: prepare payload"):
             payload = {"targetTeamId": TEAM_2_ID}
@@ -74,26 +77,27 @@ class TestChangeLicensesTeam(BaseTest):
 
         with allure.step("Assert: 400 + validate error response"):
             assert response.status_code == 400
-            ErrorResponse(**response.json())
+            response.parse(ErrorResponse)
 
     @allure.title("Fail when targetTeamId missing")
     @allure.severity(allure.severity_level.NORMAL)
-    def test_fails_when_targetTeamId_missing(self):
+    @pytest.mark.side_effect_free
+    def test_fails_when_targetTeamId_missing(self, license_pool):
         with allure.step("Arrange: prepare payload"):
-            license_id = self.api_licenses.get_available_to_assign_team_license_id(
-                headers=self.org_admin_headers,
-                team_id=TEAM_1_ID
-            )
+            license_id = license_pool.acquire(TEAM_1_ID)
             payload = {"licenseIds": [license_id]}
         with allure.step("Act: call API with missing targetTeamId"):
             response = self.api_licenses.change_licenses_team(payload=payload, headers=self.org_admin_headers)
 
         with allure.step("Assert: 400 + validate error response"):
             assert response.status_code == 400
-            ErrorResponse(**response.json())
+            response.parse(ErrorResponse)
+            # Rejected, the license stayed where it was
+            license_pool.release(license_id)
 
     @allure.title("Fail when licenseIds empty")
     @allure.severity(allure.severity_level.NORMAL)
+    @pytest.mark.side_effect_free
     def test_fails_when_licenseIds_empty(self):
         with allure.step("Arrange: prepare payload"):
             payload = {"licenseIds": [], "targetTeamId": TEAM_2_ID}
@@ -102,65 +106,24 @@ class TestChangeLicensesTeam(BaseTest):
 
         with allure.step("Assert: 400 + validate error response"):
             assert response.status_code == 400
-            ErrorResponse(**response.json())
-
-    @allure.title("Fail when team admin user tries to change licenses team")
-    @allure.severity(allure.severity_level.CRITICAL)
-    def test_fails_when_team_admin(self, base_change_team_payload):
-        with allure.step("Arrange: prepare payload"):
-            payload = copy.deepcopy(base_change_team_payload)
-
-        with allure.step("Act: call API with unauthorized headers"):
-            response = self.api_licenses.change_licenses_team(payload=payload, headers=self.team_admin_headers)
-
-        with allure.step("Assert: 403 + validate error response"):
-            assert response.status_code == 403
-            ErrorResponse(**response.json())
-
-    @allure.title("Fail when team viewer user tries to change licenses team")
-    @allure.severity(allure.severity_level.CRITICAL)
-    def test_fails_when_team_viewer(self, base_change_team_payload):
-        with allure.step("Arrange: prepare payload"):
-            payload = copy.deepcopy(base_change_team_payload)
-
-        with allure.step("Act: call API with unauthorized headers"):
-            response = self.api_licenses.change_licenses_team(payload=payload, headers=self.team_viewer_headers)
-
-        with allure.step("Assert: 403 + validate error response"):
-            assert response.status_code == 403
-            ErrorResponse(**response.json())
+            response.parse(ErrorResponse)
 
     @allure.title("Concurrent transfer: one succeeds, other fails if licenses overlap")
     @allure.severity(allure.severity_level.CRITICAL)
-    def test_concurrent_transfer(self):
-        with allure.step("Arrange: get a free licenseId and prepare two payloads"):
-            license_id = self.api_licenses.get_available_to_assign_team_license_id(
-                headers=self.org_admin_headers,
-                team_id=TEAM_1_ID
-            )
-
-            p1 = {"licenseIds": [license_id], "targetTeamId": TEAM_2_ID}
-            p2 = {"licenseIds": [license_id], "targetTeamId": TEAM_2_ID}
-
-        with allure.step("Act: send two requests in parallel"):
-            results = []
-
-            def thread_call(payload):
-                resp = self.api_licenses.change_licenses_team(payload=payload, headers=self.org_admin_headers)
-                results.append(resp)
-
-            t1 = threading.Thread(target=thread_call, args=(p1,))
-            t2 = threading.Thread(target=thread_call, args=(p2,))
-
-            t1.start()
-            t2.start()
-            t1.join()
-            t2.join()
-
-        with allure.step("Assert: one response 200, other 400"):
-            status_codes = sorted([r.status_code for r in results])
-            assert status_codes == [200, 400]
-
-            for r in results:
-                if r.status_code == 400:
-                    ErrorResponse(**r.json())
+    def test_concurrent_transfer(self, license_pool, race_harness):
+        def prepare(_):
+            return {"licenseIds": [license_pool.acquire(TEAM_1_ID)], "targetTeamId": TEAM_2_ID}
+
+        def transfer(client, _, payload):
+            return client.change_licenses_team(payload=payload, headers=self.org_admin_headers)
+
+        with allure.step(f"Act: race {race_harness.contenders} transfers of one licenseId, {RACE_REPETITIONS} times"):
+            outcomes = race_harness.repeat(RACE_REPETITIONS, prepare, transfer)
+            race_harness.attach(outcomes)
+
+        with allure.step("Assert: every race has exactly one 200, the rest fail with 400"):
+            for outcome in outcomes:
+                outcome.expect({200: 1, 400: race_harness.contenders - 1})
+                for response in outcome.responses:
+                    if response.status_code == 400:
+                        response.parse(ErrorResponse)
@@ -0,0 +1,59 @@
+import copy
+
+import allure
+import pytest
+from config.constants import TEAM_1_ID
+from config.headers import Headers
+from services.licenses.api_licenses import LicensesApi
+from services.licenses.payloads import Payloads
+from services.licenses.stub_server import LicensesStubServer, LicensesStubState, ORG_ADMIN
+from utils.deferred import Deferred
+
+
+@allure.epic("Licenses API")
+@allure.feature("Lazy payloads")
+class TestDeferredPayloads:
+
+    @pytest.fixture
+    def headers(self):
+        return Headers.org_admin(customer_code="stub-org", api_key="stub-org-key")
+
+    @pytest.fixture
+    def api(self):
+        roles = {("stub-org", "stub-org-key"): (ORG_ADMIN, None)}
+        with LicensesStubServer(state=LicensesStubState(licenses_per_team=10), roles=roles) as stub:
+            yield LicensesApi(base_url=stub.base_url)
+
+    @pytest.fixture
+    def resolutions(self):
+        return []
+
+    @pytest.fixture
+    def payload(self, api, headers, resolutions):
+        def resolve():
+            resolutions.append(TEAM_1_ID)
+            return api.get_available_to_assign_team_license_id(headers=headers, team_id=TEAM_1_ID)
+
+        payload = Payloads.get_base_assign_license_payload()
+        payload["licenseId"] = Deferred(resolve)
+        return payload
+
+    @allure.title("A removed deferred licenseId is never resolved")
+    def test_removed_field_is_not_resolved(self, api, headers, payload, resolutions):
+        payload = copy.deepcopy(payload)
+        del payload["licenseId"]
+
+        response = api.assign_license(headers=headers, payload=payload)
+
+        assert response.status_code == 400
+        assert resolutions == []
+
+    @allure.title("A deferred licenseId is resolved once at send time and written back into the payload")
+    def test_field_is_resolved_when_sent(self, api, headers, payload, resolutions):
+        first, second = copy.deepcopy(payload), copy.deepcopy(payload)
+        assert not first["licenseId"].resolved
+
+        assert api.assign_license(headers=headers, payload=first).status_code == 200
+        assert isinstance(first["licenseId"], str)
+        assert second["licenseId"].resolve() == first["licenseId"]
+        assert resolutions == [TEAM_1_ID]
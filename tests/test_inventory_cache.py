@@ -0,0 +1,95 @@
+import time
+
+import allure
+import pytest
+from config.constants import TEAM_1_ID, TEAM_2_ID
+from config.headers import Headers
+from services.licenses.api_licenses import LicensesApi
+from services.licenses.payloads import Payloads
+from services.licenses.stub_server import LicensesStubServer, LicensesStubState, ORG_ADMIN
+
+
+@allure.epic("Licenses API")
+@allure.feature("Inventory cache")
+class TestInventoryCache:
+
+    @pytest.fixture
+    def headers(self):
+        return Headers.org_admin(customer_code="stub-org", api_key="stub-org-key")
+
+    @pytest.fixture
+    def stub(self):
+        roles = {("stub-org", "stub-org-key"): (ORG_ADMIN, None)}
+        with LicensesStubServer(state=LicensesStubState(licenses_per_team=6), roles=roles) as stub:
+            yield stub
+
+    @pytest.fixture
+    def api(self, stub, headers):
+        api = LicensesApi(base_url=stub.base_url, inventory_ttl=60)
+        # Both teams cached, every test starts from two misses
+        for team_id in (TEAM_1_ID, TEAM_2_ID):
+            api.get_team_inventory(headers=headers, team_id=team_id)
+        return api
+
+    @staticmethod
+    def available(api: LicensesApi, headers: dict, team_id: int) -> set:
+        return {license_obj["licenseId"] for license_obj in api.get_team_inventory(headers=headers, team_id=team_id)
+                if license_obj["isAvailableToAssign"]}
+
+    @allure.title("Inventory is served from the cache until the TTL runs out")
+    def test_ttl(self, stub, headers):
+        api = LicensesApi(base_url=stub.base_url, inventory_ttl=0.5)
+        first = api.get_team_inventory(headers=headers, team_id=TEAM_1_ID)
+
+        assert api.get_team_inventory(headers=headers, team_id=TEAM_1_ID) is first
+        assert (api.cache_hits, api.cache_misses) == (1, 1)
+
+        time.sleep(0.6)
+
+        assert api.get_team_inventory(headers=headers, team_id=TEAM_1_ID) is not first
+        assert (api.cache_hits, api.cache_misses) == (1, 2)
+
+    @allure.title("Assigning by licenseId drops only the cached team that holds the license")
+    def test_assign_by_license_id_invalidates_team(self, api, headers):
+        license_id = sorted(self.available(api, headers, TEAM_1_ID))[0]
+        payload = Payloads.get_base_assign_license_payload()
+        payload["licenseId"] = license_id
+
+        assert api.assign_license(headers=headers, payload=payload).status_code == 200
+
+        assert license_id not in self.available(api, headers, TEAM_1_ID)
+        self.available(api, headers, TEAM_2_ID)
+        assert api.cache_misses == 3
+
+    @allure.title("Assigning by productCode + team drops that team's cached inventory")
+    def test_assign_by_team_invalidates_team(self, api, headers):
+        before = self.available(api, headers, TEAM_1_ID)
+        payload = Payloads.get_base_assign_license_payload()
+        del payload["licenseId"]
+        payload["license"] = {"productCode": "II", "team": TEAM_1_ID}
+
+        assert api.assign_license(headers=headers, payload=payload).status_code == 200
+
+        assert len(self.available(api, headers, TEAM_1_ID)) == len(before) - 1
+        assert api.cache_misses == 3
+
+    @allure.title("Changing team drops the cached inventory of the source and the target team")
+    def test_change_team_invalidates_both_teams(self, api, headers):
+        license_id = sorted(self.available(api, headers, TEAM_1_ID))[0]
+
+        response = api.change_licenses_team(headers=headers,
+                                            payload={"licenseIds": [license_id], "targetTeamId": TEAM_2_ID})
+
+        assert response.status_code == 200
+        assert license_id not in self.available(api, headers, TEAM_1_ID)
+        assert license_id in self.available(api, headers, TEAM_2_ID)
+        assert api.cache_misses == 4
+
+    @allure.title("Rejected requests keep the cache")
+    def test_rejected_request_keeps_cache(self, api, headers):
+        response = api.change_licenses_team(headers=headers,
+                                            payload={"licenseIds": ["MISSING"], "targetTeamId": TEAM_2_ID})
+
+        assert response.status_code != 200
+        self.available(api, headers, TEAM_1_ID)
+        assert api.cache_misses == 2
@@ -0,0 +1,113 @@
+import json
+
+import allure
+import pytest
+from config.base_test import BaseTest
+from config.constants import TEAM_1_ID
+from config.headers import Headers
+from services.licenses.api_licenses import LicensesApi
+from services.licenses.endpoints import Endpoints
+from services.licenses.stub_server import LicensesStubServer, LicensesStubState, ORG_ADMIN
+from utils.cassette import cassette
+from utils.latency_budget import LatencyBudget, LatencyBudgets, latency_budget, latency_budgets
+from utils.metrics import RequestRecord
+
+
+def record(endpoint: str, duration_ms: float, method: str = "GET") -> RequestRecord:
+    return RequestRecord(method=method, endpoint=endpoint, status=200, role="org_admin", url="", duration_ms=duration_ms,
+                         server_ms=duration_ms, started_at=0.0)
+
+
+@allure.epic("Licenses API")
+@allure.feature("Latency budgets")
+class TestLatencyBudgetChecks:
+
+    @pytest.fixture
+    def budgets(self, tmp_path):
+        path = tmp_path / "budgets.json"
+        path.write_text(json.dumps({"ci": {"team_licenses": {"p95_ms": 50}}}))
+        budgets = LatencyBudgets(environment="", path=str(path))
+        budgets.configure(aliases=Endpoints.NAMES)
+        return budgets
+
+    @allure.title("Percentiles over all samples are held against the budget")
+    def test_percentile_miss(self, budgets):
+        samples = budgets.start()
+        for duration in [10] * 18 + [300] * 2:
+            samples.record(record(Endpoints.TEAM_LICENSES, duration))
+        budgets.stop(samples)
+
+        budgets.check([latency_budget(endpoint="team_licenses", p90_ms=20)], samples)
+        with pytest.raises(AssertionError, match=r"p95 \d+\.\dms > budget 100ms \(n=20\)"):
+            budgets.check([latency_budget(endpoint="team_licenses", p95_ms=100)], samples)
+
+    @allure.title("The environment's section overrides the thresholds written in the test")
+    def test_environment_override(self, budgets):
+        samples = budgets.start()
+        samples.record(record(Endpoints.TEAM_LICENSES, 80))
+        budgets.stop(samples)
+        budget = latency_budget(endpoint="team_licenses", p95_ms=100, max_ms=90)
+
+        budgets.check([budget], samples)
+        budgets.configure(environment="ci")
+        with pytest.raises(AssertionError, match=r"\(ci\): any /customer/teams/\{team_id\}/licenses: p95 80\.\dms "
+                                                 r"> budget 50ms"):
+            budgets.check([budget], samples)
+        budgets.configure(environment="off")
+        budgets.check([budget], samples)
+
+    @allure.title("Too few samples fail the budget, other endpoints and methods don't count")
+    def test_min_samples(self, budgets):
+        samples = budgets.start()
+        samples.record(record(Endpoints.TEAM_LICENSES, 5))
+        samples.record(record(Endpoints.ASSIGN_LICENSES, 5, method="POST"))
+        budgets.stop(samples)
+
+        with pytest.raises(AssertionError, match="1 samples, at least 2 needed"):
+            budgets.check([latency_budget(endpoint="team_licenses", p95_ms=100, min_samples=2)], samples)
+        with pytest.raises(AssertionError, match="0 samples"):
+            budgets.check([latency_budget(endpoint="assign", method="GET", p95_ms=100)], samples)
+
+    @allure.title("Unknown thresholds are rejected")
+    def test_unknown_threshold(self):
+        with pytest.raises(ValueError, match="p96_ms"):
+            LatencyBudget("assign", p96_ms=1)
+
+
+@allure.epic("Licenses API")
+@allure.feature("Latency budgets")
+class TestLatencyBudgetBlock:
+
+    @pytest.fixture
+    def stub(self):
+        roles = {("stub-org", "stub-org-key"): (ORG_ADMIN, None)}
+        with LicensesStubServer(state=LicensesStubState(licenses_per_team=5), roles=roles, latency=0.03) as stub:
+            yield stub
+
+    @allure.title("A block only counts the requests sent inside it and fails when they are too slow")
+    def test_block_against_slow_stub(self, stub):
+        if not latency_budgets.enabled or cassette.replaying:
+            pytest.skip("Latency budgets are not checked in this run")
+        api = LicensesApi(base_url=stub.base_url)
+        headers = Headers.org_admin(customer_code="stub-org", api_key="stub-org-key")
+        api.get_team_licenses(headers, TEAM_1_ID)
+
+        # max_ms is not named in the environment's section, so the test's own number holds
+        with pytest.raises(AssertionError, match=r"max \d+\.\dms > budget 10ms \(n=3\)"):
+            with latency_budget(endpoint="team_licenses", max_ms=10, min_samples=3) as samples:
+                for _ in range(3):
+                    api.get_team_licenses(headers, TEAM_1_ID)
+        assert samples.histogram(Endpoints.TEAM_LICENSES).count == 3
+
+
+@allure.epic("Licenses API")
+@allure.feature("Latency budgets")
+class TestTeamLicensesLatency(BaseTest):
+
+    @allure.title("Team inventory reads stay within the latency budget")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_team_licenses_latency(self):
+        with allure.step("Act: read the team's licenses 20 times"):
+            with latency_budget(endpoint="team_licenses", p95_ms=2000, min_samples=20):
+                for _ in range(20):
+                    assert self.api_licenses.get_team_licenses(self.org_admin_headers, TEAM_1_ID).status_code == 200
@@ -0,0 +1,116 @@
+import allure
+import pytest
+from config.constants import TEAM_1_ID, TEAM_2_ID, VALID_EMAIL_1
+from config.headers import Headers
+from services.licenses.api_licenses import LicensesApi
+from services.licenses.license_index import LicenseIndex
+from services.licenses.payloads import Payloads
+from services.licenses.stub_server import LicensesStubServer, LicensesStubState, ORG_ADMIN
+
+
+@allure.epic("Licenses API")
+@allure.feature("License index")
+class TestLicenseIndex:
+
+    @pytest.fixture
+    def headers(self):
+        return Headers.org_admin(customer_code="stub-org", api_key="stub-org-key")
+
+    @pytest.fixture
+    def api(self):
+        roles = {("stub-org", "stub-org-key"): (ORG_ADMIN, None)}
+        with LicensesStubServer(state=LicensesStubState(licenses_per_team=30), roles=roles) as stub:
+            yield LicensesApi(base_url=stub.base_url)
+
+    @pytest.fixture
+    def index(self, api, headers):
+        return LicenseIndex.build(api=api, headers=headers, team_ids=[TEAM_1_ID, TEAM_2_ID]).attach(api)
+
+    @allure.title("Index answers lookups by team, product and availability")
+    def test_lookups(self, index):
+        assert len(index) == 60
+        assert len(index.by_team(TEAM_1_ID)) == 30
+        assert len(index.by_product("II")) == 20
+        assert index.count_available() == 60
+        assert index.available(team_id=TEAM_1_ID, product_code="PC") == \
+            index.by_team(TEAM_1_ID) & index.by_product("PC")
+
+    @allure.title("Assignment through LicensesApi updates the index in place")
+    def test_assignment_updates_index(self, api, index, headers):
+        license_id = index.first_available(TEAM_1_ID, "WS")
+        payload = Payloads.get_base_assign_license_payload()
+        payload["licenseId"] = license_id
+
+        assert api.assign_license(headers=headers, payload=payload).status_code == 200
+
+        assert license_id not in index.available(team_id=TEAM_1_ID)
+        assert index.by_assignee(VALID_EMAIL_1) == {license_id}
+        assert index.count_available(TEAM_1_ID, "WS") == 9
+
+    @allure.title("Team change through LicensesApi moves licenses between teams in the index")
+    def test_team_change_updates_index(self, api, index, headers):
+        license_ids = sorted(index.available(team_id=TEAM_1_ID, product_code="II"))[:3]
+
+        response = api.change_licenses_team(headers=headers,
+                                             payload={"licenseIds": license_ids, "targetTeamId": TEAM_2_ID})
+
+        assert response.status_code == 200
+        assert not index.by_team(TEAM_1_ID) & set(license_ids)
+        assert set(license_ids) <= index.available(team_id=TEAM_2_ID, product_code="II")
+        assert index.get(license_ids[0])["team"]["id"] == TEAM_2_ID
+
+    @allure.title("Assignment by product code marks the team stale and refresh re-reads only that team")
+    def test_assignment_by_product_refreshes_team(self, api, index, headers):
+        payload = Payloads.get_base_assign_license_payload()
+        del payload["licenseId"]
+        payload["license"] = {"productCode": "PC", "team": TEAM_1_ID}
+
+        assert api.assign_license(headers=headers, payload=payload).status_code == 200
+        assert index.stale_teams == {TEAM_1_ID}
+
+        index.refresh(api=api, headers=headers)
+
+        assert index.stale_teams == set()
+        assert index.count_available(TEAM_1_ID, "PC") == 9
+        assert index.count_available(TEAM_2_ID) == 30
+
+    @allure.title("A license re-read under another team is indexed once, under its new team")
+    def test_refresh_after_move(self, api, index, headers):
+        index.detach(api)
+        license_id = index.first_available(TEAM_1_ID, "II")
+        assert api.change_licenses_team(headers=headers, payload={"licenseIds": [license_id],
+                                                                  "targetTeamId": TEAM_2_ID}).status_code == 200
+
+        index.refresh(api=api, headers=headers, team_ids=[TEAM_2_ID])
+
+        assert license_id in index.by_team(TEAM_2_ID)
+        assert license_id not in index.available(team_id=TEAM_1_ID)
+        assert len(index) == 60
+
+        index.refresh(api=api, headers=headers, team_ids=[TEAM_1_ID])
+
+        assert len(index) == 60
+        assert index.count_available(TEAM_1_ID) == 29
+
+    @allure.title("The first available license is the first one the server listed, every time")
+    def test_first_available_is_repeatable(self, api, index, headers):
+        listed = [license_obj["licenseId"] for license_obj in api.get_team_licenses(headers=headers,
+                                                                                    team_id=TEAM_1_ID).json()
+                  if license_obj["product"]["code"] == "WS" and license_obj["isAvailableToAssign"]]
+
+        assert index.first_available(TEAM_1_ID, "WS") == listed[0]
+        assert index.first_available(TEAM_1_ID) == index.first_available(TEAM_1_ID)
+
+    @allure.title("Licenses moved into an indexed team from outside the index are picked up on refresh")
+    def test_team_change_from_unindexed_team(self, api, headers):
+        index = LicenseIndex.build(api=api, headers=headers, team_ids=[TEAM_2_ID]).attach(api)
+        license_id = api.get_team_licenses(headers=headers, team_id=TEAM_1_ID).json()[0]["licenseId"]
+
+        assert api.change_licenses_team(headers=headers, payload={"licenseIds": [license_id],
+                                                                  "targetTeamId": TEAM_2_ID}).status_code == 200
+        assert index.stale_teams == {TEAM_2_ID}
+
+        index.refresh(api=api, headers=headers)
+
+        assert license_id in index.by_team(TEAM_2_ID)
+        assert len(index) == 31
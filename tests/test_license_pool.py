@@ -0,0 +1,111 @@
+import allure
+import pytest
+from config.constants import TEAM_1_ID
+from config.headers import Headers
+from services.licenses.api_licenses import LicensesApi
+from services.licenses.license_pool import LicensePool
+from services.licenses.payloads import Payloads
+from services.licenses.stub_server import LicensesStubServer, LicensesStubState, ORG_ADMIN
+
+
+@allure.epic("Test infrastructure")
+@allure.feature("License pool")
+class TestLicensePool:
+
+    @pytest.fixture
+    def stub(self):
+        roles = {("stub-org", "stub-org-key"): (ORG_ADMIN, None)}
+        with LicensesStubServer(state=LicensesStubState(licenses_per_team=9), roles=roles) as stub:
+            yield stub
+
+    @pytest.fixture
+    def pool(self, stub):
+        return LicensePool(api=LicensesApi(base_url=stub.base_url), low_watermark=3, worker_index=0, worker_count=1,
+                           headers=Headers.org_admin(customer_code="stub-org", api_key="stub-org-key"))
+
+    @allure.title("The first acquire loads the team's inventory, later ones are served from the queue")
+    def test_refill_on_first_acquire(self, pool):
+        assert pool.refills == 0
+
+        license_ids = [pool.acquire(TEAM_1_ID) for _ in range(3)]
+
+        assert pool.refills == 1
+        assert len(set(license_ids)) == 3
+
+    @allure.title("Below the low watermark the pool refills and picks up new licenses")
+    def test_low_watermark_refill(self, pool, stub):
+        issued = [pool.acquire(TEAM_1_ID) for _ in range(7)]
+        added = stub.state.add_license(TEAM_1_ID, "II")
+        assert pool.refills == 1
+
+        issued += [pool.acquire(TEAM_1_ID) for _ in range(3)]
+
+        assert added in issued
+        assert len(set(issued)) == 10
+
+    @allure.title("Licenses can be taken per product, the team queue skips them afterwards")
+    def test_per_product_queues(self, pool):
+        by_product = [pool.acquire(TEAM_1_ID, product_code="PC") for _ in range(3)]
+        rest = [pool.acquire(TEAM_1_ID) for _ in range(6)]
+
+        assert {pool.product_code(license_id) for license_id in by_product} == {"PC"}
+        assert not set(by_product) & set(rest)
+        with pytest.raises(AssertionError, match="product_code=PC"):
+            pool.acquire(TEAM_1_ID, product_code="PC")
+
+    @allure.title("An exhausted team fails with a clear error")
+    def test_exhaustion(self, pool):
+        for _ in range(9):
+            pool.acquire(TEAM_1_ID)
+
+        with pytest.raises(AssertionError, match=f"No available licenses to assign for team_id={TEAM_1_ID}"):
+            pool.acquire(TEAM_1_ID)
+
+    @allure.title("Released licenses are handed out again, releasing twice has no effect")
+    def test_release(self, pool):
+        license_id = pool.acquire(TEAM_1_ID)
+
+        pool.release(license_id)
+        pool.release(license_id)
+
+        assert pool.acquire(TEAM_1_ID, product_code=pool.product_code(license_id)) == license_id
+        assert license_id not in [pool.acquire(TEAM_1_ID) for _ in range(8)]
+
+    @allure.title("After an assignment the server picked the license for, the team is reloaded")
+    def test_invalidate(self, pool, stub):
+        pool.acquire(TEAM_1_ID)
+        payload = Payloads.get_base_assign_license_payload()
+        del payload["licenseId"]
+        payload["license"] = {"productCode": "WS", "team": TEAM_1_ID}
+        assert pool.api.assign_license(headers=pool.headers, payload=payload).status_code == 200
+
+        pool.invalidate(TEAM_1_ID)
+
+        assigned = {license_id for license_id, license_obj in stub.state.licenses.items() if license_obj["assignee"]}
+        assert len(assigned) == 1
+        assert not assigned & set(drain(pool))
+
+    @allure.title("Two workers never share a license and together cover the whole team")
+    def test_worker_partitioning(self, pool):
+        api, headers = pool.api, pool.headers
+        workers = [LicensePool(api=api, headers=headers, worker_index=index, worker_count=2) for index in range(2)]
+
+        shares = [set(drain(worker)) for worker in workers]
+
+        assert all(shares) and not shares[0] & shares[1]
+        assert shares[0] | shares[1] == set(drain(pool))
+        assert all(worker.owns(license_id) for worker, share in zip(workers, shares) for license_id in share)
+
+    @allure.title("A single worker gets every license")
+    def test_single_worker_owns_all(self, pool):
+        assert len(drain(pool)) == 9
+        assert all(pool.owns(f"STUB{number:06d}") for number in range(1, 100))
+
+
+def drain(pool: LicensePool) -> list:
+    license_ids = []
+    while True:
+        try:
+            license_ids.append(pool.acquire(TEAM_1_ID))
+        except AssertionError:
+            return license_ids
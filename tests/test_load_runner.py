@@ -0,0 +1,57 @@
+import time
+
+import allure
+import pytest
+from config.headers import Headers
+from services.licenses.load_runner import LoadRunner
+from services.licenses.stub_server import LicensesStubServer, LicensesStubState, ORG_ADMIN
+
+
+@allure.epic("Licenses API")
+@allure.feature("Load runner")
+class TestLoadRunner:
+
+    @pytest.fixture
+    def stub(self):
+        roles = {("stub-org", "stub-org-key"): (ORG_ADMIN, None)}
+        with LicensesStubServer(state=LicensesStubState(licenses_per_team=500), roles=roles) as stub:
+            yield stub
+
+    @allure.title("Every scenario reports throughput, errors and latency percentiles")
+    @pytest.mark.parametrize("scenario", LoadRunner.scenarios)
+    def test_scenario_report(self, stub, scenario):
+        runner = LoadRunner(scenario=scenario, concurrency=4, ramp_up=0.1, duration=0.5, base_url=stub.base_url,
+                            headers=Headers.org_admin(customer_code="stub-org", api_key="stub-org-key"))
+
+        report = runner.run()
+
+        assert report["requests"] > 0
+        assert report["status_codes"] == {"200": report["requests"]}
+        assert report["errors"] == {}
+        assert report["latency_ms"]["p50"] <= report["latency_ms"]["p95"] <= report["latency_ms"]["p99"]
+        assert sum(bucket["count"] for bucket in report["histogram"]) == report["requests"]
+
+    @allure.title("Errors are broken down by ErrorResponse code")
+    def test_errors_by_code(self, stub):
+        runner = LoadRunner(scenario="bulk_transfer", concurrency=2, duration=0.3, target_team_id=404,
+                            base_url=stub.base_url,
+                            headers=Headers.org_admin(customer_code="stub-org", api_key="stub-org-key"))
+
+        report = runner.run()
+
+        assert report["errors"] == {"TEAM_NOT_FOUND": report["requests"]}
+        assert report["status_codes"] == {"400": report["requests"]}
+
+    @allure.title("Workers wait for an open circuit instead of spinning on it")
+    def test_open_circuit_backs_off(self, stub):
+        stub.inject_fault(500, times=5, code="INTERNAL_ERROR")
+        runner = LoadRunner(scenario="inventory_polling", concurrency=1, duration=0.5, base_url=stub.base_url,
+                            headers=Headers.org_admin(customer_code="stub-org", api_key="stub-org-key"))
+
+        started = time.monotonic()
+        report = runner.run()
+
+        assert report["status_codes"] == {"500": 5}
+        # Seen once, then the worker sleeps until the circuit could close, here past the end of the run
+        assert report["errors"]["CircuitOpenError"] == 1
+        assert time.monotonic() - started < 1
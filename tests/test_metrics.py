@@ -0,0 +1,105 @@
+import allure
+import pytest
+from utils.metrics import SUB_BUCKET_COUNT, LatencyHistogram, RequestMetrics, RequestRecord, _bucket_bounds, \
+    _bucket_index
+
+
+def record(duration_ms: float, status: int = 200, endpoint: str = "/customer/licenses/assign") -> RequestRecord:
+    return RequestRecord(method="POST", endpoint=endpoint, status=status, role="org_admin", url=f"http://stub{endpoint}",
+                         duration_ms=duration_ms, server_ms=duration_ms, started_at=0.0)
+
+
+@allure.epic("API client")
+@allure.feature("Request metrics")
+class TestLatencyHistogram:
+
+    @allure.title("Every value falls inside its bucket, buckets are at most ~3% wide")
+    def test_bucket_bounds(self):
+        for value_us in list(range(0, 200)) + [255, 256, 1000, 12345, 999_999, 30_000_000]:
+            low, high = _bucket_bounds(_bucket_index(value_us))
+            assert low <= value_us <= high
+            assert high - low + 1 <= max(1, low / SUB_BUCKET_COUNT)
+        # Values below two sub-bucket ranges are exact
+        assert _bucket_bounds(_bucket_index(63)) == (63, 63)
+
+    @allure.title("Percentiles stay within the bucket error and are clamped to min/max")
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        for value in range(1, 101):
+            histogram.record_ms(value)
+
+        assert histogram.percentile_ms(50) == pytest.approx(50, rel=0.04)
+        assert histogram.percentile_ms(99) == pytest.approx(99, rel=0.04)
+        assert histogram.percentile_ms(100) == pytest.approx(100, rel=0.04)
+        assert histogram.percentile_ms(100) <= histogram.max_us / 1000
+        assert histogram.percentile_ms(0) == 1
+        assert LatencyHistogram().percentile_ms(95) == 0.0
+        assert [bucket["count"] for bucket in histogram.buckets_ms((10, 50))] == [10, 40, 50]
+
+    @allure.title("Merged histograms equal one histogram of all values, also after a round trip through JSON")
+    def test_merge(self):
+        whole, first, second = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+        for value in range(1, 201):
+            whole.record_ms(value * 1.5)
+            (first if value % 3 else second).record_ms(value * 1.5)
+
+        first.merge(LatencyHistogram.from_dict(second.to_dict()))
+        first.merge(LatencyHistogram())
+
+        assert first.summary() == whole.summary()
+
+
+@allure.epic("API client")
+@allure.feature("Request metrics")
+class TestRequestMetrics:
+
+    @allure.title("Summary has one row per endpoint, method, status and role")
+    def test_summary(self):
+        metrics = RequestMetrics()
+        for duration in (10, 20, 30):
+            metrics.record(record(duration))
+        metrics.record(record(5, status=400))
+
+        rows = metrics.summary()
+
+        assert [(row["status"], row["count"]) for row in rows] == [(200, 3), (400, 1)]
+        assert rows[0]["max_ms"] == 30 and rows[0]["min_ms"] == 10
+
+    @allure.title("Only the N slowest requests are kept, slowest first")
+    def test_slowest(self):
+        metrics = RequestMetrics(slowest=3)
+        for duration in (5, 50, 1, 30, 30, 40):
+            metrics.record(record(duration))
+
+        assert [row["duration_ms"] for row in metrics.slowest()] == [50, 40, 30]
+        assert [row["duration_ms"] for row in metrics.slowest(limit=1)] == [50]
+
+    @allure.title("Worker exports are merged into the controller's series and slowest requests")
+    def test_merge_exports(self, tmp_path):
+        path = str(tmp_path / "metrics.json")
+        worker, controller = RequestMetrics(slowest=2), RequestMetrics(slowest=2)
+        for duration in (100, 200):
+            worker.record(record(duration))
+        worker.record(record(7, endpoint="/customer/teams/{team_id}/licenses"))
+        worker.export(f"{path}.gw0")
+        controller.record(record(150))
+
+        controller.merge_exports(path)
+
+        assert [(row["endpoint"], row["count"]) for row in controller.summary()] == [
+            ("/customer/licenses/assign", 3), ("/customer/teams/{team_id}/licenses", 1)]
+        assert [row["duration_ms"] for row in controller.slowest()] == [200, 150]
+        assert not list(tmp_path.glob("metrics.json.gw*"))
+
+    @allure.title("Exports left by an interrupted run are cleared and never merged")
+    def test_clear_stale_exports(self, tmp_path):
+        path = str(tmp_path / "metrics.json")
+        stale, controller = RequestMetrics(), RequestMetrics()
+        stale.record(record(900))
+        stale.export(f"{path}.gw3")
+
+        controller.clear_exports(path)
+        controller.merge_exports(path)
+
+        assert controller.summary() == []
+        assert not list(tmp_path.glob("metrics.json.gw*"))
@@ -0,0 +1,37 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import allure
+from services.licenses.payloads import ContactFactory, Payloads
+
+
+@allure.epic("Licenses API")
+@allure.feature("Payloads")
+class TestPayloads:
+
+    @allure.title("Seeded contact factory hands out the same rows across batches")
+    def test_seeded_rows_are_reproducible(self):
+        first, second = ContactFactory(seed=7, batch_size=16), ContactFactory(seed=7, batch_size=16)
+
+        rows = [first.next_row() for _ in range(40)]
+
+        assert rows == [second.next_row() for _ in range(40)]
+        assert len({plate for _, _, plate in rows}) == 40
+        assert all(first_name and last_name for first_name, last_name, _ in rows)
+
+    @allure.title("Reseeding restarts the sequence")
+    def test_reseed_restarts_sequence(self):
+        Payloads.seed(11)
+        payloads = [Payloads.get_base_assign_license_payload() for _ in range(3)]
+        Payloads.seed(11)
+
+        assert [Payloads.get_base_assign_license_payload() for _ in range(3)] == payloads
+        assert payloads[0]["licenseId"].startswith("TEST-")
+
+    @allure.title("Importing payloads does not import Faker")
+    def test_faker_is_imported_lazily(self):
+        code = "import sys, services.licenses.payloads; print('faker' in sys.modules)"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                                cwd=Path(__file__).resolve().parents[1])
+        assert result.stdout.strip() == "False"
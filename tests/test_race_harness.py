@@ -0,0 +1,111 @@
+import time
+
+import allure
+import pytest
+from config.constants import TEAM_1_ID, TEAM_2_ID
+from config.headers import Headers
+from services.licenses.api_licenses import LicensesApi
+from services.licenses.payloads import Payloads
+from services.licenses.stub_server import LicensesStubServer, LicensesStubState, ORG_ADMIN
+from utils.race import RaceHarness
+
+
+@allure.epic("API client")
+@allure.feature("Race harness")
+class TestRaceHarness:
+
+    contenders = 8
+    latency = 0.02
+
+    @pytest.fixture
+    def headers(self):
+        return Headers.org_admin(customer_code="stub-org", api_key="stub-org-key")
+
+    @pytest.fixture
+    def stub(self):
+        roles = {("stub-org", "stub-org-key"): (ORG_ADMIN, None)}
+        # A little server latency keeps every contender in flight at once, so the overlap is measurable
+        with LicensesStubServer(state=LicensesStubState(licenses_per_team=50), roles=roles,
+                                latency=self.latency) as stub:
+            yield stub
+
+    @pytest.fixture
+    def harness(self, stub):
+        def client_factory(session):
+            return LicensesApi(session=session, base_url=stub.base_url)
+
+        with RaceHarness(self.contenders, client_factory=client_factory, warm_url=stub.base_url) as harness:
+            yield harness
+
+    @staticmethod
+    def free_licenses(stub, team_id: int) -> list:
+        return [license_id for license_id, record in stub.state.licenses.items()
+                if record["team"]["id"] == team_id and record["assignee"] is None]
+
+    @allure.title("N contenders assigning one license: exactly one wins in every repetition")
+    def test_assign_race_has_one_winner(self, stub, harness, headers):
+        free = iter(self.free_licenses(stub, TEAM_1_ID))
+
+        def prepare(_):
+            license_id = next(free)
+            payloads = []
+            for _ in range(self.contenders):
+                payload = Payloads.get_base_assign_license_payload()
+                payload["licenseId"] = license_id
+                payloads.append(payload)
+            return payloads
+
+        started = time.perf_counter()
+        outcomes = harness.repeat(20, prepare, lambda client, index, payloads: client.assign_license(
+            payload=payloads[index], headers=headers))
+        elapsed = time.perf_counter() - started
+
+        # Sent one after another the requests would be contenders * latency apart (160ms), a starved contender on
+        # a busy single-core machine was measured at ~50ms behind the others
+        skew_tolerance_ms = self.contenders * self.latency * 1000 / 2
+        for outcome in outcomes:
+            outcome.expect({200: 1, 400: self.contenders - 1})
+            assert outcome.overlap_ms > 0 or outcome.skew_ms < skew_tolerance_ms, outcome.summary()
+        # 20 races of 8 requests cost about 20 server round trips, not 160
+        assert elapsed < 20 * self.latency * 4
+
+    @allure.title("Transfer race moves the license once")
+    def test_transfer_race_has_one_winner(self, stub, harness, headers):
+        license_id = self.free_licenses(stub, TEAM_1_ID)[0]
+        outcome = harness.run(lambda client, _: client.change_licenses_team(
+            payload={"licenseIds": [license_id], "targetTeamId": TEAM_2_ID}, headers=headers))
+
+        outcome.expect({200: 1, 400: self.contenders - 1})
+        assert stub.state.licenses[license_id]["team"]["id"] == TEAM_2_ID
+
+    @allure.title("A contender that raises is reported, the others still finish")
+    def test_errors_are_captured(self, harness):
+        def action(client, index):
+            if index == 0:
+                raise RuntimeError("boom")
+            return None
+
+        outcome = harness.run(action)
+
+        assert isinstance(outcome.results[0].error, RuntimeError)
+        assert outcome.statuses == [None] * self.contenders
+        assert outcome.summary()["errors"] == ["RuntimeError('boom')"]
+
+    @allure.title("A broken invariant fails with the race summary")
+    def test_expect_reports_summary(self, stub, harness, headers):
+        outcome = harness.run(lambda client, _: client.get_team_licenses(headers=headers, team_id=TEAM_1_ID))
+
+        with pytest.raises(AssertionError, match="overlap_ms"):
+            outcome.expect({200: 1})
+
+    @allure.title("An idle harness outlives its timeout, the next race still runs")
+    def test_idle_longer_than_timeout(self, stub, headers):
+        def client_factory(session):
+            return LicensesApi(session=session, base_url=stub.base_url)
+
+        with RaceHarness(2, client_factory=client_factory, warm_url=stub.base_url, timeout=1) as harness:
+            first = harness.run(lambda client, _: client.get_team_licenses(headers=headers, team_id=TEAM_1_ID))
+            time.sleep(1.5)
+            second = harness.run(lambda client, _: client.get_team_licenses(headers=headers, team_id=TEAM_1_ID))
+
+        assert first.statuses == second.statuses == [200, 200]
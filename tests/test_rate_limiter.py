@@ -0,0 +1,182 @@
+import threading
+import time
+
+import allure
+import pytest
+import requests
+from config.constants import TEAM_1_ID
+from config.headers import Headers
+from services.licenses.api_licenses import LicensesApi
+from services.licenses.payloads import Payloads
+from services.licenses.stub_server import LicensesStubServer, LicensesStubState, ORG_ADMIN
+from utils.rate_limiter import (AdaptiveConcurrency, CircuitBreaker, CircuitOpenError, RateLimiter, TokenBucket,
+                                parse_retry_after)
+
+
+@allure.epic("API client")
+@allure.feature("Rate limiting")
+class TestRateLimiterUnits:
+
+    @allure.title("Retry-After is read as seconds or as an HTTP date")
+    def test_parse_retry_after(self):
+        assert parse_retry_after("2") == 2.0
+        assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+        assert parse_retry_after("soon") is None
+        assert parse_retry_after(None) is None
+
+    @allure.title("Token bucket holds callers to the configured rate after the burst")
+    def test_token_bucket_rate(self):
+        bucket = TokenBucket(rate=200, burst=5)
+        started = time.monotonic()
+        for _ in range(25):
+            bucket.acquire()
+        assert time.monotonic() - started >= 20 / 200 * 0.9
+
+    @allure.title("Concurrency limit halves once per overload and grows back additively")
+    def test_aimd_concurrency(self):
+        concurrency = AdaptiveConcurrency(max_limit=16)
+        in_flight = [concurrency.acquire() for _ in range(8)]
+        for started in in_flight:
+            concurrency.release(started, throttled=True)
+        assert concurrency.limit == 8
+
+        for _ in range(8):
+            concurrency.release(concurrency.acquire(), throttled=False)
+        assert concurrency.limit == pytest.approx(9, abs=0.1)
+
+    @allure.title("Circuit opens after consecutive failures and closes after a successful trial")
+    def test_circuit_breaker(self):
+        breaker = CircuitBreaker(threshold=2, reset_timeout=0.05)
+        breaker.record(failed=True)
+        breaker.before_request("/endpoint")
+        breaker.record(failed=True)
+        assert breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            breaker.before_request("/endpoint")
+
+        time.sleep(0.06)
+        breaker.before_request("/endpoint")
+        with pytest.raises(CircuitOpenError):
+            breaker.before_request("/endpoint")
+        breaker.record(failed=False)
+        assert breaker.state == "closed"
+
+    @allure.title("Circuits are kept per host, a failing host doesn't open the circuit of another")
+    def test_circuit_per_host(self):
+        limiter = RateLimiter(retries=0, breaker_threshold=1, breaker_reset=60)
+
+        def unreachable():
+            raise requests.ConnectionError("unreachable")
+
+        with pytest.raises(requests.ConnectionError):
+            limiter.call("GET", "/teams", unreachable, url="https://live.example/teams")
+        with pytest.raises(CircuitOpenError):
+            limiter.call("GET", "/teams", unreachable, url="https://live.example/teams")
+        answered = requests.Response()
+        answered.status_code = 200
+        assert limiter.call("GET", "/teams", lambda: answered, url="http://127.0.0.1:8080/teams") is answered
+
+        limiter.reset()
+        assert limiter.stats()["circuits"] == {}
+
+    @allure.title("A trial request that fails outside the transport doesn't keep the circuit open")
+    def test_trial_released_on_other_errors(self):
+        limiter = RateLimiter(retries=0, breaker_threshold=1, breaker_reset=0)
+        breaker = limiter.breaker("/teams")
+        breaker.record(failed=True)
+
+        def broken():
+            raise OSError("cassette file is gone")
+
+        with pytest.raises(OSError):
+            limiter.call("GET", "/teams", broken)
+        assert breaker.state == "half_open"
+        breaker.before_request("/teams")
+
+
+@allure.epic("API client")
+@allure.feature("Rate limiting")
+class TestRateLimitedLicensesApi:
+
+    @pytest.fixture
+    def headers(self):
+        return Headers.org_admin(customer_code="stub-org", api_key="stub-org-key")
+
+    @pytest.fixture
+    def stub(self):
+        roles = {("stub-org", "stub-org-key"): (ORG_ADMIN, None)}
+        with LicensesStubServer(state=LicensesStubState(licenses_per_team=50), roles=roles) as stub:
+            yield stub
+
+    @pytest.fixture
+    def limiter(self):
+        return RateLimiter(retries=3, breaker_threshold=3, breaker_reset=60)
+
+    @pytest.fixture
+    def api(self, stub, limiter):
+        return LicensesApi(base_url=stub.base_url, limiter=limiter)
+
+    def assign_payload(self, stub):
+        payload = Payloads.get_base_assign_license_payload()
+        payload["licenseId"] = next(iter(stub.state.licenses))
+        return payload
+
+    @allure.title("429 with Retry-After is waited out and retried, also for assign")
+    def test_retries_429_after_retry_after(self, api, stub, limiter, headers):
+        stub.inject_fault(429, times=2, retry_after="0.1", code="TOO_MANY_REQUESTS")
+        started = time.monotonic()
+
+        response = api.assign_license(headers=headers, payload=self.assign_payload(stub))
+
+        assert response.status_code == 200
+        assert time.monotonic() - started >= 0.2
+        assert (limiter.throttled, limiter.retried) == (2, 2)
+
+    @allure.title("503 on a non-idempotent assign is returned, never retried")
+    def test_does_not_retry_503_for_assign(self, api, stub, limiter, headers):
+        stub.inject_fault(503, retry_after="0")
+
+        response = api.assign_license(headers=headers, payload=self.assign_payload(stub))
+
+        assert response.status_code == 503
+        assert limiter.retried == 0
+
+    @allure.title("503 on an idempotent GET is retried")
+    def test_retries_503_for_get(self, api, stub, limiter, headers):
+        stub.inject_fault(503, retry_after="0")
+
+        response = api.get_team_licenses(headers=headers, team_id=TEAM_1_ID)
+
+        assert response.status_code == 200
+        assert limiter.retried == 1
+
+    @allure.title("Circuit for an endpoint opens after repeated server errors, other endpoints keep working")
+    def test_circuit_opens_per_endpoint(self, api, stub, limiter, headers):
+        stub.inject_fault(500, times=3, code="INTERNAL_ERROR")
+        for _ in range(3):
+            assert api.assign_license(headers=headers, payload=self.assign_payload(stub)).status_code == 500
+
+        with pytest.raises(CircuitOpenError):
+            api.assign_license(headers=headers, payload=self.assign_payload(stub))
+        assert api.get_team_licenses(headers=headers, team_id=TEAM_1_ID).status_code == 200
+
+    @allure.title("Threads sharing a limiter back off together and all get through a rate-limited server")
+    def test_shared_limiter_under_server_rate_limit(self, stub, limiter, headers):
+        # Low enough that even a loaded single-core machine goes over it within the first second
+        stub.max_rps = 20
+        api = LicensesApi(base_url=stub.base_url, limiter=limiter)
+        statuses = []
+
+        def poll():
+            for _ in range(6):
+                statuses.append(api.get_team_licenses(headers=headers, team_id=TEAM_1_ID).status_code)
+
+        threads = [threading.Thread(target=poll) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert statuses == [200] * 48
+        assert limiter.throttled > 0
+        assert limiter.concurrency.limit < limiter.concurrency.max_limit
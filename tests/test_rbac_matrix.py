@@ -0,0 +1,121 @@
+import time
+
+import allure
+import pytest
+from config.constants import TEAM_1_ID
+from config.headers import Headers
+from services.licenses.api_licenses import LicensesApi
+from services.licenses.license_pool import LicensePool
+from services.licenses.models.assign_licenses_models import ErrorResponse
+from services.licenses.rbac_matrix import DENIED_STATUS, OPERATIONS, RbacMatrix, cells
+from services.licenses.stub_server import LicensesStubServer, LicensesStubState, ORG_ADMIN, TEAM_ADMIN, TEAM_VIEWER
+from utils.attachments import response_attachments
+
+
+@pytest.fixture(scope="session")
+def rbac_results(http_session, license_pool):
+    results = RbacMatrix(LicensesApi(session=http_session), license_pool).run(cells())
+    # Each cell re-records its own response below, none of them belongs to the test that happened to run first
+    response_attachments.discard()
+    return results
+
+
+@allure.epic("Licenses API")
+@allure.feature("RBAC")
+class TestRbacMatrix:
+
+    @pytest.mark.roles
+    # rbac_results runs the whole matrix once per process, spread over workers it would run (and assign) again on each
+    @pytest.mark.xdist_group("rbac-matrix")
+    @pytest.mark.parametrize("cell", cells(), ids=lambda cell: cell.id)
+    def test_rbac_cell(self, cell, rbac_results):
+        operation = cell.operation
+        allure.dynamic.title(f"{cell.role}: {operation.method} {operation.endpoint} -> {cell.expected_status}")
+        allure.dynamic.story(operation.name)
+        result = rbac_results[cell]
+        if result.error is not None:
+            raise result.error
+        response = result.response
+        response_attachments.record(operation.method, response.url, response)
+
+        with allure.step(f"Assert: {cell.role} gets HTTP {cell.expected_status}"):
+            assert response.status_code == cell.expected_status
+            if cell.expected_status == DENIED_STATUS:
+                response.parse(ErrorResponse)
+            elif operation.name == "assign_license":
+                assert not response.content
+
+
+@allure.epic("Licenses API")
+@allure.feature("RBAC")
+class TestRbacMatrixRunner:
+
+    latency = 0.05
+
+    @pytest.fixture
+    def stub(self):
+        roles = {("stub-org", "stub-org-key"): (ORG_ADMIN, None),
+                 ("stub-team", "stub-team-key"): (TEAM_ADMIN, {TEAM_1_ID}),
+                 ("stub-viewer", "stub-viewer-key"): (TEAM_VIEWER, {TEAM_1_ID})}
+        with LicensesStubServer(state=LicensesStubState(licenses_per_team=50), roles=roles,
+                                latency=self.latency) as stub:
+            yield stub
+
+    @staticmethod
+    def free_licenses(stub, team_id: int) -> list:
+        return [license_id for license_id, record in stub.state.licenses.items()
+                if record["team"]["id"] == team_id and record["assignee"] is None]
+
+    @pytest.fixture
+    def roles(self):
+        return {"org_admin": lambda: Headers.org_admin(customer_code="stub-org", api_key="stub-org-key"),
+                "team_admin": lambda: Headers.team_admin(customer_code="stub-team", api_key="stub-team-key"),
+                "team_viewer": lambda: Headers.team_viewer(customer_code="stub-viewer", api_key="stub-viewer-key")}
+
+    @allure.title("All cells run concurrently on one inventory snapshot")
+    def test_cells_run_concurrently(self, stub, roles):
+        api = LicensesApi(base_url=stub.base_url)
+        pool = LicensePool(api=api, headers=roles["org_admin"](), worker_index=0, worker_count=1)
+        matrix_cells = cells(roles)
+
+        started = time.perf_counter()
+        results = RbacMatrix(api, pool, roles=roles).run(matrix_cells)
+        elapsed = time.perf_counter() - started
+
+        assert {cell: result.response.status_code for cell, result in results.items()} == \
+               {cell: cell.expected_status for cell in matrix_cells}
+        assert api.cache_misses == 1
+        assert elapsed < len(matrix_cells) * self.latency / 2
+
+    @allure.title("Denied cells share one license, which goes back to the pool")
+    def test_denied_cells_share_one_license(self, stub, roles):
+        api = LicensesApi(base_url=stub.base_url)
+        pool = LicensePool(api=api, headers=roles["org_admin"](), worker_index=0, worker_count=1)
+        matrix_cells = cells(roles)
+        denied = [cell for cell in matrix_cells
+                  if cell.operation.license_team is not None and cell.expected_status == DENIED_STATUS]
+
+        RbacMatrix(api, pool, roles=roles).run(matrix_cells)
+
+        # 50 licenses, two assigned and one moved to the other team by the allowed cells
+        assert len(denied) == 3
+        assert len(self.free_licenses(stub, TEAM_1_ID)) == 47
+        left = []
+        with pytest.raises(AssertionError, match="No available licenses"):
+            while True:
+                left.append(pool.acquire(TEAM_1_ID))
+        assert len(left) == 47
+
+    @allure.title("A new role is one entry, its column follows from the operations' allowed roles")
+    def test_new_role_is_denied_by_default(self, stub, roles):
+        stub.roles[("stub-auditor", "stub-auditor-key")] = (TEAM_VIEWER, set())
+        roles = dict(roles, auditor=lambda: Headers.team_viewer(customer_code="stub-auditor",
+                                                                api_key="stub-auditor-key"))
+        api = LicensesApi(base_url=stub.base_url)
+        pool = LicensePool(api=api, headers=roles["org_admin"](), worker_index=0, worker_count=1)
+        auditor_cells = [cell for cell in cells(roles) if cell.role == "auditor"]
+
+        results = RbacMatrix(api, pool, roles=roles).run(auditor_cells)
+
+        assert len(auditor_cells) == len(OPERATIONS)
+        assert all(result.response.status_code == DENIED_STATUS for result in results.values())
@@ -0,0 +1,76 @@
+import allure
+import pytest
+from config.constants import TEAM_1_ID
+from config.headers import Headers
+from services.licenses.api_licenses import LicensesApi
+from services.licenses.payloads import Payloads
+from services.licenses.stub_server import LicensesStubServer, LicensesStubState, ORG_ADMIN, TEAM_VIEWER
+from utils.response_memo import ResponseMemo, payload_shape
+
+
+@allure.epic("API client")
+@allure.feature("Validation response memoization")
+class TestResponseMemo:
+
+    @pytest.fixture
+    def stub(self):
+        roles = {("stub-org", "stub-org-key"): (ORG_ADMIN, None),
+                 ("stub-org", "stub-viewer-key"): (TEAM_VIEWER, {TEAM_1_ID})}
+        with LicensesStubServer(state=LicensesStubState(licenses_per_team=20), roles=roles) as stub:
+            yield stub
+
+    @pytest.fixture
+    def memo(self):
+        memo = ResponseMemo(enabled=True)
+        memo.active = True
+        return memo
+
+    @pytest.fixture
+    def api(self, stub, memo):
+        return LicensesApi(base_url=stub.base_url, memo=memo)
+
+    @pytest.fixture
+    def headers(self):
+        return Headers.org_admin(customer_code="stub-org", api_key="stub-org-key")
+
+    def payload(self, stub, **contact):
+        payload = Payloads.get_base_assign_license_payload()
+        payload["licenseId"] = next(license_id for license_id, license_obj in stub.state.licenses.items()
+                                    if license_obj["isAvailableToAssign"])
+        payload["contact"].update(contact)
+        return payload
+
+    @allure.title("Payload shape keeps what validation looks at and drops the concrete values")
+    def test_payload_shape(self):
+        assert payload_shape({"email": "a@b.io", "name": "Ann"}) == payload_shape({"email": "x@y.org", "name": "Bob"})
+        assert payload_shape({"name": ""}) != payload_shape({"name": "   "})
+        assert payload_shape({"team": -5}) != payload_shape({"team": 5})
+        assert payload_shape({"flag": True}) != payload_shape({"flag": 1})
+        assert payload_shape({"email": "not-an-email"}) != payload_shape({"email": "a@b.io"})
+
+    @allure.title("Invalid payloads of the same shape and role share one server response")
+    def test_equivalent_invalid_payloads_share_response(self, api, stub, memo, headers):
+        statuses = [api.assign_license(headers=headers, payload=self.payload(stub, email=f"broken-{number}")).status_code
+                    for number in range(3)]
+
+        assert statuses == [400] * 3
+        assert (memo.hits, memo.misses) == (2, 1)
+
+    @allure.title("Memoized responses are kept apart per role")
+    def test_memo_is_keyed_per_role(self, api, stub, memo, headers):
+        viewer_headers = Headers.team_viewer(customer_code="stub-org", api_key="stub-viewer-key")
+        payload = self.payload(stub, email="broken")
+
+        assert api.assign_license(headers=headers, payload=payload).status_code == 400
+        assert api.assign_license(headers=viewer_headers, payload=payload).status_code == 403
+        assert memo.hits == 0
+
+    @allure.title("Accepted requests are never memoized")
+    def test_successful_requests_are_not_memoized(self, api, stub, memo, headers):
+        first = self.payload(stub)
+        assert api.assign_license(headers=headers, payload=first).status_code == 200
+        second = self.payload(stub)
+        assert api.assign_license(headers=headers, payload=second).status_code == 200
+
+        assert memo.hits == 0
+        assert stub.state.licenses[second["licenseId"]]["assignee"] is not None
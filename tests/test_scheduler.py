@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+
+import allure
+import pytest
+from utils.scheduler import DurationScheduler
+
+
+def item(nodeid: str, group: str = None) -> SimpleNamespace:
+    marker = pytest.mark.xdist_group(group).mark if group else None
+    return SimpleNamespace(nodeid=nodeid, get_closest_marker=lambda name: marker)
+
+
+@allure.epic("Test infrastructure")
+@allure.feature("Duration-aware scheduling")
+class TestDurationScheduler:
+
+    @pytest.fixture
+    def scheduler(self):
+        scheduler = DurationScheduler(enabled=True, runs=3)
+        scheduler.history = {
+            "tests/test_a.py::test_slow": {"duration": 2.0, "outcomes": "PPP"},
+            "tests/test_a.py::test_cheap": {"duration": 0.1, "outcomes": "PPP"},
+            "tests/test_a.py::test_flaky": {"duration": 1.0, "outcomes": "PFP"},
+            "tests/test_a.py::test_medium": {"duration": 0.5, "outcomes": "PP"},
+        }
+        scheduler._typical = 0.75
+        return scheduler
+
+    @allure.title("Recently failed tests run first, then new ones, then the rest, cheapest first")
+    def test_order(self, scheduler):
+        items = [item(f"tests/test_a.py::{name}") for name in ("test_slow", "test_new", "test_cheap", "test_flaky",
+                                                               "test_medium")]
+
+        ordered = [entry.nodeid.split("::")[1] for entry in scheduler.order(items)]
+
+        assert ordered == ["test_flaky", "test_new", "test_cheap", "test_medium", "test_slow"]
+
+    @allure.title("Buckets carry equal estimated durations and keep the fast feedback order")
+    def test_buckets(self, scheduler):
+        items = [item(nodeid) for nodeid in scheduler.history] + [item("tests/test_a.py::test_new")]
+
+        buckets = scheduler.buckets(items, 2)
+
+        loads = [sum(scheduler.estimate(entry.nodeid) for entry in bucket) for bucket in buckets]
+        assert loads == pytest.approx([2.1, 2.25])
+        assert [entry.nodeid for entry in buckets[1]] == ["tests/test_a.py::test_flaky", "tests/test_a.py::test_new",
+                                                          "tests/test_a.py::test_medium"]
+
+    @allure.title("xdist workers mark every test with its bucket's group")
+    def test_collection_under_xdist(self, scheduler):
+        config = SimpleNamespace(workerinput={"workercount": 2}, getoption=lambda name, default=None: True)
+        pinned = item("tests/test_b.py::test_pinned", group="own")
+        items = [item(nodeid) for nodeid in scheduler.history] + [pinned]
+        markers = []
+        for entry in items[:-1]:
+            entry.add_marker = markers.append
+
+        scheduler.pytest_collection_modifyitems(None, config, items)
+
+        assert sorted(marker.args[0] for marker in markers) == ["duration-bucket-0", "duration-bucket-1",
+                                                               "duration-bucket-1", "duration-bucket-1"]
+        assert items[-1] is pinned
+
+    @allure.title("History smooths durations, keeps the last outcomes and ignores skips")
+    def test_update(self, scheduler):
+        scheduler.record("tests/test_a.py::test_slow@duration-bucket-1", 0.5, failed=False)
+        scheduler.record("tests/test_a.py::test_slow@duration-bucket-1", 3.5, failed=True)
+        scheduler.record("tests/test_a.py::test_new", 0.2, failed=False)
+        scheduler.record("tests/test_a.py::test_cheap", 0.0, failed=False, skipped=True)
+        scheduler.record("tests/test_a.py::test_email[user@example.com]@own", 0.4, failed=False)
+        scheduler.record("tests/test_a.py::test_email[admin@example.com]", 0.6, failed=False)
+
+        history = scheduler.update()
+
+        assert history["tests/test_a.py::test_slow"] == {"duration": 3.0, "outcomes": "PPF"}
+        assert history["tests/test_a.py::test_new"] == {"duration": 0.2, "outcomes": "P"}
+        assert history["tests/test_a.py::test_cheap"] == {"duration": 0.1, "outcomes": "PPP"}
+        assert history["tests/test_a.py::test_email[user@example.com]"] == {"duration": 0.4, "outcomes": "P"}
+        assert history["tests/test_a.py::test_email[admin@example.com]"] == {"duration": 0.6, "outcomes": "P"}
+        assert scheduler.recently_failed("tests/test_a.py::test_slow")
+
+    @allure.title("Tests of deleted files are dropped from the history")
+    def test_prune(self, scheduler, tmp_path):
+        (tmp_path / "tests").mkdir()
+        (tmp_path / "tests" / "test_a.py").touch()
+        scheduler.history["tests/test_gone.py::test_x"] = {"duration": 1.0, "outcomes": "F"}
+
+        scheduler.prune(str(tmp_path))
+
+        assert set(scheduler.history) == {"tests/test_a.py::test_slow", "tests/test_a.py::test_cheap",
+                                          "tests/test_a.py::test_flaky", "tests/test_a.py::test_medium"}
@@ -0,0 +1,67 @@
+import multiprocessing
+import time
+
+import allure
+import pytest
+from config.headers import Headers
+from utils.shared_budget import SharedRateBudget, parse_rates
+
+ORG_ADMIN_HEADERS = Headers.org_admin(customer_code="org", api_key="org-key")
+TEAM_VIEWER_HEADERS = Headers.team_viewer(customer_code="org", api_key="viewer-key")
+
+
+def spend(directory: str, rate: float, count: int, start, done) -> None:
+    budget = SharedRateBudget(rates=str(rate), burst=1, directory=directory)
+    start.wait()
+    for _ in range(count):
+        budget.acquire(ORG_ADMIN_HEADERS)
+    done.put(time.monotonic())
+
+
+@allure.epic("API client")
+@allure.feature("Shared rate budget")
+class TestSharedRateBudget:
+
+    @allure.title("Rates are parsed for every role or per role")
+    def test_parse_rates(self):
+        assert parse_rates("10") == {None: 10.0}
+        assert parse_rates("org_admin=10, team_viewer=2.5") == {"org_admin": 10.0, "team_viewer": 2.5}
+        assert parse_rates("") == {}
+
+    @allure.title("Roles without a configured rate are not metered")
+    def test_unmetered_role(self, tmp_path):
+        budget = SharedRateBudget(rates="team_viewer=1", burst=1, directory=str(tmp_path))
+        started = time.monotonic()
+        for _ in range(50):
+            budget.acquire(ORG_ADMIN_HEADERS)
+        assert time.monotonic() - started < 0.5
+        assert list(tmp_path.iterdir()) == []
+
+    @allure.title("Every API key/role draws from its own budget")
+    def test_budgets_are_keyed_per_role(self, tmp_path):
+        budget = SharedRateBudget(rates="5", burst=2, directory=str(tmp_path))
+        for headers in (ORG_ADMIN_HEADERS, ORG_ADMIN_HEADERS, TEAM_VIEWER_HEADERS, TEAM_VIEWER_HEADERS):
+            budget.acquire(headers)
+        assert budget.waited == 0
+        assert len(list(tmp_path.iterdir())) == 2
+        assert not any("org-key" in path.name for path in tmp_path.iterdir())
+
+    @pytest.mark.parametrize("processes", [1, 4])
+    @allure.title("Total rate stays under the budget no matter how many processes share it")
+    def test_rate_is_shared_across_processes(self, tmp_path, processes):
+        rate, total = 100.0, 40
+        context = multiprocessing.get_context("spawn")
+        start, done = context.Event(), context.Queue()
+        workers = [context.Process(target=spend, args=(str(tmp_path), rate, total // processes, start, done))
+                   for _ in range(processes)]
+        for worker in workers:
+            worker.start()
+        time.sleep(0.5)
+        started = time.monotonic()
+        start.set()
+        finished = max(done.get(timeout=30) for _ in workers)
+        for worker in workers:
+            worker.join()
+
+        # One token of burst, the remaining requests are spread at the shared rate
+        assert finished - started >= (total - 1) / rate * 0.9
@@ -0,0 +1,68 @@
+import json
+
+import allure
+import pytest
+from config.constants import TEAM_1_ID
+from config.headers import Headers
+from services.licenses.api_licenses import LicensesApi
+from services.licenses.stub_server import LicensesStubServer, LicensesStubState, ORG_ADMIN
+from utils.json_stream import iter_json_array
+
+
+@allure.epic("Licenses API")
+@allure.feature("Streaming inventory")
+class TestStreamingInventory:
+
+    @pytest.fixture
+    def headers(self):
+        return Headers.org_admin(customer_code="stub-org", api_key="stub-org-key")
+
+    @pytest.fixture
+    def stub(self):
+        state = LicensesStubState(licenses_per_team=0)
+        for _ in range(5000):
+            state.add_license(TEAM_1_ID, "II", available=False)
+        state.add_license(TEAM_1_ID, "PC")
+        for _ in range(5000):
+            state.add_license(TEAM_1_ID, "II")
+        with LicensesStubServer(state=state, roles={("stub-org", "stub-org-key"): (ORG_ADMIN, None)}) as stub:
+            yield stub
+
+    @allure.title("Incremental parser yields the same elements whatever the chunk boundaries")
+    @pytest.mark.parametrize("chunk_size", [1, 2, 7, 4096])
+    def test_parser_chunk_boundaries(self, chunk_size):
+        data = [{"licenseId": f"L{i}", "name": "é ]},[", "tags": [i, 2.5, None]} for i in range(50)] + [12, -3e5, "x"]
+        raw = json.dumps(data, ensure_ascii=False).encode()
+
+        chunks = (raw[i:i + chunk_size] for i in range(0, len(raw), chunk_size))
+
+        assert list(iter_json_array(chunks)) == data
+
+    @allure.title("Truncated array is reported")
+    def test_parser_truncated_array(self):
+        with pytest.raises(ValueError):
+            list(iter_json_array([b'[{"licenseId": "L1"}, {"licenseId"']))
+
+    @allure.title("Streaming lookup finds the same license as the full download")
+    def test_stream_matches_full_download(self, stub, headers):
+        api = LicensesApi(base_url=stub.base_url)
+
+        streamed = api.get_available_to_assign_team_license_dict(headers=headers, team_id=TEAM_1_ID, stream=True)
+        downloaded = api.get_available_to_assign_team_license_dict(headers=headers, team_id=TEAM_1_ID)
+
+        assert streamed == downloaded
+        assert streamed["product"]["code"] == "PC"
+
+    @allure.title("Streaming stops reading after the predicate matches")
+    def test_stream_stops_early(self, stub, headers):
+        api = LicensesApi(base_url=stub.base_url)
+        seen = []
+
+        def predicate(license_obj):
+            seen.append(license_obj["licenseId"])
+            return license_obj["isAvailableToAssign"]
+
+        license_obj = api.find_team_license(headers=headers, team_id=TEAM_1_ID, predicate=predicate)
+
+        assert license_obj["isAvailableToAssign"]
+        assert len(seen) == 5001
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import time
+
+import allure
+import pytest
+from utils.suite_profiler import CONCURRENT, SuiteProfiler
+
+
+@allure.epic("Test infrastructure")
+@allure.feature("Suite profiler")
+class TestSuiteProfiler:
+
+    @pytest.fixture
+    def profiler(self):
+        profiler = SuiteProfiler(path="")
+        profiler.enabled = True
+        return profiler
+
+    @staticmethod
+    def self_ms(profiler, stack: str) -> float:
+        return profiler.stacks[stack] / 1000
+
+    @allure.title("Nested spans record self time per collapsed stack")
+    def test_nested_self_time(self, profiler):
+        with profiler.span("tests/test_x.py::test_a"):
+            with profiler.span("call"):
+                started = time.perf_counter()
+                with profiler.span("step:Act"):
+                    time.sleep(0.02)
+                    profiler.add("request:POST /customer/licenses/assign", 0.015)
+                step_ms = (time.perf_counter() - started) * 1000
+                time.sleep(0.01)
+
+        assert self.self_ms(profiler, "tests/test_x.py::test_a;call;step:Act;request:POST "
+                                      "/customer/licenses/assign") == 15
+        # The request is part of the step's time, not added on top of it; sleeps overshoot on a busy machine
+        assert self.self_ms(profiler, "tests/test_x.py::test_a;call;step:Act") == pytest.approx(step_ms - 15, abs=1)
+        assert self.self_ms(profiler, "tests/test_x.py::test_a;call") >= 9
+
+    @allure.title("Keyed close only unwinds to its own span")
+    def test_keyed_close(self, profiler):
+        profiler.open("step:outer", key="outer")
+        profiler.open("step:inner", key="inner")
+        profiler.close(key="missing")
+        profiler.close(key="outer")
+
+        assert set(profiler.stacks) == {"step:outer", "step:outer;step:inner"}
+        assert not profiler._main
+
+    @allure.title("Worker threads and tasks are charged under the test, outside its wall time")
+    def test_concurrent_frames(self, profiler):
+        async def assign():
+            with profiler.span("step:Assign license to a user"):
+                await asyncio.sleep(0.01)
+
+        async def gather():
+            await asyncio.gather(assign(), assign())
+
+        with profiler.span("tests/test_x.py::test_a"):
+            with profiler.span("call"):
+                worker = threading.Thread(target=profiler.add, args=("request:GET /teams", 0.01))
+                worker.start()
+                worker.join()
+                asyncio.run(gather())
+
+        prefix = f"tests/test_x.py::test_a;call;{CONCURRENT}"
+        assert f"{prefix};request:GET /teams" in profiler.stacks
+        assert self.self_ms(profiler, f"{prefix};step:Assign license to a user") >= 2 * 9
+        summary = profiler.summary()
+        assert summary["concurrent_ms"] >= 3 * 9
+        assert summary["total_ms"] == pytest.approx(sum(summary["phases"].values()), abs=0.01)
+
+    @allure.title("Summary rolls stacks up per test, phase and frame kind")
+    def test_summary(self, profiler):
+        profiler.stacks.update({
+            "configure": 1000,
+            "tests/test_x.py::test_a;setup;fixture:license_pool;request:GET /teams": 4000,
+            "tests/test_x.py::test_a;call;step:Act;attach:Response body": 2000,
+            "tests/test_x.py::test_b;teardown;fixture:stub": 3000,
+        })
+
+        summary = profiler.summary(top=1)
+
+        assert summary["total_ms"] == 10
+        assert summary["phases"] == {"setup": 4, "teardown": 3, "call": 2, "configure": 1}
+        assert summary["tests"] == [{"name": "tests/test_x.py::test_a", "ms": 6}]
+        assert summary["fixtures"] == [{"name": "license_pool", "ms": 4}]
+        assert summary["attachments"] == [{"name": "Response body", "ms": 2}]
+
+    @allure.title("Worker exports are merged into one collapsed stacks file")
+    def test_export_and_merge(self, profiler, tmp_path):
+        path = str(tmp_path / "profile.txt")
+        worker = SuiteProfiler(path=path)
+        worker.stacks.update({"tests/test_x.py::test_a;call": 1500, "collection": 0})
+        worker.export(f"{path}.gw0")
+        profiler.stacks.update({"collection": 500, "tests/test_x.py::test_a;call": 500})
+
+        profiler.merge_exports(path)
+        profiler.export(path)
+
+        with open(path, encoding="utf-8") as file:
+            assert file.read().splitlines() == ["collection 500", "tests/test_x.py::test_a;call 2000"]
+        assert not list(tmp_path.glob("profile.txt.gw*"))
+
+    @allure.title("Exports left by an interrupted run are cleared and never merged")
+    def test_clear_stale_exports(self, profiler, tmp_path):
+        path = str(tmp_path / "profile.txt")
+        stale = SuiteProfiler(path=path)
+        stale.stacks.update({"tests/test_x.py::test_old;call": 9000})
+        stale.export(f"{path}.gw3")
+
+        profiler.clear_exports(path)
+        profiler.merge_exports(path)
+
+        assert "tests/test_x.py::test_old;call" not in profiler.stacks
+        assert not list(tmp_path.glob("profile.txt.gw*"))
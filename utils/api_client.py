@@ -1,20 +1,147 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
 import requests
+from requests.adapters import HTTPAdapter
 
-from utils.helper import Helper
+from config import constants
+from config.constants import HTTP_POOL_SIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_WARM_CONNECTIONS
+from config.headers import Headers
+from utils.api_response import ApiResponse
+from utils.attachments import response_attachments
+from utils.cassette import Cassette, cassette as default_cassette
+from utils.deferred import resolve_deferred
+from utils.metrics import RequestRecord, request_metrics
+from utils.rate_limiter import RateLimiter, rate_limiter
+from utils.response_memo import ResponseMemo, response_memo
+from utils.shared_budget import SharedRateBudget, shared_budget
 
 
 class ApiClient:
 
-    def post(self, url: str, headers: dict, payload: dict) -> requests.Response:
-        response = requests.post(url=url, headers=headers, json=payload)
-        Helper.attach_response("Response HTTP status", response.status_code)
-        Helper.attach_response("Response headers", dict(response.headers))
-        Helper.attach_response("Response body", response.text)
+    pool_size = HTTP_POOL_SIZE
+    timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+    _shared_session = None
+    _shared_session_lock = threading.Lock()
+
+    def __init__(self, session: requests.Session = None, limiter: RateLimiter = None,
+                 budget: SharedRateBudget = None, cassette: Cassette = None, memo: ResponseMemo = None):
+        self.session = session or ApiClient.shared_session()
+        # Shared by default, so every client in the process backs off together
+        self.limiter = limiter or rate_limiter
+        # Metered across processes, every pytest/load runner worker draws from the same per-key quota
+        self.budget = budget or shared_budget
+        self.cassette = cassette or default_cassette
+        self.memo = memo or response_memo
+
+    @classmethod
+    def shared_session(cls) -> requests.Session:
+        # One keep-alive pool for the whole process, so threaded callers reuse TCP/TLS connections
+        if ApiClient._shared_session is None:
+            with ApiClient._shared_session_lock:
+                if ApiClient._shared_session is None:
+                    ApiClient._shared_session = cls.build_session(cls.pool_size)
+        return ApiClient._shared_session
+
+    @staticmethod
+    def build_session(pool_size: int = HTTP_POOL_SIZE) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    @classmethod
+    def warm_up(cls, url: str = None, connections: int = HTTP_WARM_CONNECTIONS) -> None:
+        if connections <= 0:
+            return
+        url = url or constants.BASE_URL
+        session = cls.shared_session()
+
+        def open_connection(_):
+            try:
+                session.head(url, timeout=cls.timeout)
+            except requests.RequestException:
+                pass
+
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            list(executor.map(open_connection, range(connections)))
+
+    @classmethod
+    def close_shared_session(cls) -> None:
+        with ApiClient._shared_session_lock:
+            if ApiClient._shared_session is not None:
+                ApiClient._shared_session.close()
+                ApiClient._shared_session = None
+
+    def post(self, url: str, headers: dict, payload: dict, endpoint: str = None,
+             idempotent: bool = False) -> ApiResponse:
+        return self._send("POST", url=url, headers=headers, payload=payload, endpoint=endpoint,
+                          idempotent=idempotent)
+
+    def get(self, url: str, headers: dict, endpoint: str = None) -> ApiResponse:
+        return self._send("GET", url=url, headers=headers, endpoint=endpoint)
+
+    def get_stream(self, url: str, headers: dict, endpoint: str = None) -> requests.Response:
+        # The body stays on the socket for the caller to iterate and close, timing covers the response headers
+        return self._request("GET", url=url, headers=headers, endpoint=endpoint, stream=True)
+
+    def _send(self, method: str, url: str, headers: dict, payload: dict = None, endpoint: str = None,
+              idempotent: bool = None) -> ApiResponse:
+        payload = resolve_deferred(payload)
+        response = ApiResponse(self._request(method, url=url, headers=headers, payload=payload, endpoint=endpoint,
+                                             idempotent=idempotent))
+        response_attachments.record(method, url, response)
         return response
 
-    def get(self, url: str, headers: dict) -> requests.Response:
-        response = requests.get(url=url, headers=headers)
-        Helper.attach_response("Response HTTP status", response.status_code)
-        Helper.attach_response("Response headers", dict(response.headers))
-        Helper.attach_response("Response body", response.text)
+    def _request(self, method: str, url: str, headers: dict, payload: dict = None, endpoint: str = None,
+                 stream: bool = False, idempotent: bool = None) -> requests.Response:
+        endpoint = endpoint or urlsplit(url).path
+        if stream or not self.memo.applies_to(method):
+            return self._dispatch(method, url, headers, payload, endpoint, stream, idempotent)
+
+        # Validation-only request: payloads of the same shape and role get the response the first one got
+        memo_key = self.memo.key(method, endpoint, headers=headers, payload=payload)
+        response = self.memo.get(memo_key)
+        if response is None:
+            response = self._dispatch(method, url, headers, payload, endpoint, stream, idempotent)
+            self.memo.put(memo_key, response)
+        return response
+
+    def _transmit(self, method: str, url: str, headers: dict, payload: dict, stream: bool) -> requests.Response:
+        return self.session.request(method, url=url, headers=headers, json=payload, timeout=self.timeout,
+                                    stream=stream)
+
+    def _dispatch(self, method: str, url: str, headers: dict, payload: dict, endpoint: str, stream: bool,
+                  idempotent: bool) -> requests.Response:
+        if self.cassette.replaying:
+            # Served from the recording, nothing is sent so there is nothing to limit or time
+            return self.cassette.replay(method, endpoint, url=url, headers=headers, payload=payload)
+
+        def send() -> requests.Response:
+            # Every attempt is a real request, retried ones are metered too
+            self.budget.acquire(headers)
+            started_at = time.time()
+            started = time.perf_counter()
+            response = self._transmit(method, url, headers, payload, stream)
+            duration_ms = (time.perf_counter() - started) * 1000
+            request_metrics.record(RequestRecord(
+                method=method,
+                endpoint=endpoint,
+                status=response.status_code,
+                role=Headers.role_of(headers),
+                url=url,
+                duration_ms=duration_ms,
+                server_ms=response.elapsed.total_seconds() * 1000,
+                started_at=started_at,
+            ))
+            return response
+
+        response = self.limiter.call(method, endpoint, send, idempotent=idempotent, url=url)
+        if self.cassette.recording:
+            # Only the answer the caller got, a replayed test must not see the attempts the limiter retried
+            self.cassette.record(method, endpoint, url=url, headers=headers, payload=payload, response=response)
         return response
@@ -0,0 +1,60 @@
+import json
+from functools import lru_cache
+
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(data: bytes):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+@lru_cache(maxsize=None)
+def adapter_for(schema) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+class ApiResponse:
+
+    __slots__ = ("raw", "status_code", "headers", "content", "url", "_text", "_json", "_parsed")
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.status_code = raw.status_code
+        self.headers = raw.headers
+        self.content = raw.content
+        self.url = str(raw.url)
+        self._text = None
+        self._json = None
+        self._parsed = {}
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def __repr__(self):
+        return f"<ApiResponse [{self.status_code}]>"
+
+    @property
+    def text(self) -> str:
+        # Explicit charset or utf-8, requests would otherwise sniff the encoding of every body
+        if self._text is None:
+            self._text = self.content.decode(self.raw.encoding or "utf-8", errors="replace")
+        return self._text
+
+    def json(self):
+        if self._json is None:
+            self._json = loads(self.content)
+        return self._json
+
+    def parse(self, schema):
+        # Validated straight from bytes by a pre-built pydantic-core validator, cached per schema
+        if schema not in self._parsed:
+            adapter = schema if isinstance(schema, TypeAdapter) else adapter_for(schema)
+            self._parsed[schema] = adapter.validate_json(self.content)
+        return self._parsed[schema]
@@ -0,0 +1,121 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from config.constants import HTTP_POOL_SIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+from utils.api_client import ApiClient
+from utils.api_response import ApiResponse
+from utils.attachments import response_attachments
+from utils.cassette import Cassette
+from utils.deferred import resolve_deferred
+from utils.rate_limiter import RateLimiter
+from utils.response_memo import ResponseMemo
+from utils.shared_budget import SharedRateBudget
+
+
+def as_requests_response(response: httpx.Response) -> requests.Response:
+    # The limiter, cassette and memo all work on requests responses
+    converted = requests.Response()
+    converted.status_code = response.status_code
+    converted.reason = response.reason_phrase
+    converted.url = str(response.url)
+    converted.headers = CaseInsensitiveDict(response.headers)
+    converted.encoding = response.charset_encoding
+    converted._content = response.content
+    converted._content_consumed = True
+    try:
+        converted.elapsed = response.elapsed
+    except RuntimeError:
+        # Mocked transports never close the stream, so httpx does not stamp elapsed
+        converted.elapsed = timedelta(0)
+    return converted
+
+
+class _LoopBridge(ApiClient):
+
+    # ApiClient's memo, cassette, budget and limiter path, run on a worker thread since all of them block;
+    # only the request itself goes back to the event loop, on the httpx client
+    def __init__(self, client: httpx.AsyncClient, limiter: RateLimiter = None, budget: SharedRateBudget = None,
+                 cassette: Cassette = None, memo: ResponseMemo = None):
+        # A session of its own only so ApiClient doesn't build the shared one, nothing is sent through it
+        super().__init__(session=requests.Session(), limiter=limiter, budget=budget, cassette=cassette, memo=memo)
+        self.client = client
+        self.loop = None
+
+    def _transmit(self, method: str, url: str, headers: dict, payload: dict, stream: bool) -> requests.Response:
+        request = self.client.request(method, url=url, headers=headers, json=payload)
+        try:
+            response = asyncio.run_coroutine_threadsafe(request, self.loop).result()
+        except httpx.TransportError as error:
+            # Counted and retried by the limiter like the sync client's connection errors
+            raise requests.ConnectionError(str(error)) from error
+        return as_requests_response(response)
+
+
+class AsyncApiClient:
+
+    pool_size = HTTP_POOL_SIZE
+    timeout = httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+
+    def __init__(self, client: httpx.AsyncClient = None, transport: httpx.AsyncBaseTransport = None,
+                 max_concurrency: int = HTTP_POOL_SIZE, limiter: RateLimiter = None, budget: SharedRateBudget = None,
+                 cassette: Cassette = None, memo: ResponseMemo = None):
+        self.client = client or httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+            timeout=self.timeout,
+            transport=transport,
+        )
+        self.max_concurrency = max_concurrency
+        self._bridge = _LoopBridge(self.client, limiter=limiter, budget=budget, cassette=cassette, memo=memo)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="async-api")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        self._executor.shutdown(wait=False)
+        self._bridge.session.close()
+        await self.client.aclose()
+
+    @staticmethod
+    def _clean_headers(headers: dict) -> dict:
+        # requests silently drops None-valued headers, httpx rejects them
+        return {key: value for key, value in headers.items() if value is not None}
+
+    async def post(self, url: str, headers: dict, payload: dict, endpoint: str = None,
+                   idempotent: bool = False) -> ApiResponse:
+        return await self._send("POST", url=url, headers=headers, payload=payload, endpoint=endpoint,
+                                idempotent=idempotent)
+
+    async def get(self, url: str, headers: dict, endpoint: str = None) -> ApiResponse:
+        return await self._send("GET", url=url, headers=headers, endpoint=endpoint)
+
+    async def _send(self, method: str, url: str, headers: dict, payload: dict = None, endpoint: str = None,
+                    idempotent: bool = None) -> ApiResponse:
+        payload = resolve_deferred(payload)
+        loop = asyncio.get_running_loop()
+        # httpx clients are bound to the loop they first ran on, so this is the same loop on every call
+        self._bridge.loop = loop
+        raw = await loop.run_in_executor(self._executor, lambda: self._bridge._request(
+            method, url=url, headers=self._clean_headers(headers), payload=payload,
+            endpoint=endpoint or urlsplit(url).path, idempotent=idempotent))
+        response = ApiResponse(raw)
+        response_attachments.record(method, url, response)
+        return response
+
+    async def gather(self, coroutines, limit: int = None) -> list:
+        semaphore = asyncio.Semaphore(limit or self.max_concurrency)
+
+        async def bounded(coroutine):
+            async with semaphore:
+                return await coroutine
+
+        return await asyncio.gather(*(bounded(coroutine) for coroutine in coroutines))
@@ -0,0 +1,87 @@
+import gzip
+import threading
+from collections import deque
+
+import allure
+
+from config.constants import ATTACH_MAX_BODY_BYTES, ATTACH_MAX_PENDING, ATTACH_OVERSIZE, ATTACH_POLICY
+from utils.helper import Helper
+
+
+class ResponseAttachments:
+
+    policies = ("always", "on_failure", "never")
+    oversize_modes = ("truncate", "gzip")
+
+    def __init__(self, policy: str = ATTACH_POLICY, max_body_bytes: int = ATTACH_MAX_BODY_BYTES,
+                 oversize: str = ATTACH_OVERSIZE, max_pending: int = ATTACH_MAX_PENDING):
+        self.configure(policy=policy, max_body_bytes=max_body_bytes, oversize=oversize)
+        # Set by conftest from a test's setup until after its teardown, nothing is recorded outside a test
+        # (load runner, bulk calls from scripts), there would be no one to flush or discard it
+        self.active = False
+        # The latest responses are the ones that explain a failure, older ones are dropped
+        self._pending = deque(maxlen=max_pending)
+        self._dropped = 0
+        self._lock = threading.Lock()
+
+    def configure(self, policy: str = None, max_body_bytes: int = None, oversize: str = None) -> None:
+        if policy is not None:
+            if policy not in self.policies:
+                raise ValueError(f"Unknown attachment policy {policy!r}, expected one of {self.policies}")
+            self.policy = policy
+        if max_body_bytes is not None:
+            self.max_body_bytes = max_body_bytes
+        if oversize is not None:
+            if oversize not in self.oversize_modes:
+                raise ValueError(f"Unknown oversize mode {oversize!r}, expected one of {self.oversize_modes}")
+            self.oversize = oversize
+
+    def record(self, method: str, url: str, response) -> None:
+        if self.policy == "never" or not self.active:
+            return
+        if self.policy == "always":
+            self.write(method, url, response)
+            return
+        # Only a reference is kept, nothing is decoded unless the test fails
+        with self._lock:
+            if len(self._pending) == self._pending.maxlen:
+                self._dropped += 1
+            self._pending.append((method, url, response))
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, dropped = list(self._pending), self._dropped
+            self._pending.clear()
+            self._dropped = 0
+        if dropped:
+            Helper.attach_response("Earlier responses", f"{dropped} earlier responses were not kept")
+        for method, url, response in pending:
+            self.write(method, url, response)
+
+    def discard(self) -> None:
+        with self._lock:
+            self._pending.clear()
+            self._dropped = 0
+
+    def write(self, method: str, url: str, response) -> None:
+        Helper.attach_response("Request", f"{method} {url}")
+        Helper.attach_response("Response HTTP status", response.status_code)
+        Helper.attach_response("Response headers", dict(response.headers))
+        self.write_body(response.content)
+
+    def write_body(self, content: bytes) -> None:
+        if len(content) <= self.max_body_bytes:
+            Helper.attach_response("Response body", content.decode("utf-8", errors="replace"))
+            return
+        if self.oversize == "gzip":
+            try:
+                allure.attach(gzip.compress(content), name=f"Response body ({len(content)} bytes, gzip)",
+                              extension="json.gz")
+            except Exception:
+                pass
+            return
+        head = content[:self.max_body_bytes].decode("utf-8", errors="ignore")
+        Helper.attach_response("Response body", f"{head}\n<truncated, {len(content)} bytes in total>")
+
+
+response_attachments = ResponseAttachments()
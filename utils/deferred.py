@@ -0,0 +1,43 @@
+import threading
+
+_UNRESOLVED = object()
+
+
+class Deferred:
+
+    def __init__(self, resolver):
+        self._resolver = resolver
+        self._value = _UNRESOLVED
+        self._lock = threading.Lock()
+
+    @property
+    def resolved(self) -> bool:
+        return self._value is not _UNRESOLVED
+
+    def resolve(self):
+        with self._lock:
+            if self._value is _UNRESOLVED:
+                self._value = self._resolver()
+            return self._value
+
+    # Copies of a payload share the value, so it is resolved at most once whichever copy is sent
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return f"Deferred({self._value!r})" if self.resolved else "Deferred(<unresolved>)"
+
+
+def resolve_deferred(value):
+    # Resolved in place, so after sending the caller's payload holds the values that actually went out
+    if isinstance(value, Deferred):
+        return value.resolve()
+    if isinstance(value, dict):
+        for key, item in value.items():
+            value[key] = resolve_deferred(item)
+    elif isinstance(value, list):
+        value[:] = [resolve_deferred(item) for item in value]
+    return value
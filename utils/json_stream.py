@@ -0,0 +1,51 @@
+import codecs
+import json
+
+_WHITESPACE = " \t\n\r"
+_decoder = json.JSONDecoder()
+
+
+def iter_json_array(chunks):
+    # Yields the elements of a top-level JSON array as the bytes arrive, only one element is buffered at a time
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer = ""
+    position = 0
+    started = False
+    exhausted = False
+
+    while True:
+        while position < len(buffer) and buffer[position] in _WHITESPACE + ("," if started else ""):
+            position += 1
+
+        if position < len(buffer):
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                return
+            try:
+                element, end = _decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if exhausted:
+                    raise
+            else:
+                # A bare number is only complete once a delimiter follows, "12" may still become "12.5"
+                if (isinstance(element, (dict, list, str)) or exhausted
+                        or (end < len(buffer) and buffer[end] in _WHITESPACE + ",]")):
+                    position = end
+                    yield element
+                    continue
+
+        if exhausted:
+            raise ValueError("Unexpected end of JSON array")
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            buffer = buffer[position:] + text_decoder.decode(b"", final=True)
+        else:
+            buffer = buffer[position:] + text_decoder.decode(chunk)
+        position = 0
@@ -0,0 +1,157 @@
+import json
+import os
+import threading
+
+import allure
+import pytest
+
+from config.constants import LATENCY_BUDGET_ENV, LATENCY_BUDGETS_PATH
+from utils.cassette import cassette
+from utils.metrics import HISTOGRAM_BOUNDS_MS, LatencyHistogram, request_metrics
+
+THRESHOLDS = ("p50_ms", "p90_ms", "p95_ms", "p99_ms", "max_ms")
+DISABLED = "off"
+
+
+class LatencySamples:
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, record) -> None:
+        with self._lock:
+            histogram = self._histograms.get((record.method, record.endpoint))
+            if histogram is None:
+                histogram = self._histograms[(record.method, record.endpoint)] = LatencyHistogram()
+            histogram.record_ms(record.duration_ms)
+
+    def histogram(self, endpoint: str, method: str = None) -> LatencyHistogram:
+        merged = LatencyHistogram()
+        with self._lock:
+            for (series_method, series_endpoint), histogram in self._histograms.items():
+                if series_endpoint == endpoint and method in (None, series_method):
+                    merged.merge(histogram)
+        return merged
+
+
+class LatencyBudget:
+
+    def __init__(self, endpoint: str, method: str = None, min_samples: int = 1, **thresholds):
+        unknown = set(thresholds) - set(THRESHOLDS)
+        if unknown:
+            raise ValueError(f"Unknown latency thresholds {sorted(unknown)}, expected some of {THRESHOLDS}")
+        self.endpoint = endpoint
+        self.method = method
+        self.min_samples = min_samples
+        self.thresholds = {name: value for name, value in thresholds.items() if value is not None}
+        self._samples = None
+
+    def kwargs(self) -> dict:
+        return {"endpoint": self.endpoint, "method": self.method, "min_samples": self.min_samples,
+                **self.thresholds}
+
+    def __call__(self, function):
+        # As a decorator the budget covers every request the test sends
+        return pytest.mark.latency_budget(**self.kwargs())(function)
+
+    def __enter__(self) -> LatencySamples:
+        # As a context manager only the requests sent inside the block
+        self._samples = latency_budgets.start()
+        return self._samples
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        samples, self._samples = self._samples, None
+        latency_budgets.stop(samples)
+        if exc_type is None:
+            latency_budgets.check([self], samples)
+
+
+def latency_budget(endpoint: str, method: str = None, min_samples: int = 1, p50_ms: float = None,
+                   p90_ms: float = None, p95_ms: float = None, p99_ms: float = None,
+                   max_ms: float = None) -> LatencyBudget:
+    return LatencyBudget(endpoint, method=method, min_samples=min_samples, p50_ms=p50_ms, p90_ms=p90_ms,
+                         p95_ms=p95_ms, p99_ms=p99_ms, max_ms=max_ms)
+
+
+class LatencyBudgets:
+
+    def __init__(self, environment: str = LATENCY_BUDGET_ENV, path: str = LATENCY_BUDGETS_PATH):
+        self.aliases = {}
+        self.environment = environment
+        self.path = path
+        self._overrides = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.environment != DISABLED
+
+    def configure(self, environment: str = None, path: str = None, aliases: dict = None) -> None:
+        self.environment = environment if environment is not None else self.environment
+        self.path = path or self.path
+        self.aliases = aliases if aliases is not None else self.aliases
+        self._overrides = None
+
+    def overrides(self) -> dict:
+        # {"environment": {"endpoint or alias": {"p95_ms": ...}}}, read once per configuration
+        if self._overrides is None:
+            overrides = {}
+            if self.path and os.path.exists(self.path):
+                with open(self.path, encoding="utf-8") as file:
+                    overrides = json.load(file)
+            self._overrides = overrides
+        return self._overrides.get(self.environment) or {}
+
+    def resolve(self, budget: LatencyBudget) -> tuple:
+        endpoint = self.aliases.get(budget.endpoint, budget.endpoint)
+        environment = self.overrides()
+        # The environment's numbers win over the ones in the test, thresholds it doesn't name are kept
+        thresholds = dict(budget.thresholds, **environment.get(budget.endpoint, environment.get(endpoint, {})))
+        return endpoint, thresholds
+
+    @staticmethod
+    def start() -> LatencySamples:
+        samples = LatencySamples()
+        request_metrics.add_listener(samples.record)
+        return samples
+
+    @staticmethod
+    def stop(samples: LatencySamples) -> None:
+        request_metrics.remove_listener(samples.record)
+
+    def check(self, budgets: list, samples: LatencySamples) -> None:
+        # Replayed responses take no time, there is nothing to hold against a budget
+        if not self.enabled or cassette.replaying:
+            return
+        misses = []
+        for budget in budgets:
+            endpoint, thresholds = self.resolve(budget)
+            histogram = samples.histogram(endpoint, budget.method)
+            label = f"{budget.method or 'any'} {endpoint}"
+            budget_misses = []
+            if histogram.count < budget.min_samples:
+                budget_misses.append(f"{label}: {histogram.count} samples, at least {budget.min_samples} needed")
+            for name, limit in thresholds.items():
+                value = histogram.max_us / 1000 if name == "max_ms" else histogram.percentile_ms(float(name[1:-3]))
+                if histogram.count and value > limit:
+                    budget_misses.append(f"{label}: {name[:-3]} {value:.1f}ms > budget {limit}ms "
+                                         f"(n={histogram.count})")
+            if budget_misses:
+                self.attach(label, thresholds, histogram)
+                misses.extend(budget_misses)
+        if misses:
+            raise AssertionError(f"Latency budget missed ({self.environment or 'default'}): " + "; ".join(misses))
+
+    @staticmethod
+    def attach(label: str, thresholds: dict, histogram: LatencyHistogram) -> None:
+        buckets = histogram.buckets_ms(HISTOGRAM_BOUNDS_MS)
+        widest = max([bucket["count"] for bucket in buckets] + [1])
+        lines = [f"{label}, budget {thresholds}", json.dumps(histogram.summary()), ""]
+        for bucket in buckets:
+            bar = "#" * round(40 * bucket["count"] / widest)
+            lines.append(f"<= {bucket['le_ms']:>6} ms {bucket['count']:>6} {bar}")
+        allure.attach("\n".join(lines), name=f"Latency histogram: {label}",
+                      attachment_type=allure.attachment_type.TEXT)
+
+
+latency_budgets = LatencyBudgets()
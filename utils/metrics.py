@@ -0,0 +1,221 @@
+import glob
+import heapq
+import itertools
+import json
+import os
+import threading
+from typing import NamedTuple
+
+# HDR-style log-linear buckets: 2**SUB_BUCKET_BITS linear sub-buckets per power of two, ~3% relative error
+SUB_BUCKET_BITS = 5
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+# Report buckets for histograms shown to people
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+def _bucket_index(value_us: int) -> int:
+    if value_us < 2 * SUB_BUCKET_COUNT:
+        return value_us
+    shift = value_us.bit_length() - SUB_BUCKET_BITS - 1
+    return shift * SUB_BUCKET_COUNT + (value_us >> shift)
+
+
+def _bucket_bounds(index: int) -> tuple:
+    if index < 2 * SUB_BUCKET_COUNT:
+        return index, index
+    shift = index // SUB_BUCKET_COUNT - 1
+    sub_bucket = index - shift * SUB_BUCKET_COUNT
+    return sub_bucket << shift, ((sub_bucket + 1) << shift) - 1
+
+
+class LatencyHistogram:
+
+    def __init__(self):
+        self.count = 0
+        self.total_us = 0
+        self.min_us = None
+        self.max_us = None
+        self._buckets = {}
+
+    def record_ms(self, value_ms: float) -> None:
+        value_us = max(0, int(value_ms * 1000))
+        self.count += 1
+        self.total_us += value_us
+        self.min_us = value_us if self.min_us is None else min(self.min_us, value_us)
+        self.max_us = value_us if self.max_us is None else max(self.max_us, value_us)
+        index = _bucket_index(value_us)
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        if not other.count:
+            return
+        self.count += other.count
+        self.total_us += other.total_us
+        self.min_us = other.min_us if self.min_us is None else min(self.min_us, other.min_us)
+        self.max_us = other.max_us if self.max_us is None else max(self.max_us, other.max_us)
+        for index, count in other._buckets.items():
+            self._buckets[index] = self._buckets.get(index, 0) + count
+
+    def percentile_ms(self, rank: float) -> float:
+        if not self.count:
+            return 0.0
+        threshold = max(1, round(rank / 100 * self.count))
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen >= threshold:
+                low, high = _bucket_bounds(index)
+                return min(max((low + high) / 2, self.min_us), self.max_us) / 1000
+        return self.max_us / 1000
+
+    def count_at_or_below_ms(self, bound_ms: float) -> int:
+        bound_index = _bucket_index(int(bound_ms * 1000))
+        return sum(count for index, count in self._buckets.items() if index <= bound_index)
+
+    def buckets_ms(self, bounds_ms) -> list:
+        buckets = []
+        below = 0
+        for bound in bounds_ms:
+            upto = self.count_at_or_below_ms(bound)
+            buckets.append({"le_ms": bound, "count": upto - below})
+            below = upto
+        buckets.append({"le_ms": "inf", "count": self.count - below})
+        return buckets
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "total_us": self.total_us, "min_us": self.min_us, "max_us": self.max_us,
+                "buckets": {str(index): count for index, count in self._buckets.items()}}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        histogram = cls()
+        histogram.count = data["count"]
+        histogram.total_us = data["total_us"]
+        histogram.min_us = data["min_us"]
+        histogram.max_us = data["max_us"]
+        histogram._buckets = {int(index): count for index, count in data["buckets"].items()}
+        return histogram
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "min_ms": round((self.min_us or 0) / 1000, 3),
+            "mean_ms": round(self.total_us / self.count / 1000, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile_ms(50), 3),
+            "p90_ms": round(self.percentile_ms(90), 3),
+            "p95_ms": round(self.percentile_ms(95), 3),
+            "p99_ms": round(self.percentile_ms(99), 3),
+            "max_ms": round((self.max_us or 0) / 1000, 3),
+        }
+
+
+class RequestRecord(NamedTuple):
+    method: str
+    endpoint: str
+    status: int
+    role: str
+    url: str
+    duration_ms: float
+    server_ms: float
+    started_at: float
+
+
+class RequestMetrics:
+
+    def __init__(self, slowest: int = 20):
+        self.slowest_limit = slowest
+        self._series = {}
+        self._slowest = []
+        self._sequence = itertools.count()
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener) -> None:
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def record(self, record: RequestRecord) -> None:
+        label = (record.endpoint, record.method, record.status, record.role)
+        with self._lock:
+            histogram = self._series.get(label)
+            if histogram is None:
+                histogram = self._series[label] = LatencyHistogram()
+            histogram.record_ms(record.duration_ms)
+            self._keep_if_slow(record)
+        for listener in list(self._listeners):
+            listener(record)
+
+    def _keep_if_slow(self, record: RequestRecord) -> None:
+        # Min-heap of the N slowest, the sequence number keeps ties from comparing records
+        entry = (record.duration_ms, next(self._sequence), record)
+        if len(self._slowest) < self.slowest_limit:
+            heapq.heappush(self._slowest, entry)
+        elif entry[0] > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+            self._slowest.clear()
+
+    def histogram(self, endpoint: str = None, method: str = None) -> LatencyHistogram:
+        merged = LatencyHistogram()
+        with self._lock:
+            for (series_endpoint, series_method, _, _), histogram in self._series.items():
+                if endpoint in (None, series_endpoint) and method in (None, series_method):
+                    merged.merge(histogram)
+        return merged
+
+    def summary(self) -> list:
+        with self._lock:
+            series = sorted(self._series.items(), key=lambda item: tuple(map(str, item[0])))
+            return [
+                {"endpoint": endpoint, "method": method, "status": status, "role": role, **histogram.summary()}
+                for (endpoint, method, status, role), histogram in series
+            ]
+
+    def slowest(self, limit: int = None) -> list:
+        with self._lock:
+            entries = sorted(self._slowest, reverse=True)[:limit or self.slowest_limit]
+        return [
+            {"method": record.method, "endpoint": record.endpoint, "url": record.url, "status": record.status,
+             "role": record.role, "duration_ms": round(record.duration_ms, 3),
+             "server_ms": round(record.server_ms, 3)}
+            for _, _, record in entries
+        ]
+
+    def export(self, path: str) -> None:
+        with self._lock:
+            # Raw histograms and records next to the summary, so exports of several processes can be merged
+            histograms = [{"label": list(label), **histogram.to_dict()} for label, histogram in self._series.items()]
+            records = [record._asdict() for _, _, record in self._slowest]
+        with open(path, "w") as file:
+            json.dump({"requests": self.summary(), "slowest": self.slowest(), "histograms": histograms,
+                       "slowest_records": records}, file, indent=2)
+
+    @staticmethod
+    def clear_exports(path: str) -> None:
+        for name in glob.glob(f"{glob.escape(path)}.gw*"):
+            os.remove(name)
+
+    def merge_exports(self, path: str) -> None:
+        # xdist workers export "<path>.gwN", the controller folds them into its own series
+        for name in glob.glob(f"{glob.escape(path)}.gw*"):
+            with open(name) as file:
+                exported = json.load(file)
+            with self._lock:
+                for data in exported.get("histograms", ()):
+                    label = tuple(data["label"])
+                    histogram = self._series.get(label)
+                    if histogram is None:
+                        histogram = self._series[label] = LatencyHistogram()
+                    histogram.merge(LatencyHistogram.from_dict(data))
+                for record in exported.get("slowest_records", ()):
+                    self._keep_if_slow(RequestRecord(**record))
+            os.remove(name)
+
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,189 @@
+import json
+import threading
+import time
+from collections import Counter
+from typing import NamedTuple
+
+import allure
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.api_client import ApiClient
+
+
+class RaceResult(NamedTuple):
+    index: int
+    response: object
+    error: BaseException
+    sent_at: float
+    received_at: float
+
+    @property
+    def status_code(self) -> int:
+        return None if self.response is None else self.response.status_code
+
+
+class RaceOutcome:
+
+    def __init__(self, results: list):
+        self.results = results
+
+    @property
+    def responses(self) -> list:
+        return [result.response for result in self.results]
+
+    @property
+    def statuses(self) -> list:
+        return [result.status_code for result in self.results]
+
+    def count(self, status_code: int) -> int:
+        return self.statuses.count(status_code)
+
+    def expect(self, counts: dict) -> None:
+        # Invariants are stated as {status: how many}, e.g. {200: 1, 400: contenders - 1}
+        assert Counter(self.statuses) == Counter(counts), f"Expected statuses {counts}, got {self.summary()}"
+
+    @property
+    def skew_ms(self) -> float:
+        # How far apart the requests actually hit the wire
+        sent = [result.sent_at for result in self.results]
+        return (max(sent) - min(sent)) * 1000
+
+    @property
+    def overlap_ms(self) -> float:
+        # Time every request was in flight at once, negative when the last one left after the first came back
+        return (min(result.received_at for result in self.results)
+                - max(result.sent_at for result in self.results)) * 1000
+
+    def summary(self) -> dict:
+        return {
+            "contenders": len(self.results),
+            "statuses": dict(Counter(map(str, self.statuses))),
+            "errors": [repr(result.error) for result in self.results if result.error is not None],
+            "skew_ms": round(self.skew_ms, 3),
+            "overlap_ms": round(self.overlap_ms, 3),
+        }
+
+
+class _GatedAdapter(HTTPAdapter):
+
+    def __init__(self, gate: threading.Barrier):
+        super().__init__(pool_connections=1, pool_maxsize=1)
+        self.gate = gate
+        self.armed = False
+        self.sent_at = self.received_at = None
+
+    def pass_gate(self) -> None:
+        self.armed = False
+        try:
+            self.gate.wait()
+        except threading.BrokenBarrierError:
+            # A contender never got to send, the rest go out unsynchronized rather than hang
+            pass
+        self.sent_at = time.perf_counter()
+
+    def send(self, request, **kwargs):
+        # Only the round's first request is held back, retries and follow-ups go straight out
+        if self.armed:
+            self.pass_gate()
+        try:
+            return super().send(request, **kwargs)
+        finally:
+            self.received_at = time.perf_counter()
+
+
+class RaceHarness:
+
+    def __init__(self, contenders: int, client_factory=None, warm_url: str = None, timeout: float = 60.0):
+        self.contenders = contenders
+        self.client_factory = client_factory or (lambda session: session)
+        self.warm_url = warm_url
+        self.timeout = timeout
+        self._action = None
+        self._results = [None] * contenders
+        self._closed = False
+        # The coordinator is the extra party of round and done, it hands out the action and collects the results.
+        # The gate is the contenders' own and sits right before the socket write, so JSON encoding, rate
+        # limiting and request preparation are all done by the time they are released.
+        # Between races the workers idle in round for as long as the (session-scoped) harness lives, so only the
+        # coordinator's side of it and the waits within a race time out
+        self._round = threading.Barrier(contenders + 1)
+        self._done = threading.Barrier(contenders + 1, timeout=timeout)
+        self._gate = threading.Barrier(contenders, timeout=timeout)
+        self._workers = [threading.Thread(target=self._worker, args=(index,), name=f"race-{index}", daemon=True)
+                         for index in range(contenders)]
+        for worker in self._workers:
+            worker.start()
+        self._done.wait()
+
+    def _worker(self, index: int) -> None:
+        adapter = _GatedAdapter(self._gate)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        # One keep-alive connection per contender, opened before the first race so no request pays a handshake
+        if self.warm_url:
+            try:
+                session.head(self.warm_url, timeout=ApiClient.timeout)
+            except requests.RequestException:
+                pass
+        client = self.client_factory(session)
+        self._done.wait()
+        try:
+            while True:
+                self._round.wait()
+                if self._closed:
+                    return
+                response = error = None
+                adapter.armed = True
+                adapter.sent_at = adapter.received_at = None
+                try:
+                    response = self._action(client, index)
+                except Exception as exception:
+                    error = exception
+                if adapter.armed:
+                    # Nothing went out (a replayed or memoized response, or an error before sending),
+                    # the others are still waiting for this contender at the gate
+                    adapter.pass_gate()
+                received_at = adapter.received_at or adapter.sent_at
+                self._results[index] = RaceResult(index, response, error, adapter.sent_at, received_at)
+                self._done.wait()
+        finally:
+            session.close()
+
+    def run(self, action) -> RaceOutcome:
+        """Race action(client, index) on every contender, their first requests are released together."""
+        self._action = action
+        self._results = [None] * self.contenders
+        self._round.wait(timeout=self.timeout)
+        self._done.wait()
+        if self._gate.broken:
+            self._gate.reset()
+        return RaceOutcome(self._results)
+
+    def repeat(self, repetitions: int, prepare, action) -> list:
+        # prepare(repetition) builds the race's inputs outside the race, action(client, index, inputs) races
+        outcomes = []
+        for repetition in range(repetitions):
+            inputs = prepare(repetition)
+            outcomes.append(self.run(lambda client, index: action(client, index, inputs)))
+        return outcomes
+
+    @staticmethod
+    def attach(outcomes: list, name: str = "Race outcomes") -> None:
+        allure.attach(json.dumps([outcome.summary() for outcome in outcomes], indent=2), name=name,
+                      attachment_type=allure.attachment_type.JSON)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._round.wait(timeout=self.timeout)
+        for worker in self._workers:
+            worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
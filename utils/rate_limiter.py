@@ -0,0 +1,243 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+
+from config.constants import (CIRCUIT_BREAKER_RESET, CIRCUIT_BREAKER_THRESHOLD, RATE_LIMIT_BURST,
+                              RATE_LIMIT_MAX_CONCURRENCY, RATE_LIMIT_MAX_RETRY_AFTER, RATE_LIMIT_RETRIES,
+                              RATE_LIMIT_RPS)
+
+THROTTLE_STATUSES = (429, 503)
+# Methods that can be repeated without changing the outcome
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+class CircuitOpenError(requests.ConnectionError):
+
+    def __init__(self, endpoint: str, retry_in: float):
+        super().__init__(f"Circuit for {endpoint} is open, next attempt in {retry_in:.1f}s")
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+def parse_retry_after(value: str) -> float:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+
+    def __init__(self, rate: float = None, burst: int = RATE_LIMIT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if not self.rate:
+                        return
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        # A Retry-After holds every thread back, not only the one that got throttled
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+            self._updated = time.monotonic()
+
+
+class AdaptiveConcurrency:
+
+    def __init__(self, max_limit: int = RATE_LIMIT_MAX_CONCURRENCY, min_limit: int = 1):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> float:
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+        return time.monotonic()
+
+    def release(self, started: float, throttled: bool) -> None:
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                # Requests already in flight when the limit was cut report the same overload, halve only once
+                if started >= self._last_decrease:
+                    self.limit = max(self.min_limit, self.limit / 2)
+                    self._last_decrease = time.monotonic()
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class CircuitBreaker:
+
+    def __init__(self, threshold: int = CIRCUIT_BREAKER_THRESHOLD, reset_timeout: float = CIRCUIT_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def before_request(self, endpoint: str) -> None:
+        with self._lock:
+            if self.opened_at is None:
+                return
+            retry_in = self.reset_timeout - (time.monotonic() - self.opened_at)
+            # Once the timeout has passed a single trial request decides whether the circuit closes again
+            if retry_in > 0 or self._trial_in_flight:
+                raise CircuitOpenError(endpoint, max(retry_in, 0.0))
+            self._trial_in_flight = True
+
+    def release_trial(self) -> None:
+        # The trial ended without an answer to judge the server by, the next request may try again
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record(self, failed: bool) -> None:
+        with self._lock:
+            self._trial_in_flight = False
+            if not failed:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class RateLimiter:
+
+    def __init__(self, rate: float = RATE_LIMIT_RPS or None, burst: int = RATE_LIMIT_BURST,
+                 max_concurrency: int = RATE_LIMIT_MAX_CONCURRENCY, retries: int = RATE_LIMIT_RETRIES,
+                 max_retry_after: float = RATE_LIMIT_MAX_RETRY_AFTER,
+                 breaker_threshold: int = CIRCUIT_BREAKER_THRESHOLD, breaker_reset: float = CIRCUIT_BREAKER_RESET):
+        self.bucket = TokenBucket(rate=rate, burst=burst)
+        self.concurrency = AdaptiveConcurrency(max_limit=max_concurrency)
+        self.retries = retries
+        self.max_retry_after = max_retry_after
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self.throttled = 0
+        self.retried = 0
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        # A new test session starts with closed circuits and the full concurrency limit
+        with self._lock:
+            self._breakers.clear()
+            self.throttled = 0
+            self.retried = 0
+        self.bucket = TokenBucket(rate=self.bucket.rate, burst=self.bucket.burst)
+        self.concurrency = AdaptiveConcurrency(max_limit=self.concurrency.max_limit)
+
+    @staticmethod
+    def circuit(endpoint: str, url: str = None) -> str:
+        # The same endpoint on another host (live API, a stub) fails independently
+        parts = urlsplit(url or "")
+        return f"{parts.scheme}://{parts.netloc}{endpoint}" if parts.netloc else endpoint
+
+    def breaker(self, endpoint: str, url: str = None) -> CircuitBreaker:
+        circuit = self.circuit(endpoint, url)
+        with self._lock:
+            breaker = self._breakers.get(circuit)
+            if breaker is None:
+                breaker = self._breakers[circuit] = CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+            return breaker
+
+    def call(self, method: str, endpoint: str, send, idempotent: bool = None, url: str = None):
+        idempotent = method in IDEMPOTENT_METHODS if idempotent is None else idempotent
+        breaker = self.breaker(endpoint, url)
+        attempt = 0
+        while True:
+            breaker.before_request(endpoint)
+            self.bucket.acquire()
+            started = self.concurrency.acquire()
+            response = delay = None
+            try:
+                response = send()
+            except requests.RequestException:
+                breaker.record(failed=True)
+                if not idempotent or attempt >= self.retries:
+                    raise
+            finally:
+                throttled = response is not None and response.status_code in THROTTLE_STATUSES
+                self.concurrency.release(started, throttled=throttled)
+                if response is None:
+                    # Anything else raised by send() must not leave a half-open circuit waiting for its trial
+                    breaker.release_trial()
+
+            if response is not None:
+                breaker.record(failed=response.status_code >= 500)
+                if response.status_code not in THROTTLE_STATUSES:
+                    return response
+                with self._lock:
+                    self.throttled += 1
+                # A 429 is rejected before it is processed, so it is safe to repeat even for a POST.
+                # A 503 may come from a proxy after the request went through, only idempotent calls repeat it.
+                if attempt >= self.retries or (response.status_code == 503 and not idempotent):
+                    return response
+                delay = parse_retry_after(response.headers.get("Retry-After"))
+                if delay is not None and delay > self.max_retry_after:
+                    return response
+                if delay is not None:
+                    self.bucket.pause(delay)
+                response.close()
+
+            attempt += 1
+            with self._lock:
+                self.retried += 1
+            if response is None or delay is None:
+                # Full jitter keeps throttled threads from coming back in lockstep
+                time.sleep(random.uniform(0, min(self.max_retry_after, 0.1 * 2 ** attempt)))
+
+    def stats(self) -> dict:
+        with self._lock:
+            breakers = {circuit: breaker.state for circuit, breaker in self._breakers.items()}
+        return {
+            "throttled": self.throttled,
+            "retried": self.retried,
+            "concurrency_limit": round(self.concurrency.limit, 2),
+            "circuits": breakers,
+        }
+
+
+rate_limiter = RateLimiter()
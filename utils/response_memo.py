@@ -0,0 +1,79 @@
+import hashlib
+import json
+import re
+import threading
+
+import requests
+
+from config.constants import MEMOIZE_VALIDATION
+from config.headers import Headers
+
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+# Validation errors only, anything else may depend on server state
+MEMOIZED_STATUSES = (400, 422)
+
+
+def payload_shape(value):
+    # Values are reduced to what validation looks at, so payloads that differ only in names or ids share a shape
+    if isinstance(value, dict):
+        return {key: payload_shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [payload_shape(item) for item in value]
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int:negative" if value < 0 else "int:zero" if value == 0 else "int:positive"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, str):
+        if not value:
+            return "str:empty"
+        if not value.strip():
+            return "str:blank"
+        return "str:email" if EMAIL_PATTERN.match(value) else "str"
+    return type(value).__name__
+
+
+class ResponseMemo:
+
+    def __init__(self, enabled: bool = MEMOIZE_VALIDATION):
+        self.enabled = enabled
+        self.active = False
+        self.hits = 0
+        self.misses = 0
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    def applies_to(self, method: str) -> bool:
+        # Reads are left alone, they are what changes between otherwise equal requests
+        return self.enabled and self.active and method != "GET"
+
+    @staticmethod
+    def key(method: str, endpoint: str, headers: dict, payload) -> str:
+        shape = json.dumps(payload_shape(payload), sort_keys=True, separators=(",", ":"))
+        # role_of() only knows the configured roles, the credentials themselves keep any others apart
+        credentials = f"{headers.get('X-Customer-Code')}:{headers.get('X-Api-Key')}"
+        key = f"{method} {endpoint} {Headers.role_of(headers)} {credentials} {shape}"
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def get(self, key: str) -> requests.Response:
+        with self._lock:
+            response = self._responses.get(key)
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return response
+
+    def put(self, key: str, response: requests.Response) -> None:
+        if response.status_code in MEMOIZED_STATUSES:
+            with self._lock:
+                self._responses[key] = response
+
+    def clear(self) -> None:
+        with self._lock:
+            self._responses.clear()
+            self.hits = self.misses = 0
+
+
+response_memo = ResponseMemo()
@@ -0,0 +1,139 @@
+import os
+import re
+import statistics
+from collections import defaultdict
+
+import pytest
+
+from config.constants import FAST_FEEDBACK, TEST_HISTORY_RUNS
+
+PASSED, FAILED = "P", "F"
+BUCKET_GROUP = "duration-bucket-"
+# xdist's loadgroup appends "@<group>" to node ids, for our buckets and any other group; history is kept under the
+# plain id. Param ids may contain "@" too (emails), a group name never contains "]", "/" or ":"
+GROUP_SUFFIX = re.compile(r"@[^@\[\]/:]*$")
+# New measurements weigh as much as everything before them, one slow run doesn't stick for long
+DURATION_SMOOTHING = 0.5
+
+
+class DurationScheduler:
+
+    cache_key = "licenses/test_history"
+
+    def __init__(self, enabled: bool = FAST_FEEDBACK, runs: int = TEST_HISTORY_RUNS):
+        self.enabled = enabled
+        self.runs = runs
+        # {node id: {"duration": seconds, "outcomes": "PPF"}}, outcomes of the last `runs` runs, oldest first
+        self.history = {}
+        self._cache = None
+        self._typical = 0.0
+        self._durations = defaultdict(float)
+        self._failed = set()
+        self._skipped = set()
+
+    def load(self, cache) -> None:
+        self._cache = cache
+        self.history = cache.get(self.cache_key, {}) if cache is not None else {}
+        # Tests without history are expected to take as long as a typical one
+        known = [entry["duration"] for entry in self.history.values()]
+        self._typical = statistics.median(known) if known else 0.0
+
+    @staticmethod
+    def nodeid(nodeid: str) -> str:
+        return GROUP_SUFFIX.sub("", nodeid)
+
+    def recently_failed(self, nodeid: str) -> bool:
+        return FAILED in self.history.get(nodeid, {}).get("outcomes", "")
+
+    def estimate(self, nodeid: str) -> float:
+        entry = self.history.get(nodeid)
+        return entry["duration"] if entry is not None else self._typical
+
+    def rank(self, nodeid: str) -> tuple:
+        # Recent failures first, then new tests, then the rest; cheapest first within each
+        tier = 0 if self.recently_failed(nodeid) else 2 if nodeid in self.history else 1
+        return tier, self.estimate(nodeid)
+
+    def order(self, items: list) -> list:
+        # sorted() is stable, tests with equal rank keep their collection order
+        return sorted(items, key=lambda item: self.rank(item.nodeid))
+
+    def buckets(self, items: list, count: int) -> list:
+        # Longest first onto the least loaded bucket, each bucket keeps the fast feedback order
+        loads, buckets = [0.0] * count, [[] for _ in range(count)]
+        for item in sorted(items, key=lambda item: -self.estimate(item.nodeid)):
+            index = loads.index(min(loads))
+            loads[index] += self.estimate(item.nodeid)
+            buckets[index].append(item)
+        return [self.order(bucket) for bucket in buckets]
+
+    def record(self, nodeid: str, duration: float, failed: bool, skipped: bool = False) -> None:
+        nodeid = self.nodeid(nodeid)
+        self._durations[nodeid] += duration
+        if failed:
+            self._failed.add(nodeid)
+        if skipped:
+            self._skipped.add(nodeid)
+
+    def update(self) -> dict:
+        for nodeid, duration in self._durations.items():
+            # A skip says nothing about how long the test takes or whether it passes
+            if nodeid in self._skipped and nodeid not in self._failed:
+                continue
+            entry = self.history.get(nodeid)
+            if entry is not None:
+                duration = DURATION_SMOOTHING * duration + (1 - DURATION_SMOOTHING) * entry["duration"]
+            outcomes = (entry or {}).get("outcomes", "") + (FAILED if nodeid in self._failed else PASSED)
+            self.history[nodeid] = {"duration": round(duration, 6), "outcomes": outcomes[-self.runs:]}
+        self._durations.clear()
+        self._failed.clear()
+        self._skipped.clear()
+        return self.history
+
+    def prune(self, root: str) -> None:
+        # Tests of deleted files would otherwise stay in the cache forever
+        self.history = {nodeid: entry for nodeid, entry in self.history.items()
+                        if os.path.exists(os.path.join(root, nodeid.split("::")[0]))}
+
+    # ---- pytest hooks
+
+    def start(self, config) -> None:
+        self.load(getattr(config, "cache", None))
+        config.pluginmanager.register(self, "duration_scheduler")
+        # Buckets are xdist groups, the default load scheduling would spread them out again
+        if self.enabled and config.getoption("dist", "no") == "load":
+            config.option.dist = "loadgroup"
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_collection_modifyitems(self, session, config, items):
+        if not self.enabled:
+            return
+        workers = getattr(config, "workerinput", {}).get("workercount")
+        if not workers or not config.getoption("loadgroup", False):
+            items[:] = self.order(items)
+            return
+        # Every worker collects the same items from the same history, so they all arrive at the same buckets
+        grouped = [item for item in items if item.get_closest_marker("xdist_group")]
+        buckets = self.buckets([item for item in items if not item.get_closest_marker("xdist_group")], workers)
+        for index, bucket in enumerate(buckets):
+            for item in bucket:
+                item.add_marker(pytest.mark.xdist_group(f"{BUCKET_GROUP}{index}"))
+        items[:] = [item for bucket in buckets for item in bucket] + grouped
+
+    def pytest_runtest_logreport(self, report):
+        # Under xdist the controller gets every worker's reports, it is the one that keeps the history
+        self.record(report.nodeid, report.duration, report.failed, report.skipped)
+
+    def pytest_sessionfinish(self, session):
+        if self._cache is None or hasattr(session.config, "workerinput"):
+            return
+        self.update()
+        self.prune(str(session.config.rootpath))
+        self._cache.set(self.cache_key, self.history)
+
+    def stop(self, config) -> None:
+        if config.pluginmanager.get_plugin("duration_scheduler") is self:
+            config.pluginmanager.unregister(name="duration_scheduler")
+
+
+duration_scheduler = DurationScheduler()
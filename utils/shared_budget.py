@@ -0,0 +1,132 @@
+import hashlib
+import os
+import struct
+import threading
+import time
+
+from config.constants import SHARED_RATE_BUDGET, SHARED_RATE_BUDGET_BURST, SHARED_RATE_BUDGET_DIR
+from config.headers import Headers
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# tokens, last refill (wall clock, the only clock every process agrees on)
+LEDGER = struct.Struct("<dd")
+
+
+def parse_rates(value: str) -> dict:
+    # "10" meters every role at 10 rps, "org_admin=10,team_viewer=2" only the listed ones
+    rates = {}
+    for item in filter(None, (part.strip() for part in (value or "").split(","))):
+        role, _, rate = item.rpartition("=")
+        rates[role or None] = float(rate)
+    return rates
+
+
+def _lock(fd: int) -> None:
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        return
+    os.lseek(fd, 0, os.SEEK_SET)
+    while True:
+        try:
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue
+
+
+def _unlock(fd: int) -> None:
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        return
+    os.lseek(fd, 0, os.SEEK_SET)
+    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class SharedRateBudget:
+
+    def __init__(self, rates=SHARED_RATE_BUDGET, burst: int = SHARED_RATE_BUDGET_BURST,
+                 directory: str = SHARED_RATE_BUDGET_DIR):
+        self.rates = parse_rates(rates) if isinstance(rates, str) else dict(rates or {})
+        self.burst = burst
+        self.directory = directory
+        self.waited = 0.0
+        self._files = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def rate_for(self, role: str) -> float:
+        return self.rates.get(role, self.rates.get(None))
+
+    @staticmethod
+    def key_of(headers: dict) -> tuple:
+        # The API key itself never ends up on disk, only a digest of it
+        api_key = (headers or {}).get("X-Api-Key") or ""
+        return Headers.role_of(headers), hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+    def acquire(self, headers: dict) -> None:
+        role, digest = self.key_of(headers)
+        rate = self.rate_for(role)
+        if not rate:
+            return
+        fd, thread_lock = self._ledger(f"{role}-{digest}")
+        while True:
+            # flock only excludes other processes, threads of this one queue on their own lock first
+            with thread_lock:
+                _lock(fd)
+                try:
+                    wait = self._take(fd, rate)
+                finally:
+                    _unlock(fd)
+            if wait <= 0:
+                return
+            self.waited += wait
+            time.sleep(wait)
+
+    def _take(self, fd: int, rate: float) -> float:
+        now = time.time()
+        raw = os.pread(fd, LEDGER.size, 0) if hasattr(os, "pread") else self._read(fd)
+        tokens, updated = LEDGER.unpack(raw) if len(raw) == LEDGER.size else (float(self.burst), now)
+        tokens = min(float(self.burst), tokens + max(0.0, now - updated) * rate)
+        wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+        if wait <= 0:
+            tokens -= 1
+        data = LEDGER.pack(tokens, now)
+        if hasattr(os, "pwrite"):
+            os.pwrite(fd, data, 0)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.write(fd, data)
+        return wait
+
+    @staticmethod
+    def _read(fd: int) -> bytes:
+        os.lseek(fd, 0, os.SEEK_SET)
+        return os.read(fd, LEDGER.size)
+
+    def _ledger(self, name: str) -> tuple:
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked child shares the parent's open files and with them its flocks, it needs its own
+                self._files.clear()
+                self._pid = os.getpid()
+            ledger = self._files.get(name)
+            if ledger is None:
+                os.makedirs(self.directory, exist_ok=True)
+                flags = os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0)
+                fd = os.open(os.path.join(self.directory, f"{name}.budget"), flags, 0o600)
+                ledger = self._files[name] = (fd, threading.Lock())
+            return ledger
+
+    def close(self) -> None:
+        with self._lock:
+            for fd, _ in self._files.values():
+                os.close(fd)
+            self._files.clear()
+
+
+shared_budget = SharedRateBudget()
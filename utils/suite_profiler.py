@@ -0,0 +1,265 @@
+import asyncio
+import glob
+import json
+import os
+import threading
+import time
+import weakref
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+import allure_commons
+import pytest
+
+from config.constants import SUITE_PROFILE_PATH, SUITE_PROFILE_TOP
+from utils.metrics import request_metrics
+
+# Frame prefixes, the summary rolls stacks up by them under the section names
+PHASES = ("setup", "call", "teardown")
+KINDS = {"fixture": "fixtures", "step": "steps", "request": "requests", "attach": "attachments"}
+# Marks time spent in worker threads and asyncio tasks, it overlaps the main thread's and is kept out of totals
+CONCURRENT = "concurrent"
+
+
+def _current_task():
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        return None
+
+
+def _frame(name: str) -> str:
+    # ";" separates frames and the trailing space separates the value in a collapsed stack line
+    return " ".join(str(name).replace(";", ",").split())
+
+
+class _Span:
+
+    __slots__ = ("name", "started", "children", "key")
+
+    def __init__(self, name: str, key=None):
+        self.name = name
+        self.started = time.perf_counter()
+        self.children = 0.0
+        self.key = key
+
+
+class SuiteProfiler:
+
+    def __init__(self, path: str = SUITE_PROFILE_PATH, top: int = SUITE_PROFILE_TOP):
+        self.path = path
+        self.top = top
+        self.enabled = False
+        # Self time in microseconds per collapsed stack, the format flamegraph.pl and speedscope read
+        self.stacks = Counter()
+        self._local = threading.local()
+        self._tasks = weakref.WeakKeyDictionary()
+        self._main = []
+        self._teardowns = {}
+        self._lock = threading.Lock()
+
+    # ---- span bookkeeping
+
+    def _stack(self) -> list:
+        task = _current_task()
+        if task is not None:
+            stack = self._tasks.get(task)
+            if stack is None:
+                stack = self._tasks[task] = []
+            return stack
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = [] if threading.current_thread() is not threading.main_thread() \
+                else self._main
+        return stack
+
+    def _path(self, stack: list) -> list:
+        # Worker threads (bulk operations, races) and tasks are charged to what the main thread is doing
+        prefix = [] if stack is self._main else [span.name for span in self._main] + [CONCURRENT]
+        return prefix + [span.name for span in stack]
+
+    def open(self, name: str, key=None) -> None:
+        self._stack().append(_Span(_frame(name), key))
+
+    def close(self, key=None) -> None:
+        stack = self._stack()
+        if key is not None and all(span.key != key for span in stack):
+            return
+        while stack:
+            span = stack[-1]
+            self._finish(stack, time.perf_counter() - span.started, span.children)
+            if key is None or span.key == key:
+                return
+
+    def add(self, name: str, duration: float) -> None:
+        # A span that is only known once it is over, e.g. a request from the metrics listener
+        stack = self._stack()
+        stack.append(_Span(_frame(name)))
+        self._finish(stack, duration, 0.0)
+
+    def _finish(self, stack: list, duration: float, children: float) -> None:
+        path = ";".join(self._path(stack))
+        stack.pop()
+        if stack:
+            stack[-1].children += duration
+        with self._lock:
+            self.stacks[path] += max(0, int((duration - children) * 1e6))
+
+    @contextmanager
+    def span(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        self.open(name)
+        try:
+            yield
+        finally:
+            self.close()
+
+    # ---- pytest hooks
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_collection(self, session):
+        with self.span("collection"):
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item, nextitem):
+        with self.span(item.nodeid):
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_setup(self, item):
+        with self.span("setup"):
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item):
+        with self.span("call"):
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_teardown(self, item, nextitem):
+        with self.span("teardown"):
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef, request):
+        with self.span(f"fixture:{fixturedef.argname}"):
+            yield
+        # Finalizers run last in, first out: this one opens the teardown span right before the fixture's own
+        # teardown, pytest_fixture_post_finalizer closes it
+        fixturedef.addfinalizer(lambda: self._open_teardown(fixturedef))
+
+    def _open_teardown(self, fixturedef) -> None:
+        self._teardowns[id(fixturedef)] = True
+        self.open(f"fixture:{fixturedef.argname}", key=id(fixturedef))
+
+    def pytest_fixture_post_finalizer(self, fixturedef, request):
+        if self._teardowns.pop(id(fixturedef), None):
+            self.close(key=id(fixturedef))
+
+    # ---- allure hooks
+
+    @allure_commons.hookimpl
+    def start_step(self, uuid, title, params):
+        self.open(f"step:{title}", key=uuid)
+
+    @allure_commons.hookimpl
+    def stop_step(self, uuid, exc_type, exc_val, exc_tb):
+        self.close(key=uuid)
+
+    @allure_commons.hookimpl(hookwrapper=True)
+    def attach_data(self, body, name, attachment_type, extension):
+        with self.span(f"attach:{name}"):
+            yield
+
+    @allure_commons.hookimpl(hookwrapper=True)
+    def attach_file(self, source, name, attachment_type, extension):
+        with self.span(f"attach:{name}"):
+            yield
+
+    def _on_request(self, record) -> None:
+        self.add(f"request:{record.method} {record.endpoint}", record.duration_ms / 1000)
+
+    # ---- lifecycle
+
+    def start(self, config) -> None:
+        self.enabled = True
+        config.pluginmanager.register(self, "suite_profiler")
+        allure_commons.plugin_manager.register(self, "suite_profiler")
+        request_metrics.add_listener(self._on_request)
+
+    def stop(self, config) -> None:
+        if not self.enabled:
+            return
+        self.enabled = False
+        request_metrics.remove_listener(self._on_request)
+        allure_commons.plugin_manager.unregister(name="suite_profiler")
+        config.pluginmanager.unregister(name="suite_profiler")
+
+    def export(self, path: str) -> None:
+        with self._lock:
+            lines = [f"{stack} {value}\n" for stack, value in sorted(self.stacks.items()) if value]
+        with open(path, "w", encoding="utf-8") as file:
+            file.writelines(lines)
+
+    @staticmethod
+    def clear_exports(path: str) -> None:
+        for name in glob.glob(f"{glob.escape(path)}.gw*"):
+            os.remove(name)
+
+    def merge_exports(self, path: str) -> None:
+        # xdist workers export "<path>.gwN", the controller folds them into its own stacks
+        for name in glob.glob(f"{glob.escape(path)}.gw*"):
+            with open(name, encoding="utf-8") as file:
+                for line in file:
+                    stack, _, value = line.rstrip("\n").rpartition(" ")
+                    if stack:
+                        self.stacks[stack] += int(value)
+            os.remove(name)
+
+    # ---- summary
+
+    def summary(self, top: int = None) -> dict:
+        top = top or self.top
+        tests, phases = Counter(), Counter()
+        kinds = defaultdict(Counter)
+        concurrent = 0
+        with self._lock:
+            stacks = list(self.stacks.items())
+        for stack, value in stacks:
+            frames = stack.split(";")
+            # Inclusive time: every frame on the stack is charged once for the self time below it
+            for frame in set(frames):
+                kind, _, name = frame.partition(":")
+                if kind in KINDS and name:
+                    kinds[kind][name] += value
+            if CONCURRENT in frames:
+                concurrent += value
+            elif "::" in frames[0]:
+                tests[frames[0]] += value
+                # Time of the test's own frame is spent in reporting hooks, around the phases
+                phases[frames[1] if len(frames) > 1 and frames[1] in PHASES else "reporting"] += value
+            else:
+                phases[frames[0]] += value
+
+        def ranked(counter: Counter) -> list:
+            return [{"name": name, "ms": round(value / 1000, 3)} for name, value in counter.most_common(top)]
+
+        return {
+            "total_ms": round(sum(phases.values()) / 1000, 3),
+            "concurrent_ms": round(concurrent / 1000, 3),
+            "phases": {name: round(value / 1000, 3) for name, value in phases.most_common()},
+            "tests": ranked(tests),
+            **{section: ranked(kinds[kind]) for kind, section in KINDS.items()},
+        }
+
+    def write_summary(self, path: str) -> dict:
+        summary = self.summary()
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(summary, file, indent=2)
+        return summary
+
+
+suite_profiler = SuiteProfiler()